@@ -0,0 +1,184 @@
+"""
+Minimal MaxMind DB (.mmdb) writer, enough to build synthetic GeoLite2-City style databases.
+
+Only what the benchmarks need is supported: IPv4 trees with 32-bit records, and data made of
+maps, lists, strings, floats (written as doubles), booleans and non-negative integers.
+Identical records are stored once. See https://maxmind.github.io/MaxMind-DB/ for the format.
+"""
+
+import ipaddress
+import struct
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+METADATA_MARKER = b"\xab\xcd\xefMaxMind.com"
+DATA_SECTION_SEPARATOR = bytes(16)
+RECORD_SIZE = 32
+IPV4_BITS = 32
+
+# Data field types
+_STRING = 2
+_DOUBLE = 3
+_UINT16 = 5
+_UINT32 = 6
+_MAP = 7
+_UINT64 = 9
+_ARRAY = 11
+_BOOLEAN = 14
+# Extended types are written as type 0 followed by a byte holding type - 7
+_FIRST_EXTENDED_TYPE = 8
+_EXTENDED_TYPE_OFFSET = 7
+# Sizes up to 28 fit in the control byte; larger ones spill into 1-3 following bytes
+_MAX_INLINE_SIZE = 28
+_SIZE_THRESHOLDS = (29, 285, 65_821)
+
+
+class UInt16(int):
+    """An integer written as uint16 regardless of its value."""
+
+    mmdb_type = _UINT16
+
+
+class UInt32(int):
+    """An integer written as uint32 regardless of its value."""
+
+    mmdb_type = _UINT32
+
+
+class UInt64(int):
+    """An integer written as uint64 regardless of its value."""
+
+    mmdb_type = _UINT64
+
+
+def _control(type_: int, size: int) -> bytes:
+    """Encode the control byte(s) announcing a field of `type_` and `size`."""
+    if size <= _MAX_INLINE_SIZE:
+        size_bits, extra = size, b""
+    elif size < _SIZE_THRESHOLDS[1]:
+        size_bits, extra = 29, bytes([size - _SIZE_THRESHOLDS[0]])
+    elif size < _SIZE_THRESHOLDS[2]:
+        size_bits, extra = 30, (size - _SIZE_THRESHOLDS[1]).to_bytes(2, "big")
+    else:
+        size_bits, extra = 31, (size - _SIZE_THRESHOLDS[2]).to_bytes(3, "big")
+    if type_ < _FIRST_EXTENDED_TYPE:
+        return bytes([(type_ << 5) | size_bits]) + extra
+    return bytes([size_bits, type_ - _EXTENDED_TYPE_OFFSET]) + extra
+
+
+def _unsigned(type_: int, value: int) -> bytes:
+    payload = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return _control(type_, len(payload)) + payload
+
+
+def encode(value) -> bytes:  # noqa: PLR0911
+    """
+    Encode a value in the MaxMind DB data format.
+
+    Plain integers use the smallest unsigned type that fits; wrap them in `UInt16`, `UInt32`
+    or `UInt64` where a reader expects a particular type.
+    """
+    if isinstance(value, bool):
+        return _control(_BOOLEAN, int(value))
+    if isinstance(value, str):
+        payload = value.encode("utf-8")
+        return _control(_STRING, len(payload)) + payload
+    if isinstance(value, float):
+        return _control(_DOUBLE, 8) + struct.pack(">d", value)
+    if isinstance(value, UInt16 | UInt32 | UInt64):
+        return _unsigned(value.mmdb_type, int(value))
+    if isinstance(value, int):
+        if value < 0 or value >= 2**64:
+            raise ValueError(f"Unsupported integer {value}")
+        if value < 2**16:
+            return _unsigned(_UINT16, value)
+        return _unsigned(_UINT32 if value < 2**32 else _UINT64, value)
+    if isinstance(value, dict):
+        return _control(_MAP, len(value)) + b"".join(encode(str(k)) + encode(v) for k, v in value.items())
+    if isinstance(value, list | tuple):
+        return _control(_ARRAY, len(value)) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Unsupported value {value!r}")
+
+
+class _SearchTree:
+    """Binary trie over address bits; each node holds two records (bit 0, bit 1)."""
+
+    # Record placeholders until node numbers are final
+    EMPTY = None
+
+    def __init__(self):
+        self.nodes: list[list] = [[self.EMPTY, self.EMPTY]]
+
+    def insert(self, network: ipaddress.IPv4Network, data_offset: int):
+        """Point every address in `network` at the record at `data_offset`, leaving more specific networks alone."""
+        if network.prefixlen == 0:
+            raise ValueError("A /0 network can't be stored")
+        address = int(network.network_address)
+        node = 0
+        for depth in range(network.prefixlen - 1):
+            bit = (address >> (IPV4_BITS - 1 - depth)) & 1
+            child = self.nodes[node][bit]
+            if not isinstance(child, int):
+                # Split an empty or data record into a node, keeping the data for the other half
+                self.nodes.append([child, child])
+                child = len(self.nodes) - 1
+                self.nodes[node][bit] = child
+            node = child
+        bit = (address >> (IPV4_BITS - network.prefixlen)) & 1
+        if isinstance(self.nodes[node][bit], int):
+            raise ValueError(f"{network} contains networks inserted earlier; insert it first")
+        self.nodes[node][bit] = ("data", data_offset)
+
+    def serialize(self) -> bytes:
+        node_count = len(self.nodes)
+
+        def record(value) -> int:
+            if value is self.EMPTY:
+                return node_count
+            if isinstance(value, int):
+                return value
+            return node_count + len(DATA_SECTION_SEPARATOR) + value[1]
+
+        return b"".join(struct.pack(">II", record(left), record(right)) for left, right in self.nodes)
+
+
+def write_mmdb(
+    path: str | Path,
+    networks: Iterable[tuple[ipaddress.IPv4Network | str, dict]],
+    database_type: str = "GeoLite2-City",
+    build_epoch: int | None = None,
+    description: str = "Synthetic database",
+) -> Path:
+    """
+    Write an IPv4 database mapping each network to its record.
+
+    Networks must not overlap, except that a network may be inserted before more specific
+    networks inside it, which then take precedence.
+    """
+    tree = _SearchTree()
+    data = bytearray()
+    offsets: dict[bytes, int] = {}
+    for network, record in networks:
+        encoded = encode(record)
+        if encoded not in offsets:
+            offsets[encoded] = len(data)
+            data += encoded
+        tree.insert(ipaddress.IPv4Network(network), offsets[encoded])
+
+    # libmaxminddb insists on these exact integer types
+    metadata = {
+        "node_count": UInt32(len(tree.nodes)),
+        "record_size": UInt16(RECORD_SIZE),
+        "ip_version": UInt16(4),
+        "database_type": database_type,
+        "languages": ["en"],
+        "binary_format_major_version": UInt16(2),
+        "binary_format_minor_version": UInt16(0),
+        "build_epoch": UInt64(int(time.time()) if build_epoch is None else build_epoch),
+        "description": {"en": description},
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(tree.serialize() + DATA_SECTION_SEPARATOR + bytes(data) + METADATA_MARKER + encode(metadata))
+    return path
@@ -0,0 +1,327 @@
+"""
+Throughput, memory and latency benchmarks for each stage, against a synthetic database.
+
+Every (stage, size) case runs in a fresh process so caches start cold and peak memory is
+the case's own. Results are written as JSON and can be compared with an earlier run:
+
+    python -m benchmarks --sizes 1000 100000 --output results.json
+    python -m benchmarks --compare results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic_db import DEFAULT_SUBNET_PREFIX, build_synthetic_db
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (10**3, 10**4, 10**5, 10**6)
+DEFAULT_TOLERANCE = 0.10
+# Individually timed lookups per lookup_ip case; the rest of the case isn't timed per call
+MAX_TIMED_LOOKUPS = 100_000
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process in MiB, or None where it can't be read."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def reset_peak_rss():
+    """Restart peak memory tracking from the current usage, where the OS allows it (Linux)."""
+    with contextlib.suppress(OSError):
+        Path("/proc/self/clear_refs").write_text("5")
+
+
+# Each stage prepares its input untimed and returns the function to time; if that returns an
+# array, it holds per-call latencies in seconds
+Stage = Callable[[int], Callable[[], object]]
+
+
+def _ip_strings(size: int) -> list[str]:
+    from ip_visualizer.core.ip_generator import generate_ip_list
+
+    return generate_ip_list(size, seed=size)
+
+
+def _locations(size: int):
+    from ip_visualizer.core.geo_index import ensure_index, locate_ip_counts
+    from ip_visualizer.core.geoip_reader import get_reader_manager
+
+    return locate_ip_counts(Counter(_ip_strings(size)), ensure_index(get_reader_manager().db_path))
+
+
+def stage_generate(size: int):
+    from ip_visualizer.core.ip_generator import generate_ip_list
+
+    return lambda: generate_ip_list(size, seed=size)
+
+
+def stage_parse(size: int):
+    from ip_visualizer.core.ip_parse import parse_ips
+
+    ips = _ip_strings(size)
+    return lambda: parse_ips(ips).value_counts()
+
+
+def stage_lookup(size: int):
+    from ip_visualizer.core.ip_visualizer import get_ip_locations
+
+    counts = Counter(_ip_strings(size))
+    return lambda: get_ip_locations(counts)
+
+
+def stage_index_lookup(size: int):
+    from ip_visualizer.core.geo_index import ensure_index, locate_ip_counts
+    from ip_visualizer.core.geoip_reader import get_reader_manager
+
+    counts = Counter(_ip_strings(size))
+    index = ensure_index(get_reader_manager().db_path)
+    return lambda: locate_ip_counts(counts, index)
+
+
+def stage_lookup_ip(size: int):
+    from ip_visualizer.core.ip_lookup import lookup_ip
+
+    ips = _ip_strings(size)
+    timed = set(np.linspace(0, size - 1, min(size, MAX_TIMED_LOOKUPS), dtype=np.int64).tolist())
+
+    def run():
+        latencies = []
+        for i, ip in enumerate(ips):
+            if i in timed:
+                start = time.perf_counter()
+                lookup_ip(ip)
+                latencies.append(time.perf_counter() - start)
+            else:
+                lookup_ip(ip)
+        return np.array(latencies)
+
+    return run
+
+
+def stage_aggregate(size: int):
+    from ip_visualizer.core.binning import Grid, bin_locations
+    from ip_visualizer.core.locations import LocationSet
+
+    rng = np.random.default_rng(size)
+    locations = LocationSet.from_arrays(rng.uniform(-60, 70, size), rng.uniform(-180, 180, size))
+    return lambda: bin_locations(locations, Grid.from_cell_size(0.1))
+
+
+def stage_render(size: int):
+    from ip_visualizer.core.ip_visualizer import create_heatmap
+
+    locations = _locations(size)
+    return lambda: create_heatmap(locations)
+
+
+STAGES: dict[str, Stage] = {
+    "generate": stage_generate,
+    "parse": stage_parse,
+    "lookup": stage_lookup,
+    "index_lookup": stage_index_lookup,
+    "lookup_ip": stage_lookup_ip,
+    "aggregate": stage_aggregate,
+    "render": stage_render,
+}
+
+
+def run_case(stage: str, size: int, db_path: str) -> dict:
+    """Run one stage on `size` addresses against the database at `db_path`, in this process."""
+    from ip_visualizer.core.geoip_reader import configure_reader
+
+    configure_reader(db_path)
+    # Rendering writes its HTML to the working directory
+    with (
+        tempfile.TemporaryDirectory() as workdir,
+        contextlib.chdir(workdir),
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        run = STAGES[stage](size)
+        reset_peak_rss()
+        start = time.perf_counter()
+        latencies = run()
+        seconds = time.perf_counter() - start
+    result = {
+        "stage": stage,
+        "size": size,
+        "seconds": seconds,
+        "ips_per_second": size / seconds if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "p50_us": None,
+        "p99_us": None,
+    }
+    if isinstance(latencies, np.ndarray) and len(latencies):
+        result["p50_us"], result["p99_us"] = (np.percentile(latencies, [50, 99]) * 1e6).tolist()
+    return result
+
+
+def _run_isolated(stage: str, size: int, db_path: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, stage, size, db_path).result()
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(  # noqa: S603
+            ["git", "rev-parse", "HEAD"],  # noqa: S607
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> dict:
+    """Where the benchmarks ran, so results from different machines aren't mistaken for regressions."""
+    import maxminddb
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "maxminddb": maxminddb.__version__,
+        "git_commit": _git_commit(),
+    }
+
+
+def run_benchmarks(
+    stages: Sequence[str],
+    sizes: Sequence[int],
+    db_path: str | Path,
+    repeat: int = 1,
+    isolated: bool = True,
+) -> list[dict]:
+    """
+    Run every stage at every size, keeping the fastest of `repeat` runs of each case.
+
+    With `isolated` each run gets a fresh process (cold caches, its own peak memory);
+    without it the cases share this process, which is faster but less faithful.
+    """
+    run = _run_isolated if isolated else run_case
+    results = []
+    for stage in stages:
+        for size in sizes:
+            runs = [run(stage, size, str(db_path)) for _ in range(repeat)]
+            best = min(runs, key=lambda result: result["seconds"])
+            best["peak_rss_mb"] = max((r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None), default=None)
+            results.append(best)
+            print(format_result(best), flush=True)
+    return results
+
+
+def format_result(result: dict) -> str:
+    line = f"{result['stage']:>13} {result['size']:>10,} {result['seconds']:>9.3f}s"
+    line += f" {result['ips_per_second']:>14,.0f} IPs/s"
+    if result["peak_rss_mb"] is not None:
+        line += f" {result['peak_rss_mb']:>8.1f} MiB"
+    if result["p50_us"] is not None:
+        line += f"  p50 {result['p50_us']:.1f} us  p99 {result['p99_us']:.1f} us"
+    return line
+
+
+def compare_results(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    List the cases where `current` is worse than `baseline` by more than `tolerance` (a fraction).
+
+    Throughput, peak memory and p99 latency are compared for each (stage, size) present in both.
+    """
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["size"]))
+        if before is None:
+            continue
+        case = f"{result['stage']} at {result['size']:,}"
+        checks = (
+            ("throughput", before["ips_per_second"], result["ips_per_second"], False),
+            ("peak memory", before["peak_rss_mb"], result["peak_rss_mb"], True),
+            ("p99 latency", before["p99_us"], result["p99_us"], True),
+        )
+        for metric, old, new, lower_is_better in checks:
+            if old is None or new is None or not old:
+                continue
+            change = (new - old) / old
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(f"{case}: {metric} {old:,.1f} -> {new:,.1f} ({change:+.0%})")
+    return regressions
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="Stages to run.")
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Addresses per case (e.g. up to 10000000)."
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is kept.")
+    parser.add_argument("--db", type=Path, help="Database to use (default: build a synthetic one).")
+    parser.add_argument(
+        "--subnet-prefix", type=int, default=DEFAULT_SUBNET_PREFIX, help="Network size of the synthetic database."
+    )
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, as a fraction.")
+    parser.add_argument("--in-process", action="store_true", help="Run all cases in this process (faster, less exact).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = args.db or build_synthetic_db(Path(workdir) / "GeoLite2-City.mmdb", subnet_prefix=args.subnet_prefix)
+        results = run_benchmarks(args.stages, args.sizes, db_path, args.repeat, isolated=not args.in_process)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "database": str(args.db) if args.db else f"synthetic /{args.subnet_prefix}",
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.now(UTC):%Y%m%dT%H%M%SZ}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}")
+
+    if args.compare:
+        regressions = compare_results(json.loads(args.compare.read_text()), report, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
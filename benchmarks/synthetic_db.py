@@ -0,0 +1,87 @@
+"""Synthetic GeoLite2-City style database covering the address ranges `generate_ip_list` draws from."""
+
+import ipaddress
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.mmdb_writer import write_mmdb
+from ip_visualizer.core.sampling import SamplingConfig, load_sampling_config
+
+DEFAULT_SUBNET_PREFIX = 16
+DEFAULT_CITIES_PER_REGION = 500
+
+# Rough (latitude, longitude) boxes and a few countries per bundled region; other regions get the whole world
+REGION_BOUNDS = {
+    "Asia": ((-10.0, 55.0), (60.0, 150.0)),
+    "Europe": ((35.0, 70.0), (-10.0, 40.0)),
+    "North America": ((15.0, 60.0), (-130.0, -60.0)),
+    "South America": ((-55.0, 12.0), (-80.0, -35.0)),
+}
+WORLD_BOUNDS = ((-60.0, 70.0), (-180.0, 180.0))
+REGION_CONTINENTS = {"Asia": "AS", "Europe": "EU", "North America": "NA", "South America": "SA"}
+REGION_COUNTRIES = {
+    "Asia": ("CN", "JP", "IN", "KR", "SG"),
+    "Europe": ("DE", "FR", "GB", "IT", "PL"),
+    "North America": ("US", "CA", "MX"),
+    "South America": ("BR", "AR", "CL", "CO"),
+}
+
+
+def _city_records(region: str, count: int, rng: np.random.Generator) -> list[dict]:
+    (lat_min, lat_max), (lon_min, lon_max) = REGION_BOUNDS.get(region, WORLD_BOUNDS)
+    countries = REGION_COUNTRIES.get(region, ("US",))
+    continent = REGION_CONTINENTS.get(region, "NA")
+    latitudes = rng.uniform(lat_min, lat_max, count).round(4)
+    longitudes = rng.uniform(lon_min, lon_max, count).round(4)
+    return [
+        {
+            "city": {"names": {"en": f"{region} City {i}"}},
+            "continent": {"code": continent, "names": {"en": region}},
+            "country": {"iso_code": (iso_code := countries[i % len(countries)]), "names": {"en": iso_code}},
+            "location": {"latitude": float(lat), "longitude": float(lon), "time_zone": "UTC"},
+            "postal": {"code": f"{i:05}"},
+        }
+        for i, (lat, lon) in enumerate(zip(latitudes, longitudes, strict=True))
+    ]
+
+
+def synthetic_networks(
+    config: SamplingConfig | None = None,
+    subnet_prefix: int = DEFAULT_SUBNET_PREFIX,
+    cities_per_region: int = DEFAULT_CITIES_PER_REGION,
+    seed: int = 0,
+) -> Iterator[tuple[ipaddress.IPv4Network, dict]]:
+    """
+    Split every prefix of the sampling config into /`subnet_prefix` networks, each assigned a random city of its region.
+
+    Prefixes listed in several regions belong to the first. A larger `subnet_prefix` gives
+    more, smaller networks, closer to the real database (millions of networks) but slower
+    to build.
+    """
+    config = config or load_sampling_config()
+    rng = np.random.default_rng(seed)
+    seen: set[ipaddress.IPv4Network] = set()
+    for name, region in config.regions.items():
+        cities = _city_records(name, cities_per_region, rng)
+        for prefix in region.prefixes:
+            network = ipaddress.IPv4Network(prefix)
+            if network in seen:
+                continue
+            seen.add(network)
+            subnets = network.subnets(new_prefix=max(subnet_prefix, network.prefixlen))
+            for subnet in subnets:
+                yield subnet, cities[rng.integers(len(cities))]
+
+
+def build_synthetic_db(
+    path: str | Path,
+    subnet_prefix: int = DEFAULT_SUBNET_PREFIX,
+    cities_per_region: int = DEFAULT_CITIES_PER_REGION,
+    seed: int = 0,
+    build_epoch: int = 1,
+) -> Path:
+    """Write a synthetic database to `path` (see `synthetic_networks`); the same arguments give the same file."""
+    networks = synthetic_networks(subnet_prefix=subnet_prefix, cities_per_region=cities_per_region, seed=seed)
+    return write_mmdb(path, networks, build_epoch=build_epoch, description="ip-visualizer benchmark database")
@@ -1,34 +1,235 @@
 """Command-line interface for IP Visualizer."""
 
-from pprint import pprint
-
 import typer
 
+from ip_visualizer.core.output_format import OutputFormat
+
 app = typer.Typer(help="IP Visualizer - Visualize IP addresses on a map.")
 
 
 @app.command()
-def generate_ips(count: int = 100):
+def generate_ips(  # noqa: PLR0913
+    count: int = 100,
+    stream: bool = typer.Option(False, help="Stream addresses in chunks with constant memory."),
+    output: str | None = typer.Option(None, help="File to stream to (default: stdout)."),
+    output_format: OutputFormat = typer.Option(OutputFormat.PLAIN, "--format", help="Streamed output format."),  # noqa: B008
+    chunk_size: int = typer.Option(1_000_000, min=1, help="Addresses generated per chunk when streaming."),
+    seed: int | None = typer.Option(None, help="Seed for reproducible output."),
+    config: str | None = typer.Option(None, help="JSON file with region and prefix weights (default: bundled)."),
+    hot_ips: int | None = typer.Option(None, min=0, help="Size of the pool of frequently repeated addresses."),
+    hot_fraction: float | None = typer.Option(None, min=0.0, max=1.0, help="Share of traffic from the hot pool."),
+    zipf_exponent: float | None = typer.Option(None, min=0.0, help="Skew of repeats within the hot pool."),
+):
     """Generate random IP addresses."""
+    from dataclasses import replace
+
     from ip_visualizer.core.ip_generator import main as ip_generator_main
+    from ip_visualizer.core.ip_generator import stream_ips
+    from ip_visualizer.core.sampling import IPSampler, load_sampling_config
 
-    ip_generator_main(count)
+    sampler = None
+    overrides = {"count": hot_ips, "fraction": hot_fraction, "exponent": zipf_exponent}
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    if config is not None or overrides:
+        sampling_config = load_sampling_config(config)
+        sampler = IPSampler(replace(sampling_config, hot_ips=replace(sampling_config.hot_ips, **overrides)))
+
+    if stream:
+        stream_ips(count, output, output_format, chunk_size, seed, sampler)
+    else:
+        ip_generator_main(count, seed, sampler)
 
 
 @app.command()
-def lookup_ip(ip: str):
+def lookup_ip(
+    ip: str,
+    cache_file: str | None = typer.Option(None, help="SQLite file caching lookup results across runs."),
+):
     """Look up an IP address in the GeoLite2 database."""
-    from ip_visualizer.core.ip_lookup import lookup_ip
+    from pprint import pprint
+
+    from ip_visualizer.core.ip_lookup import configure_persistent_cache, lookup_ip
 
+    configure_persistent_cache(cache_file)
     pprint(lookup_ip(ip))
 
 
 @app.command()
-def visualize():
-    """Generate a heatmap of IP addresses."""
+def visualize(  # noqa: PLR0913
+    inputs: list[str] | None = typer.Argument(  # noqa: B008
+        None, help="CSV or NDJSON log files or globs, optionally .gz/.zst compressed, combined into one map."
+    ),
+    csv_file: str | None = typer.Option(None, "--csv", help="CSV export to read IP addresses from."),
+    column: str = typer.Option(
+        "_source.cg.detail.remote_addr", help="CSV column, or NDJSON field as a dotted path, holding IPs."
+    ),
+    workers: int = typer.Option(1, min=0, help="Processes to geolocate with (0 = one per CPU)."),
+    cell_size: float | None = typer.Option(None, min=0.0001, help="Bin points into square cells of this many degrees."),
+    geohash_precision: int | None = typer.Option(None, min=1, max=12, help="Bin points into geohash cells."),
+    max_points: int = typer.Option(100_000, min=0, help="Maximum heatmap points to write (0 = no limit)."),
+    tiled: bool = typer.Option(False, help="Write one pre-aggregated data file per zoom level, loaded on demand."),
+    max_zoom: int = typer.Option(10, min=1, max=18, help="Finest zoom level to pre-aggregate with --tiled."),
+    index: bool = typer.Option(False, help="Resolve IPv4 addresses with the compact index (built when stale)."),
+    cache_file: str | None = typer.Option(None, help="SQLite file caching lookup results across runs."),
+    cache_size: int = typer.Option(5_000_000, min=1, help="Maximum addresses kept in --cache-file."),
+    pipeline: bool = typer.Option(False, help="Overlap CSV reading, parsing, lookups and aggregation."),
+    readers: int = typer.Option(4, min=1, help="Input files read and parsed at once."),
+    state: str | None = typer.Option(
+        None, help="Aggregation state file to merge this run into and render (without --csv: render it only)."
+    ),
+    choropleth: str | None = typer.Option(
+        None, help="Map requests per 'country' or 'continent' instead of drawing a heatmap."
+    ),
+    boundaries: str | None = typer.Option(
+        None, help="GeoJSON country boundaries to fill with --choropleth (without it: one circle per region)."
+    ),
+    boundary_key: str = typer.Option("ISO_A2", help="Property of each boundary feature holding its ISO country code."),
+    interval: str | None = typer.Option(
+        None, help="Animate one heatmap per time window of this length, e.g. 15min, 1h or 1D."
+    ),
+    time_column: str = typer.Option(
+        "_source.@timestamp", help="CSV column, or NDJSON dotted path, holding each request's ISO 8601 time."
+    ),
+    window_max_points: int = typer.Option(
+        2_000, min=0, help="Maximum points written per time window with --interval (0 = no limit)."
+    ),
+    rejected_file: str | None = typer.Option(
+        None, help="Write a sample of the private, reserved or malformed addresses skipped to this CSV file."
+    ),
+    stats: str | None = typer.Option(None, help="Write per-stage timings and counters to this JSON file."),
+    profile: list[str] | None = typer.Option(  # noqa: B008
+        None, help="Run this stage under cProfile, writing profile_<stage>.prof (repeatable, or 'all')."
+    ),
+    trace_memory: list[str] | None = typer.Option(  # noqa: B008
+        None, help="Record the peak memory allocated in this stage in the --stats report (repeatable, or 'all')."
+    ),
+):
+    """Generate a heatmap of IP addresses from log files, or from random addresses if none are given."""
+    from ip_visualizer.core.choropleth import LEVELS
+    from ip_visualizer.core.instrumentation import RunStats, collect_stats
+    from ip_visualizer.core.ip_lookup import configure_persistent_cache
     from ip_visualizer.core.ip_visualizer import main as visualize_main
 
-    visualize_main()
+    grid = _heatmap_grid(cell_size, geohash_precision, tiled)
+    if choropleth is not None:
+        if choropleth not in LEVELS:
+            raise typer.BadParameter(f"--choropleth must be one of {', '.join(LEVELS)}.")
+        if tiled or grid is not None or state is not None:
+            raise typer.BadParameter(
+                "--choropleth draws whole regions; drop --tiled, --cell-size/--geohash-precision and --state."
+            )
+    if interval is not None and (tiled or pipeline or state is not None or choropleth is not None):
+        raise typer.BadParameter(
+            "--interval draws its own time-windowed heatmap; drop --tiled, --pipeline, --state and --choropleth."
+        )
+    _check_stages([*(profile or ()), *(trace_memory or ())])
+
+    configure_persistent_cache(cache_file, cache_size)
+    with collect_stats(RunStats(profile or (), trace_memory or ())) as run_stats:
+        visualize_main(
+            csv_file,
+            column,
+            workers,
+            grid,
+            max_points or None,
+            tiled=tiled,
+            max_zoom=max_zoom,
+            use_index=index,
+            pipeline=pipeline,
+            state_file=state,
+            inputs=inputs or (),
+            readers=readers,
+            rejected_file=rejected_file,
+            choropleth=choropleth,
+            boundaries=boundaries,
+            boundary_key=boundary_key,
+            interval=interval,
+            time_column=time_column,
+            window_max_points=window_max_points or None,
+        )
+    for stage in run_stats.stages.values():
+        if stage.profile_file:
+            typer.echo(f"Profile of the {stage.name} stage written to {stage.profile_file}")
+    if stats:
+        run_stats.write(stats)
+        typer.echo(f"Stage timings written to {stats}")
+
+
+def _heatmap_grid(cell_size: float | None, geohash_precision: int | None, tiled: bool):
+    """The grid picked by --cell-size or --geohash-precision, if any."""
+    from ip_visualizer.core.binning import Grid
+
+    if cell_size is not None and geohash_precision is not None:
+        raise typer.BadParameter("Use either --cell-size or --geohash-precision, not both.")
+    grid = None
+    if cell_size is not None:
+        grid = Grid.from_cell_size(cell_size)
+    elif geohash_precision is not None:
+        grid = Grid.from_geohash_precision(geohash_precision)
+    if tiled and grid is not None:
+        raise typer.BadParameter("--tiled picks the grid per zoom level; drop --cell-size/--geohash-precision.")
+    return grid
+
+
+def _check_stages(names: list[str]):
+    from ip_visualizer.core.instrumentation import ALL_STAGES, STAGES
+
+    for name in names:
+        if name not in {*STAGES, ALL_STAGES}:
+            raise typer.BadParameter(f"Unknown stage {name!r}; choose from {', '.join(STAGES)} or {ALL_STAGES}.")
+
+
+@app.command()
+def merge_state(
+    inputs: list[str] = typer.Argument(..., help="Aggregation state files to combine."),  # noqa: B008
+    output: str = typer.Option(..., "--output", "-o", help="State file to write."),
+):
+    """Combine aggregation states computed separately, e.g. shards processed on different machines."""
+    from ip_visualizer.core.heatmap_state import merge_state_files, save_state
+
+    try:
+        merged = merge_state_files(inputs)
+    except ValueError as error:
+        raise typer.BadParameter(str(error)) from error
+    save_state(merged, output)
+    typer.echo(f"Wrote {merged.total()} requests in {len(merged)} cells from {merged.batches} batches to {output}")
+
+
+@app.command()
+def serve(  # noqa: PLR0913
+    host: str = typer.Option("127.0.0.1", help="Address to listen on."),
+    port: int = typer.Option(8080, min=0, max=65535, help="TCP port to listen on."),
+    socket: str | None = typer.Option(None, help="Listen on this Unix socket instead of TCP."),
+    db_path: str = typer.Option("./data/GeoLite2-City.mmdb", "--db", help="GeoLite2 City database to serve."),
+    cache_file: str | None = typer.Option(None, help="SQLite file caching lookup results across runs."),
+    max_batch: int = typer.Option(10_000, min=1, help="Most addresses accepted in one batch request."),
+    verbose: bool = typer.Option(False, help="Log every request."),
+):
+    """Serve lookups over a local HTTP API, keeping the database and caches warm between requests."""
+    from ip_visualizer.core.geoip_reader import configure_reader
+    from ip_visualizer.core.ip_lookup import configure_persistent_cache
+    from ip_visualizer.core.lookup_server import serve as serve_lookups
+
+    configure_reader(db_path)
+    configure_persistent_cache(cache_file)
+    serve_lookups(host, port, socket, max_batch, verbose)
+
+
+@app.command()
+def build_index(
+    db_path: str = typer.Option("./data/GeoLite2-City.mmdb", "--db", help="GeoLite2 City database to index."),
+    output: str | None = typer.Option(None, help="Index file to write (default: next to the database)."),
+):
+    """Build the compact IPv4 geolocation index from the GeoLite2 database."""
+    from ip_visualizer.core.geo_index import build_index_from_mmdb, default_index_path, write_index
+
+    path = output or default_index_path(db_path)
+    index = build_index_from_mmdb(db_path)
+    try:
+        write_index(index, path)
+    except OSError as error:
+        raise typer.BadParameter(f"Can't write the index: {error}", param_hint="--output") from error
+    typer.echo(f"Wrote {len(index)} ranges and {len(index.latitude)} locations to {path}")
 
 
 if __name__ == "__main__":
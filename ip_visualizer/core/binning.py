@@ -0,0 +1,100 @@
+"""Server-side binning of geolocated points onto a lat/lon grid."""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from ip_visualizer.core.locations import LocationSet
+
+DEFAULT_MAX_POINTS = 100_000
+MAX_GEOHASH_PRECISION = 12
+DEFAULT_MIN_ZOOM = 1
+DEFAULT_MAX_ZOOM = 10
+# Cells per 256px map tile side, i.e. one bin every 8 pixels on screen
+CELLS_PER_TILE = 32
+
+
+@dataclass(frozen=True)
+class Grid:
+    """A regular latitude/longitude grid anchored at (-90, -180)."""
+
+    lat_step: float
+    lon_step: float
+
+    def __post_init__(self):
+        if self.lat_step <= 0 or self.lon_step <= 0:
+            raise ValueError("Grid steps must be positive")
+
+    @classmethod
+    def from_cell_size(cls, degrees: float) -> "Grid":
+        """Square cells of `degrees` on each side."""
+        return cls(degrees, degrees)
+
+    @classmethod
+    def from_geohash_precision(cls, precision: int) -> "Grid":
+        """Cells matching geohash cells of the given precision (1-12 characters)."""
+        if not 1 <= precision <= MAX_GEOHASH_PRECISION:
+            raise ValueError(f"Geohash precision must be between 1 and {MAX_GEOHASH_PRECISION}")
+        # Geohash interleaves 5 bits per character, starting with longitude
+        bits = 5 * precision
+        lon_bits = math.ceil(bits / 2)
+        lat_bits = bits // 2
+        return cls(180.0 / 2**lat_bits, 360.0 / 2**lon_bits)
+
+    @property
+    def rows(self) -> int:
+        return math.ceil(180.0 / self.lat_step)
+
+    @property
+    def columns(self) -> int:
+        return math.ceil(360.0 / self.lon_step)
+
+    def cell_ids(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """Return a unique int64 id for the cell containing each point."""
+        rows = np.floor((latitude.astype(np.float64) + 90.0) / self.lat_step).astype(np.int64)
+        columns = np.floor((longitude.astype(np.float64) + 180.0) / self.lon_step).astype(np.int64)
+        # Points on the north pole / antimeridian belong to the last row / column
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        np.clip(columns, 0, self.columns - 1, out=columns)
+        return rows * self.columns + columns
+
+    def cell_centers(self, cell_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return the (latitude, longitude) of the centre of each cell."""
+        rows, columns = np.divmod(cell_ids, self.columns)
+        return (rows + 0.5) * self.lat_step - 90.0, (columns + 0.5) * self.lon_step - 180.0
+
+
+def zoom_grid(zoom: int) -> Grid:
+    """Grid whose cells are about 256 / CELLS_PER_TILE pixels wide at web map zoom level `zoom`."""
+    return Grid.from_cell_size(360.0 / (2**zoom * CELLS_PER_TILE))
+
+
+def cap_points(locations: LocationSet, max_points: int) -> LocationSet:
+    """Keep only the `max_points` points with the highest counts."""
+    if len(locations) <= max_points:
+        return locations
+    keep = np.sort(np.argpartition(locations.count, -max_points)[-max_points:])
+    return LocationSet(
+        latitude=locations.latitude[keep],
+        longitude=locations.longitude[keep],
+        count=locations.count[keep],
+        country=None if locations.country is None else locations.country[keep],
+        continent=None if locations.continent is None else locations.continent[keep],
+    )
+
+
+def bin_locations(locations: LocationSet, grid: Grid, max_points: int | None = DEFAULT_MAX_POINTS) -> LocationSet:
+    """
+    Aggregate points into grid cells, one weighted point per non-empty cell at its centre.
+
+    Cells may straddle borders, so country and continent codes are not carried over. If
+    `max_points` is set, only the heaviest cells are kept.
+    """
+    if not len(locations):
+        return LocationSet.empty()
+    cells, inverse = np.unique(grid.cell_ids(locations.latitude, locations.longitude), return_inverse=True)
+    counts = np.bincount(inverse, weights=locations.count, minlength=len(cells))
+    latitude, longitude = grid.cell_centers(cells)
+    binned = LocationSet.from_arrays(latitude, longitude, counts)
+    return binned if max_points is None else cap_points(binned, max_points)
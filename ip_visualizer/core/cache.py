@@ -0,0 +1,166 @@
+"""In-memory caches for geolocation results."""
+
+import ipaddress
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+# Returned by cache lookups on a miss, so that `None` can be cached as a negative result
+MISSING: Any = object()
+
+DEFAULT_LRU_SIZE = 100_000
+DEFAULT_PREFIX_CACHE_SIZE = 200_000
+
+
+class LRUCache:
+    """Bounded, thread-safe least-recently-used cache with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_LRU_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for `key`, or `MISSING` if it is not cached."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store `value` under `key`, evicting the least recently used entry when full."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, reset_stats: bool = True):
+        """Drop all entries and, unless `reset_stats` is False, reset the counters."""
+        with self._lock:
+            self._data.clear()
+            if reset_stats:
+                self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class PrefixCache:
+    """
+    Bounded, thread-safe cache of results keyed by network prefix rather than by address.
+
+    GeoLite2 answers carry the network they apply to, so once an address has been resolved
+    every other address in the same block can be answered from here. Networks are stored in
+    per-prefix-length hash tables; a lookup masks the address with each prefix length seen so
+    far (typically a few dozen) instead of walking the database tree.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_PREFIX_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (version, prefix length, address >> host bits) -> cached value
+        self._networks: OrderedDict[tuple[int, int, int], Any] = OrderedDict()
+        # version -> {prefix length: number of cached networks}, probed longest first
+        self._prefix_lengths: dict[int, dict[int, int]] = {4: {}, 6: {}}
+        self._lock = threading.Lock()
+
+    def get(self, ip: str | ipaddress.IPv4Address | ipaddress.IPv6Address) -> Any:
+        """Return the value cached for the network containing `ip`, or `MISSING`."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return MISSING
+        return self.get_int(address.version, int(address))
+
+    def get_int(self, version: int, ip_int: int) -> Any:
+        """Like `get`, for an address already converted to an integer."""
+        bits = 32 if version == 4 else 128  # noqa: PLR2004
+        with self._lock:
+            for prefix_len in sorted(self._prefix_lengths[version], reverse=True):
+                key = (version, prefix_len, ip_int >> (bits - prefix_len))
+                try:
+                    value = self._networks[key]
+                except KeyError:
+                    continue
+                self._networks.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return MISSING
+
+    def put(self, network: ipaddress.IPv4Network | ipaddress.IPv6Network, value: Any):
+        """Cache `value` for every address in `network`."""
+        version = network.version
+        prefix_len = network.prefixlen
+        key = (version, prefix_len, int(network.network_address) >> (network.max_prefixlen - prefix_len))
+        with self._lock:
+            if key in self._networks:
+                self._networks.move_to_end(key)
+            else:
+                lengths = self._prefix_lengths[version]
+                lengths[prefix_len] = lengths.get(prefix_len, 0) + 1
+            self._networks[key] = value
+            if len(self._networks) > self.maxsize:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        (version, prefix_len, _), _ = self._networks.popitem(last=False)
+        lengths = self._prefix_lengths[version]
+        lengths[prefix_len] -= 1
+        if not lengths[prefix_len]:
+            del lengths[prefix_len]
+        self.evictions += 1
+
+    def clear(self, reset_stats: bool = True):
+        """Drop all entries and, unless `reset_stats` is False, reset the counters."""
+        with self._lock:
+            self._networks.clear()
+            self._prefix_lengths = {4: {}, 6: {}}
+            if reset_stats:
+                self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "size": len(self._networks),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._networks)
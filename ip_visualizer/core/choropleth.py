@@ -0,0 +1,163 @@
+"""Request totals per country or continent, rendered as a choropleth or as one circle per region."""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from ip_visualizer.core.instrumentation import count, file_size
+from ip_visualizer.core.locations import CONTINENT_CODES, LocationSet, decode_country
+
+CHOROPLETH_FILE = "ip_choropleth.html"
+LEVELS = ("country", "continent")
+# Natural Earth's property; its ISO_A2_EH variant also fills in France and Norway
+DEFAULT_BOUNDARY_KEY = "ISO_A2"
+COLOR_BINS = 6
+# ColorBrewer scales have at least three colours
+MIN_COLOR_BINS = 3
+MAX_MARKER_RADIUS = 40
+
+
+@dataclass(frozen=True)
+class RegionTotals:
+    """Requests per region, heaviest first, with the request-weighted centre of each region's points."""
+
+    level: str
+    codes: list[str]
+    count: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(zip(self.codes, self.count.tolist(), strict=True))
+
+
+def _region_codes(locations: LocationSet, level: str) -> np.ndarray:
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level {level!r}; choose from {', '.join(LEVELS)}")
+    codes = locations.country if level == "country" else locations.continent
+    if codes is None:
+        raise ValueError("The locations carry no country/continent codes; geolocate them with with_codes=True")
+    return codes
+
+
+def region_totals(locations: LocationSet, level: str = "country") -> RegionTotals:
+    """
+    Sum requests per country or continent in one vectorised group-by.
+
+    Points whose region is unknown are left out. The result has one row per region, so it
+    stays tiny however many points (or requests) went in.
+    """
+    codes = _region_codes(locations, level)
+    known = codes != 0
+    regions, inverse = np.unique(codes[known], return_inverse=True)
+    weights = locations.count[known].astype(np.float64)
+    totals = np.bincount(inverse, weights=weights, minlength=len(regions))
+    latitude = np.bincount(inverse, weights=weights * locations.latitude[known], minlength=len(regions)) / totals
+    longitude = np.bincount(inverse, weights=weights * locations.longitude[known], minlength=len(regions)) / totals
+    order = np.argsort(-totals, kind="stable")
+    decode = decode_country if level == "country" else CONTINENT_CODES.__getitem__
+    return RegionTotals(
+        level=level,
+        codes=[decode(code) for code in regions[order].tolist()],
+        count=totals[order].astype(np.uint64),
+        latitude=latitude[order],
+        longitude=longitude[order],
+    )
+
+
+def country_continents(locations: LocationSet) -> dict[str, str]:
+    """Map each country seen in `locations` to its continent code."""
+    countries, continents = _region_codes(locations, "country"), _region_codes(locations, "continent")
+    known = (countries != 0) & (continents != 0)
+    regions, first = np.unique(countries[known], return_index=True)
+    return {
+        decode_country(country): CONTINENT_CODES[continent]
+        for country, continent in zip(regions.tolist(), continents[known][first].tolist(), strict=True)
+    }
+
+
+def load_boundaries(path: str | Path, key: str = DEFAULT_BOUNDARY_KEY) -> dict:
+    """
+    Load a GeoJSON FeatureCollection of country boundaries whose features carry the ISO code in `key`.
+
+    Any source works, e.g. Natural Earth's admin-0 countries simplified with mapshaper;
+    simplify it first, as the whole file is embedded in the map. Raises ValueError if the
+    file isn't such a collection.
+    """
+    try:
+        boundaries = json.loads(Path(path).read_text())
+    except json.JSONDecodeError as error:
+        raise ValueError(f"{path} is not valid GeoJSON: {error}") from error
+    features = boundaries.get("features") if isinstance(boundaries, dict) else None
+    if not isinstance(features, list):
+        raise ValueError(f"{path} is not a GeoJSON FeatureCollection")
+    if not any(key in (feature.get("properties") or {}) for feature in features):
+        raise ValueError(f"No feature in {path} has a {key!r} property; pick the ISO code property with --boundary-key")
+    return boundaries
+
+
+def _color_bins(values: list[int]) -> list[float] | int:
+    """
+    Quantile bin edges, so one dominant region doesn't leave every other one in the lowest colour.
+
+    Falls back to evenly spaced bins when the totals have too few distinct values.
+    """
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, COLOR_BINS + 1)))
+    return edges.tolist() if len(edges) > MIN_COLOR_BINS else COLOR_BINS
+
+
+def create_choropleth(
+    locations: LocationSet,
+    level: str = "country",
+    boundaries: dict | None = None,
+    boundary_key: str = DEFAULT_BOUNDARY_KEY,
+):
+    """
+    Map requests per country or continent.
+
+    With `boundaries` (see `load_boundaries`) countries are filled by their total, or by
+    their continent's total at the continent level (countries without any requests aren't
+    linked to a continent, so stay blank). Without them, each region gets a circle sized by
+    its total at the centre of its requests.
+    """
+    import folium
+
+    totals = region_totals(locations, level)
+    print(f"Creating {level} map of {len(totals)} regions...")
+    m = folium.Map(location=[20, 0], zoom_start=2)
+
+    if boundaries is not None:
+        data = totals.as_dict()
+        if level == "continent":
+            data = {country: data[continent] for country, continent in country_continents(locations).items()}
+        if data:
+            folium.Choropleth(
+                geo_data=boundaries,
+                data=data,
+                key_on=f"feature.properties.{boundary_key}",
+                bins=_color_bins(list(data.values())),
+                fill_color="YlOrRd",
+                nan_fill_opacity=0.0,
+                legend_name=f"Requests per {level}",
+            ).add_to(m)
+    else:
+        largest = float(totals.count.max()) if len(totals) else 1.0
+        for code, requests, latitude, longitude in zip(
+            totals.codes, totals.count.tolist(), totals.latitude.tolist(), totals.longitude.tolist(), strict=True
+        ):
+            folium.CircleMarker(
+                location=[latitude, longitude],
+                radius=max(2.0, MAX_MARKER_RADIUS * (requests / largest) ** 0.5),
+                tooltip=f"{code}: {requests} requests",
+                color="crimson",
+                fill=True,
+            ).add_to(m)
+
+    m.save(CHOROPLETH_FILE)
+    count(regions=len(totals), bytes_written=file_size(CHOROPLETH_FILE))
+    print(f"Map saved as {CHOROPLETH_FILE}")
@@ -0,0 +1,300 @@
+"""
+Compact, memory-mappable IPv4 geolocation index built once from the GeoLite2 database.
+
+The index only covers IPv4; IPv6 addresses are still looked up in the database itself.
+"""
+
+import ipaddress
+import json
+import os
+import struct
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+import maxminddb
+import numpy as np
+
+from ip_visualizer.core.geoip_reader import DEFAULT_DB_PATH
+from ip_visualizer.core.ip_parse import parse_ips
+from ip_visualizer.core.locations import LocationSet, encode_continent, encode_country
+from ip_visualizer.core.parallel_lookup import locate_shard, resolve_coordinates
+
+INDEX_MAGIC = b"IPVIDX01"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+NOT_FOUND = -1
+# Every array starts on an 8-byte boundary so it can be viewed in place from the memory map
+_ALIGNMENT = 8
+_HEADER_LENGTH = struct.Struct("<I")
+_ARRAYS = {
+    "start": "<u4",
+    "end": "<u4",
+    "location_id": "<u4",
+    "latitude": "<f4",
+    "longitude": "<f4",
+    "country": "<u2",
+    "continent": "u1",
+}
+
+
+def default_index_path(db_path: str | Path = DEFAULT_DB_PATH) -> Path:
+    """Index file kept next to the database, e.g. GeoLite2-City.idx."""
+    return Path(db_path).with_suffix(INDEX_SUFFIX)
+
+
+@dataclass(frozen=True)
+class GeoIndex:
+    """
+    IPv4 ranges mapped to a deduplicated table of locations.
+
+    `start`, `end` and `location_id` are sorted, non-overlapping address ranges; the other
+    arrays are the location table they point into. `build_epoch` is the build time of the
+    mmdb the index was made from.
+    """
+
+    build_epoch: int
+    start: np.ndarray
+    end: np.ndarray
+    location_id: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    country: np.ndarray
+    continent: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def lookup(self, ip_ints: np.ndarray) -> np.ndarray:
+        """Return the location id of each uint32 address, or NOT_FOUND if no range covers it."""
+        ip_ints = np.asarray(ip_ints, dtype=np.uint32)
+        if not len(self):
+            return np.full(len(ip_ints), NOT_FOUND, dtype=np.int64)
+        ranges = np.searchsorted(self.start, ip_ints, side="right") - 1
+        clipped = np.clip(ranges, 0, None)
+        found = (ranges >= 0) & (ip_ints <= self.end[clipped])
+        return np.where(found, self.location_id[clipped].astype(np.int64), NOT_FOUND)
+
+    def locate(self, ip_ints: np.ndarray, counts=None, with_codes: bool = False) -> LocationSet:
+        """Geolocate uint32 addresses in one vectorised pass, dropping those not in the index."""
+        location_ids = self.lookup(ip_ints)
+        found = location_ids != NOT_FOUND
+        location_ids = location_ids[found]
+        counts = None if counts is None else np.asarray(counts)[found]
+        return LocationSet.from_arrays(
+            self.latitude[location_ids],
+            self.longitude[location_ids],
+            counts,
+            country=self.country[location_ids] if with_codes else None,
+            continent=self.continent[location_ids] if with_codes else None,
+        )
+
+
+def locate_ip_counts(ip_counts: Mapping[str, int], index: GeoIndex, with_codes: bool = False) -> LocationSet:
+    """
+    Geolocate distinct address strings with their counts, dropping malformed ones.
+
+    IPv4 addresses are resolved against the index and IPv6 ones with the database reader
+    (see `locate_shard`); without the database they are dropped.
+    """
+    ips = list(ip_counts)
+    parsed = parse_ips(ips, strip_ports=False)
+    counts = np.fromiter(ip_counts.values(), dtype=np.uint64, count=len(ip_counts))
+    located = index.locate(parsed.ipv4(), counts[parsed.is_ipv4], with_codes)
+    ipv6_rows = np.flatnonzero(parsed.is_ipv6)
+    if not len(ipv6_rows):
+        return located
+    try:
+        ipv6_located = locate_shard([ips[row] for row in ipv6_rows], counts[ipv6_rows].tolist(), with_codes)
+    except FileNotFoundError:
+        return located
+    return LocationSet.concatenate([located, ipv6_located])
+
+
+def index_coordinates(ip_addresses: list[str], index: GeoIndex) -> np.ndarray:
+    """
+    Latitude and longitude of each address as an (n, 2) array, NaN where it can't be located.
+
+    Like `locate_ip_counts`, IPv6 addresses are resolved with the database reader.
+    """
+    parsed = parse_ips(ip_addresses, strip_ports=False)
+    location_ids = np.full(len(ip_addresses), NOT_FOUND, dtype=np.int64)
+    location_ids[parsed.is_ipv4] = index.lookup(parsed.ipv4())
+    found = location_ids != NOT_FOUND
+    coordinates = np.full((len(ip_addresses), 2), np.nan)
+    coordinates[found, 0] = index.latitude[location_ids[found]]
+    coordinates[found, 1] = index.longitude[location_ids[found]]
+    ipv6_rows = np.flatnonzero(parsed.is_ipv6)
+    if len(ipv6_rows):
+        try:
+            coordinates[ipv6_rows] = resolve_coordinates([ip_addresses[row] for row in ipv6_rows])
+        except FileNotFoundError:
+            pass
+    return coordinates
+
+
+def _location_key(record: Mapping | None) -> tuple[float, float, int, int] | None:
+    """Fields of a raw mmdb City record the index keeps, or None if it has no usable location."""
+    if not record:
+        return None
+    location = record.get("location") or {}
+    latitude, longitude = location.get("latitude"), location.get("longitude")
+    # Same rule as the per-address lookups, which skip 0 or missing coordinates
+    if not latitude or not longitude:
+        return None
+    return (
+        latitude,
+        longitude,
+        encode_country((record.get("country") or {}).get("iso_code")),
+        encode_continent((record.get("continent") or {}).get("code")),
+    )
+
+
+def build_index(
+    networks: Iterable[tuple[ipaddress.IPv4Network | ipaddress.IPv6Network, Mapping | None]], build_epoch: int
+) -> GeoIndex:
+    """
+    Build an index from (network, raw record) pairs as produced by iterating a maxminddb reader.
+
+    IPv6 networks and records without coordinates are skipped, identical locations share
+    one table entry, and adjacent ranges with the same location are merged.
+    """
+    locations: dict[tuple[float, float, int, int], int] = {}
+    ranges = []
+    for network, record in networks:
+        if not isinstance(network, ipaddress.IPv4Network):
+            continue
+        key = _location_key(record)
+        if key is None:
+            continue
+        location_id = locations.setdefault(key, len(locations))
+        ranges.append((int(network.network_address), int(network.broadcast_address), location_id))
+
+    ranges.sort()
+    start, end, location_id = [], [], []
+    for low, high, location in ranges:
+        if start and low <= end[-1]:
+            # The same block reached twice (e.g. through an IPv4-mapped alias)
+            continue
+        if start and location == location_id[-1] and low == end[-1] + 1:
+            end[-1] = high
+            continue
+        start.append(low)
+        end.append(high)
+        location_id.append(location)
+
+    table = np.array(list(locations), dtype=np.float64).reshape(-1, 4)
+    return GeoIndex(
+        build_epoch=build_epoch,
+        start=np.array(start, dtype=np.uint32),
+        end=np.array(end, dtype=np.uint32),
+        location_id=np.array(location_id, dtype=np.uint32),
+        latitude=table[:, 0].astype(np.float32),
+        longitude=table[:, 1].astype(np.float32),
+        country=table[:, 2].astype(np.uint16),
+        continent=table[:, 3].astype(np.uint8),
+    )
+
+
+def mmdb_build_epoch(db_path: str | Path = DEFAULT_DB_PATH) -> int:
+    """Build time of an mmdb file, from its metadata."""
+    with maxminddb.open_database(str(db_path)) as reader:
+        return reader.metadata().build_epoch
+
+
+def build_index_from_mmdb(db_path: str | Path = DEFAULT_DB_PATH) -> GeoIndex:
+    """Walk every network in the database once and build its index."""
+    print(f"Building geolocation index from {db_path}...")
+    with maxminddb.open_database(str(db_path)) as reader:
+        return build_index(reader, reader.metadata().build_epoch)
+
+
+def write_index(index: GeoIndex, path: str | Path):
+    """
+    Save an index as one binary file: magic, JSON header, then the raw arrays.
+
+    The file is written next to its destination and renamed into place, so readers never
+    see a half-written index.
+    """
+    path = Path(path)
+    arrays = {name: np.ascontiguousarray(getattr(index, name), dtype=dtype) for name, dtype in _ARRAYS.items()}
+    offsets = {}
+    offset = 0
+    for name, array in arrays.items():
+        offsets[name] = [offset, len(array)]
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = json.dumps(
+        {"version": INDEX_VERSION, "build_epoch": index.build_epoch, "arrays": offsets},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    preamble = INDEX_MAGIC + _HEADER_LENGTH.pack(len(header)) + header
+    data_start = -(-len(preamble) // _ALIGNMENT) * _ALIGNMENT
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(preamble.ljust(data_start, b"\0"))
+            for name, array in arrays.items():
+                f.seek(data_start + offsets[name][0])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def load_index(path: str | Path) -> GeoIndex:
+    """Memory-map an index file; raises ValueError if it isn't a current index file."""
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    magic_length = len(INDEX_MAGIC)
+    if bytes(data[:magic_length]) != INDEX_MAGIC:
+        raise ValueError(f"{path} is not a geolocation index")
+    (header_length,) = _HEADER_LENGTH.unpack(bytes(data[magic_length : magic_length + _HEADER_LENGTH.size]))
+    preamble_length = magic_length + _HEADER_LENGTH.size + header_length
+    header = json.loads(bytes(data[magic_length + _HEADER_LENGTH.size : preamble_length]))
+    if header.get("version") != INDEX_VERSION:
+        raise ValueError(f"{path} has unsupported index version {header.get('version')}")
+    data_start = -(-preamble_length // _ALIGNMENT) * _ALIGNMENT
+
+    arrays = {}
+    for name, dtype in _ARRAYS.items():
+        offset, count = header["arrays"][name]
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=data_start + offset)
+    return GeoIndex(build_epoch=header["build_epoch"], **arrays)
+
+
+def ensure_index(db_path: str | Path = DEFAULT_DB_PATH, index_path: str | Path | None = None) -> GeoIndex:
+    """
+    Load the index for `db_path`, (re)building it first if it is missing or stale.
+
+    The index is stale when its build epoch differs from the database's. If the database
+    itself is missing an existing index is used as is. Raises FileNotFoundError if neither
+    exists. An index that can't be saved, e.g. next to a database in a read-only directory,
+    is used from memory for this run only.
+    """
+    index_path = Path(index_path) if index_path is not None else default_index_path(db_path)
+    try:
+        epoch = mmdb_build_epoch(db_path)
+    except FileNotFoundError:
+        epoch = None
+
+    if index_path.exists():
+        try:
+            index = load_index(index_path)
+        except ValueError:
+            if epoch is None:
+                raise
+        else:
+            if epoch is None or index.build_epoch == epoch:
+                return index
+    if epoch is None:
+        raise FileNotFoundError(f"Neither {db_path} nor {index_path} exists")
+
+    index = build_index_from_mmdb(db_path)
+    try:
+        write_index(index, index_path)
+    except OSError as error:
+        print(f"Could not save the index ({error}); using it for this run only")
+        return index
+    return load_index(index_path)
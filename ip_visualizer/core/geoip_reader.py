@@ -0,0 +1,136 @@
+"""Shared, long-lived access to the MaxMind GeoLite2 City database."""
+
+import itertools
+import os
+import threading
+import time
+
+import geoip2.database
+import maxminddb
+
+DEFAULT_DB_PATH = "./data/GeoLite2-City.mmdb"
+# MODE_AUTO uses the C extension when available and falls back to the pure Python
+# reader; both memory-map the database so pages are shared through the OS cache.
+DEFAULT_MODE = maxminddb.MODE_AUTO
+DEFAULT_CHECK_INTERVAL = 1.0
+
+# What opening a truncated or otherwise unreadable file raises; the pure Python reader
+# can fail with IndexError while reading the metadata
+_OPEN_ERRORS = (maxminddb.InvalidDatabaseError, OSError, ValueError, IndexError)
+
+# Shared by all managers, so a replacement manager never repeats a generation
+_generations = itertools.count()
+
+
+class GeoIPReaderManager:
+    """Keeps one geoip2 reader open and reopens it when the mmdb file changes on disk.
+
+    The reader is safe to share between threads. When the database file is replaced
+    the old reader is dropped rather than closed, so lookups already running on it
+    finish normally and it is released once the last reference goes away. A replacement
+    that can't be opened, such as a half-written copy, leaves the old reader in use.
+
+    Every reload or close moves the manager to a new `generation`, telling caches that
+    results from the previous database are stale.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_DB_PATH,
+        mode: int = DEFAULT_MODE,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+    ):
+        self.db_path = db_path
+        self.mode = mode
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reader: geoip2.database.Reader | None = None
+        self._signature: tuple[int, int, int] | None = None
+        self._last_check = 0.0
+        self._generation = next(_generations)
+
+    def get_reader(self) -> geoip2.database.Reader:
+        """Return the shared reader, opening or reloading the database if needed."""
+        reader = self._reader
+        now = time.monotonic()
+        if reader is not None and now - self._last_check < self.check_interval:
+            return reader
+
+        with self._lock:
+            self._last_check = now
+            signature = self._file_signature()
+            if self._reader is None:
+                self._reader = geoip2.database.Reader(self.db_path, mode=self.mode)
+                self._signature = signature
+            elif signature is not None and signature != self._signature:
+                self._reload(signature)
+            return self._reader
+
+    def _reload(self, signature: tuple[int, int, int]):
+        """Swap in the changed database file, keeping the open reader if it won't open."""
+        try:
+            reader = geoip2.database.Reader(self.db_path, mode=self.mode)
+        except _OPEN_ERRORS:
+            # E.g. a new release still being copied into place; the old signature is
+            # kept, so the file is tried again after the next check interval
+            return
+        self._reader = reader
+        self._signature = signature
+        self._generation = next(_generations)
+
+    def close(self):
+        """Close the current reader; the next call to `get_reader` reopens it."""
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+            self._reader = None
+            self._signature = None
+            self._last_check = 0.0
+            # Whatever file is found on reopening may differ from the one just closed
+            self._generation = next(_generations)
+
+    def current_generation(self) -> int:
+        """Return the generation, first reloading the open database if its file changed (see `get_reader`)."""
+        if self._reader is not None:
+            self.get_reader()
+        return self._generation
+
+    def _file_signature(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            # Keep serving from the open reader if the file is briefly missing during an update
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+_manager = GeoIPReaderManager()
+_manager_lock = threading.Lock()
+
+
+def configure_reader(
+    db_path: str = DEFAULT_DB_PATH,
+    mode: int = DEFAULT_MODE,
+    check_interval: float = DEFAULT_CHECK_INTERVAL,
+) -> GeoIPReaderManager:
+    """Replace the shared reader manager, e.g. to point at a different database file."""
+    global _manager  # noqa: PLW0603
+    with _manager_lock:
+        _manager.close()
+        _manager = GeoIPReaderManager(db_path, mode=mode, check_interval=check_interval)
+        return _manager
+
+
+def get_reader_manager() -> GeoIPReaderManager:
+    """Return the process-wide reader manager."""
+    return _manager
+
+
+def get_reader() -> geoip2.database.Reader:
+    """Return the process-wide shared GeoLite2 reader."""
+    return _manager.get_reader()
+
+
+def close_reader():
+    """Close the process-wide shared reader."""
+    _manager.close()
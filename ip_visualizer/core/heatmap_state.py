@@ -0,0 +1,136 @@
+"""Persistent, mergeable heatmap aggregation state: request counts per grid cell."""
+
+import json
+import os
+import zipfile
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from ip_visualizer.core.binning import Grid
+from ip_visualizer.core.locations import COUNT_DTYPE, LocationSet
+
+STATE_VERSION = 1
+# About 1 km, a little finer than the finest --tiled zoom level, so any rendering can be derived from it
+DEFAULT_STATE_CELL_SIZE = 0.01
+CELL_DTYPE = np.int64
+
+
+@dataclass(frozen=True)
+class HeatmapState:
+    """
+    Request counts per non-empty cell of `grid`, with `cells` sorted and unique.
+
+    States on the same grid merge by adding counts cell by cell, so batches (or shards
+    processed on different machines) can be aggregated independently and combined in any
+    order. `batches` counts the batches merged in so far.
+    """
+
+    grid: Grid
+    cells: np.ndarray
+    counts: np.ndarray
+    batches: int = 0
+
+    @classmethod
+    def empty(cls, grid: Grid | None = None) -> "HeatmapState":
+        """Return a state with no requests, on `grid` or the default fine grid."""
+        grid = grid or Grid.from_cell_size(DEFAULT_STATE_CELL_SIZE)
+        return cls(grid, np.empty(0, dtype=CELL_DTYPE), np.empty(0, dtype=COUNT_DTYPE))
+
+    @classmethod
+    def from_locations(cls, locations: LocationSet, grid: Grid | None = None) -> "HeatmapState":
+        """Bin one batch of points into a state."""
+        state = cls.empty(grid)
+        if not len(locations):
+            return state
+        cells, inverse = np.unique(state.grid.cell_ids(locations.latitude, locations.longitude), return_inverse=True)
+        counts = np.bincount(inverse, weights=locations.count, minlength=len(cells)).astype(COUNT_DTYPE)
+        return cls(state.grid, cells, counts, batches=1)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def total(self) -> int:
+        """Total request count over all cells."""
+        return int(self.counts.sum())
+
+    def merge(self, *others: "HeatmapState") -> "HeatmapState":
+        """Combine this state with others on the same grid, summing counts per cell."""
+        states = (self, *others)
+        if any(other.grid != self.grid for other in others):
+            raise ValueError("Cannot merge heatmap states binned on different grids")
+        cells, inverse = np.unique(np.concatenate([state.cells for state in states]), return_inverse=True)
+        counts = np.zeros(len(cells), dtype=COUNT_DTYPE)
+        # Integer accumulation; bincount would go through float64 and lose precision on huge counts
+        np.add.at(counts, inverse, np.concatenate([state.counts for state in states]))
+        return HeatmapState(self.grid, cells, counts, sum(state.batches for state in states))
+
+    def update(self, locations: LocationSet) -> "HeatmapState":
+        """Merge a new batch of points into the state."""
+        return self.merge(HeatmapState.from_locations(locations, self.grid))
+
+    def to_locations(self) -> LocationSet:
+        """Return one weighted point per cell, at the cell's centre."""
+        latitude, longitude = self.grid.cell_centers(self.cells)
+        return LocationSet.from_arrays(latitude, longitude, self.counts)
+
+
+def save_state(state: HeatmapState, path: str | Path):
+    """
+    Write `state` as a compressed NumPy archive, replacing `path` atomically.
+
+    Only the non-empty cells are stored, so the file grows with the area covered rather
+    than with the number of requests.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = {
+        "version": STATE_VERSION,
+        "lat_step": state.grid.lat_step,
+        "lon_step": state.grid.lon_step,
+        "batches": state.batches,
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as file:
+        np.savez_compressed(file, header=np.array(json.dumps(header)), cells=state.cells, counts=state.counts)
+    os.replace(tmp_path, path)
+
+
+def _check_version(header: dict, path: str | Path):
+    if header.get("version") != STATE_VERSION:
+        raise ValueError(f"Unsupported heatmap state version {header.get('version')} in {path}")
+
+
+def load_state(path: str | Path) -> HeatmapState:
+    """Read a state written by `save_state`."""
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            header = json.loads(str(archive["header"]))
+            cells = archive["cells"].astype(CELL_DTYPE, copy=False)
+            counts = archive["counts"].astype(COUNT_DTYPE, copy=False)
+    except (KeyError, ValueError, zipfile.BadZipFile) as error:
+        raise ValueError(f"{path} is not a heatmap state file") from error
+    _check_version(header, path)
+    grid = Grid(header["lat_step"], header["lon_step"])
+    return HeatmapState(grid, cells, counts, header["batches"])
+
+
+def load_state_grid(path: str | Path) -> Grid:
+    """Read only the grid of a state written by `save_state`, without decompressing its cells."""
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            header = json.loads(str(archive["header"]))
+    except (KeyError, ValueError, zipfile.BadZipFile) as error:
+        raise ValueError(f"{path} is not a heatmap state file") from error
+    _check_version(header, path)
+    return Grid(header["lat_step"], header["lon_step"])
+
+
+def merge_state_files(paths: Iterable[str | Path]) -> HeatmapState:
+    """Load and merge several state files, e.g. partials computed on different machines."""
+    states = [load_state(path) for path in paths]
+    if not states:
+        raise ValueError("No heatmap states to merge")
+    return states[0].merge(*states[1:])
@@ -0,0 +1,178 @@
+"""Per-stage timings and counters for a visualize run, with optional cProfile and tracemalloc hooks."""
+
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Collection, Iterator
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+STATS_VERSION = 1
+# Stages of `ip_visualizer.main`, in the order they run
+STAGES = ("index", "read", "lookup", "pipeline", "state", "render")
+ALL_STAGES = "all"
+
+
+@dataclass
+class StageStats:
+    """What one stage cost and what it processed."""
+
+    name: str
+    wall_seconds: float = 0.0
+    # This process (all threads) plus worker processes that finished during the stage
+    cpu_seconds: float = 0.0
+    counters: dict[str, int] = field(default_factory=dict)
+    # Time the overlapping steps of a concurrent stage spent working, e.g. the pipeline's
+    # read, parse, lookup and aggregate steps; together they may exceed wall_seconds
+    busy_seconds: dict[str, float] = field(default_factory=dict)
+    # Set when the stage was run under tracemalloc / cProfile
+    peak_traced_bytes: int | None = None
+    profile_file: str | None = None
+
+
+def _cpu_time() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class RunStats:
+    """
+    Collects a `StageStats` per stage, plus counters recorded outside any stage.
+
+    Stages named in `profile` run under cProfile, with the profile written to
+    `<profile_dir>/profile_<stage>.prof` (open it with `python -m pstats` or snakeviz), and
+    stages named in `trace_memory` run under tracemalloc to record their peak allocations.
+    Either may contain "all". Re-entering a stage adds to its totals.
+    """
+
+    def __init__(
+        self,
+        profile: Collection[str] = (),
+        trace_memory: Collection[str] = (),
+        profile_dir: str | Path = ".",
+    ):
+        self.profile = frozenset(profile)
+        self.trace_memory = frozenset(trace_memory)
+        self.profile_dir = Path(profile_dir)
+        self.started = datetime.now(UTC)
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._running: list[StageStats] = []
+        self._start = time.perf_counter()
+        self._start_cpu = _cpu_time()
+
+    def _selected(self, names: frozenset[str], stage: str) -> bool:
+        return stage in names or ALL_STAGES in names
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """Time the enclosed block as stage `name`; counters recorded inside it belong to the stage."""
+        with self._lock:
+            stats = self.stages.setdefault(name, StageStats(name))
+            self._running.append(stats)
+        profiler = cProfile.Profile() if self._selected(self.profile, name) else None
+        trace = self._selected(self.trace_memory, name)
+        started_tracing = trace and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif trace:
+            tracemalloc.reset_peak()
+        start, start_cpu = time.perf_counter(), _cpu_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stats
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stats.wall_seconds += time.perf_counter() - start
+            stats.cpu_seconds += _cpu_time() - start_cpu
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats.peak_traced_bytes = max(stats.peak_traced_bytes or 0, peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"profile_{name}.prof"
+                profiler.dump_stats(path)
+                stats.profile_file = str(path)
+            with self._lock:
+                self._running.remove(stats)
+
+    def count(self, **counters: int):
+        """Add to the counters of the innermost running stage, or of the run if none is running."""
+        with self._lock:
+            target = self._running[-1].counters if self._running else self.counters
+            for name, value in counters.items():
+                target[name] = target.get(name, 0) + int(value)
+
+    def add_busy_time(self, **seconds: float):
+        """Add to the busy time of steps of the innermost running stage; ignored outside any stage."""
+        with self._lock:
+            if not self._running:
+                return
+            target = self._running[-1].busy_seconds
+            for name, value in seconds.items():
+                target[name] = target.get(name, 0.0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "version": STATS_VERSION,
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_seconds": time.perf_counter() - self._start,
+            "cpu_seconds": _cpu_time() - self._start_cpu,
+            "counters": dict(self.counters),
+            "stages": [asdict(stats) for stats in self.stages.values()],
+        }
+
+    def write(self, path: str | Path):
+        """Write the report as JSON."""
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+
+_active: RunStats | None = None
+
+
+@contextlib.contextmanager
+def collect_stats(run_stats: RunStats | None = None) -> Iterator[RunStats]:
+    """Record the stages and counters of the code run inside the block into `run_stats` (or a new one)."""
+    global _active  # noqa: PLW0603
+    previous, _active = _active, run_stats or RunStats()
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[StageStats | None]:
+    """Time the enclosed block as stage `name` of the active run; does nothing outside `collect_stats`."""
+    if _active is None:
+        yield None
+        return
+    with _active.stage(name) as stats:
+        yield stats
+
+
+def count(**counters: int):
+    """Add to the active run's counters (see `RunStats.count`); does nothing outside `collect_stats`."""
+    if _active is not None:
+        _active.count(**counters)
+
+
+def add_busy_time(**seconds: float):
+    """Add to the active run's step timings (see `RunStats.add_busy_time`); does nothing outside `collect_stats`."""
+    if _active is not None:
+        _active.add_busy_time(**seconds)
+
+
+def file_size(*paths: str | Path) -> int:
+    """Total size in bytes of the files at `paths` that exist."""
+    return sum(Path(path).stat().st_size for path in paths if Path(path).is_file())
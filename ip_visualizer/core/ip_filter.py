@@ -0,0 +1,151 @@
+"""Bulk classification of addresses that can't be geolocated, so they never reach the database."""
+
+import csv
+import ipaddress
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from ip_visualizer.core.ip_parse import IPV4, IPV6, ParsedIPs, parse_ips
+
+# Reason codes, indexing REASONS
+ROUTABLE = 0
+MALFORMED = 1
+PRIVATE = 2
+LOOPBACK = 3
+LINK_LOCAL = 4
+MULTICAST = 5
+RESERVED = 6
+REASONS = ("routable", "malformed", "private", "loopback", "link_local", "multicast", "reserved")
+DEFAULT_SAMPLE_SIZE = 1_000
+
+# Non-overlapping, sorted; shared address space (CGNAT) counts as private, documentation and
+# benchmarking networks as reserved
+_IPV4_RANGES = (
+    ("0.0.0.0/8", RESERVED),
+    ("10.0.0.0/8", PRIVATE),
+    ("100.64.0.0/10", PRIVATE),
+    ("127.0.0.0/8", LOOPBACK),
+    ("169.254.0.0/16", LINK_LOCAL),
+    ("172.16.0.0/12", PRIVATE),
+    ("192.0.0.0/24", RESERVED),
+    ("192.0.2.0/24", RESERVED),
+    ("192.168.0.0/16", PRIVATE),
+    ("198.18.0.0/15", RESERVED),
+    ("198.51.100.0/24", RESERVED),
+    ("203.0.113.0/24", RESERVED),
+    ("224.0.0.0/4", MULTICAST),
+    ("240.0.0.0/4", RESERVED),
+)
+# Matched on the upper 64 bits; ::/64 (unspecified, loopback, IPv4-mapped) is handled separately
+_IPV6_RANGES = (
+    ("2001:db8::/32", RESERVED),
+    ("fc00::/7", PRIVATE),
+    ("fe80::/10", LINK_LOCAL),
+    ("ff00::/8", MULTICAST),
+)
+_IPV4_MAPPED = 0xFFFF
+
+
+def _range_table(ranges: tuple[tuple[str, int], ...], shift: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    networks = [ipaddress.ip_network(network) for network, _ in ranges]
+    starts = np.array([int(network.network_address) >> shift for network in networks], dtype=np.uint64)
+    ends = np.array([int(network.broadcast_address) >> shift for network in networks], dtype=np.uint64)
+    return starts, ends, np.array([reason for _, reason in ranges], dtype=np.uint8)
+
+
+_IPV4_TABLE = _range_table(_IPV4_RANGES, 0)
+_IPV6_TABLE = _range_table(_IPV6_RANGES, 64)
+
+
+def _lookup_ranges(values: np.ndarray, table: tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+    """Reason code of the range each value falls in, ROUTABLE if none."""
+    starts, ends, reasons = table
+    position = np.searchsorted(starts, values, side="right") - 1
+    inside = (position >= 0) & (values <= ends[np.maximum(position, 0)])
+    return np.where(inside, reasons[np.maximum(position, 0)], ROUTABLE).astype(np.uint8)
+
+
+def classify_ips(parsed: ParsedIPs) -> np.ndarray:
+    """
+    Classify every row in one vectorised pass: a reason code (see REASONS) per row.
+
+    Malformed rows, private networks (RFC 1918, CGNAT, IPv6 unique local), loopback, link
+    local, multicast and reserved addresses (including documentation ranges, :: and
+    IPv4-mapped forms of all of these) get their reason; only ROUTABLE rows are worth a
+    database lookup.
+    """
+    reasons = np.full(len(parsed), MALFORMED, dtype=np.uint8)
+    ipv4 = parsed.version == IPV4
+    reasons[ipv4] = _lookup_ranges(parsed.low[ipv4], _IPV4_TABLE)
+
+    ipv6 = parsed.version == IPV6
+    high, low = parsed.high[ipv6], parsed.low[ipv6]
+    ipv6_reasons = _lookup_ranges(high, _IPV6_TABLE)
+    first_64 = high == 0
+    mapped = first_64 & ((low >> np.uint64(32)) == _IPV4_MAPPED)
+    ipv6_reasons[first_64] = RESERVED
+    ipv6_reasons[first_64 & (low == 1)] = LOOPBACK
+    ipv6_reasons[mapped] = _lookup_ranges(low[mapped] & np.uint64(0xFFFFFFFF), _IPV4_TABLE)
+    reasons[ipv6] = ipv6_reasons
+    return reasons
+
+
+@dataclass
+class RejectedIPs:
+    """
+    Requests kept out of lookups, counted per reason, plus the first `sample_size` distinct addresses.
+
+    Sampled addresses keep accumulating their request counts, so memory stays bounded however
+    many addresses are rejected.
+    """
+
+    requests: Counter[str] = field(default_factory=Counter)
+    sample: dict[str, tuple[str, int]] = field(default_factory=dict)
+    sample_size: int = DEFAULT_SAMPLE_SIZE
+
+    def add(self, ip: str, reason: str, requests: int):
+        self.requests[reason] += requests
+        if ip in self.sample:
+            self.sample[ip] = (reason, self.sample[ip][1] + requests)
+        elif len(self.sample) < self.sample_size:
+            self.sample[ip] = (reason, requests)
+
+    def total(self) -> int:
+        return self.requests.total()
+
+    def summary(self) -> str:
+        """E.g. "5 private, 2 loopback", largest first."""
+        return ", ".join(f"{requests} {reason.replace('_', ' ')}" for reason, requests in self.requests.most_common())
+
+    def write(self, path: str | Path):
+        """Write the sampled addresses as CSV, with their reason and request count."""
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["ip", "reason", "requests"])
+            writer.writerows((ip, reason, requests) for ip, (reason, requests) in self.sample.items())
+
+
+def split_routable(
+    ip_counts: Mapping[str, int],
+    rejected: RejectedIPs | None = None,
+) -> tuple[dict[str, int], RejectedIPs]:
+    """
+    Split addresses (with their request counts) into those worth looking up and the rejected ones.
+
+    Rejected addresses are added to `rejected` (or a new `RejectedIPs`); both are returned.
+    """
+    rejected = rejected if rejected is not None else RejectedIPs()
+    ips = list(ip_counts)
+    reasons = classify_ips(parse_ips(ips, strip_ports=False))
+    if not reasons.any():
+        return dict(ip_counts), rejected
+    requests = list(ip_counts.values())
+    keep = reasons == ROUTABLE
+    routable = {ips[i]: requests[i] for i in np.flatnonzero(keep).tolist()}
+    for i in np.flatnonzero(~keep).tolist():
+        rejected.add(ips[i], REASONS[reasons[i]], requests[i])
+    return routable, rejected
@@ -1,28 +1,227 @@
 #!/usr/bin/env python3
+import ipaddress
 import json
 import sys
+import threading
+from collections import Counter
+from collections.abc import Iterable
 
-import geoip2.database
+import geoip2.errors
+
+from ip_visualizer.core.cache import DEFAULT_LRU_SIZE, DEFAULT_PREFIX_CACHE_SIZE, MISSING, LRUCache, PrefixCache
+from ip_visualizer.core.geoip_reader import get_reader, get_reader_manager
+from ip_visualizer.core.persistent_cache import DEFAULT_PERSISTENT_CACHE_SIZE, PersistentCache
+
+LocationRecord = dict[str, str | float | None]
+
+# Fields reported by lookup_ip; cached records also carry the ISO country and continent codes
+LOOKUP_FIELDS = ("city", "country", "latitude", "longitude", "timezone", "postal_code", "continent")
+
+_result_cache = LRUCache(DEFAULT_LRU_SIZE)
+_prefix_cache = PrefixCache(DEFAULT_PREFIX_CACHE_SIZE)
+# Reader generation the in-memory caches were filled from, see _drop_stale_results
+_cache_generation: int | None = None
+# Optional on-disk cache shared across runs, see configure_persistent_cache
+_persistent_cache: PersistentCache | None = None
+# Database queries that found nothing, by reason: not_found, malformed or error
+_failures: Counter[str] = Counter()
+_failures_lock = threading.Lock()
+
+
+def _count_failure(reason: str):
+    with _failures_lock:
+        _failures[reason] += 1
+
+
+def _record_from_response(response) -> LocationRecord:
+    """Extract the fields we report from a geoip2 City response."""
+    return {
+        "city": response.city.name,
+        "country": response.country.name,
+        "latitude": response.location.latitude,
+        "longitude": response.location.longitude,
+        "timezone": response.location.time_zone,
+        "postal_code": response.postal.code,
+        "continent": response.continent.name,
+        "country_code": response.country.iso_code,
+        "continent_code": response.continent.code,
+    }
+
+
+def lookup_result(ip: str, record: LocationRecord | None) -> dict[str, str | float | None]:
+    """Format a record from `resolve_ips` as `lookup_ip` reports it: empty if it couldn't be located."""
+    if record is None:
+        return {}
+    return {"ip": ip, **{field: record[field] for field in LOOKUP_FIELDS}}
+
+
+def _query_database(reader, ip: str) -> tuple[LocationRecord | None, bool]:
+    """Query the reader for one address, returning (record, cacheable)."""
+    network = None
+    try:
+        response = reader.city(ip)
+        record = _record_from_response(response)
+        network = response.traits.network
+    except geoip2.errors.AddressNotFoundError as e:
+        _count_failure("not_found")
+        record = None
+        network = e.network
+    except ValueError:
+        _count_failure("malformed")
+        record = None
+    except Exception:
+        # Not cached: the failure may be transient (e.g. a database being replaced)
+        _count_failure("error")
+        return None, False
+
+    if isinstance(network, ipaddress.IPv4Network | ipaddress.IPv6Network):
+        _prefix_cache.put(network, record)
+    return record, True
+
+
+def resolve_ips(ip_addresses: Iterable[str]) -> dict[str, LocationRecord | None]:
+    """
+    Resolve each distinct IP address to its location record, or None if it can't be located.
+
+    Repeated addresses are served from an LRU cache, and addresses inside a network block
+    that has already been resolved are served from a prefix cache. If a persistent cache is
+    configured, the remaining addresses are looked up there in one batch; only what is
+    left queries the GeoLite2 database. Addresses that are not in the database (or are
+    malformed) are cached as None. Raises FileNotFoundError if the database is needed but
+    missing.
+
+    The in-memory caches are emptied whenever the database is reloaded, so an updated
+    database is never hidden behind results from the previous one.
+    """
+    _drop_stale_results()
+    results: dict[str, LocationRecord | None] = {}
+    pending = []
+    for ip in dict.fromkeys(ip_addresses):
+        record = _result_cache.get(ip)
+        if record is MISSING:
+            record = _prefix_cache.get(ip)
+            if record is MISSING:
+                pending.append(ip)
+            else:
+                _result_cache.put(ip, record)
+        # Pending addresses hold MISSING for now, which keeps the results in input order
+        results[ip] = record
+    if pending:
+        _resolve_pending(pending, results)
+    return results
+
+
+def _drop_stale_results():
+    """Empty the in-memory caches if the database was reloaded (or closed) since they were filled."""
+    global _cache_generation  # noqa: PLW0603
+    generation = get_reader_manager().current_generation()
+    if generation != _cache_generation:
+        # The counters keep running, so hit rates still cover the whole process
+        _result_cache.clear(reset_stats=False)
+        _prefix_cache.clear(reset_stats=False)
+        _cache_generation = generation
+
+
+def _resolve_pending(pending: list[str], results: dict[str, LocationRecord | None]):
+    """Fill in `results` for addresses missing from the in-memory caches."""
+    reader = get_reader()
+    persistent_cache = _persistent_cache
+    if persistent_cache is not None:
+        persistent_cache.ensure_epoch(reader.metadata().build_epoch)
+        for ip, record in persistent_cache.get_many(pending).items():
+            _result_cache.put(ip, record)
+            results[ip] = record
+
+    resolved: dict[str, LocationRecord | None] = {}
+    for ip in pending:
+        if results[ip] is not MISSING:
+            continue
+        # Earlier queries in this batch may have cached the network this address is in
+        record = _prefix_cache.get(ip)
+        cacheable = True
+        if record is MISSING:
+            record, cacheable = _query_database(reader, ip)
+        if cacheable:
+            _result_cache.put(ip, record)
+            resolved[ip] = record
+        results[ip] = record
+
+    if persistent_cache is not None:
+        persistent_cache.put_many(resolved)
+
+
+def lookup_ips(ip_addresses: Iterable[str]) -> dict[str, dict[str, str | float | None]]:
+    """Look up many IP addresses at once; failed lookups map to an empty dict."""
+    distinct_ips = list(dict.fromkeys(ip_addresses))
+    try:
+        records = resolve_ips(distinct_ips)
+    except Exception as e:
+        print(f"Error looking up IPs: {e!s}")
+        return {ip: {} for ip in distinct_ips}
+    return {ip: lookup_result(ip, record) for ip, record in records.items()}
 
 
 def lookup_ip(ip: str) -> dict[str, str | float | None]:
     """Look up an IP address in the GeoLite2 database."""
     try:
-        with geoip2.database.Reader("./data/GeoLite2-City.mmdb") as reader:
-            response = reader.city(ip)
-            return {
-                "ip": ip,
-                "city": response.city.name,
-                "country": response.country.name,
-                "latitude": response.location.latitude,
-                "longitude": response.location.longitude,
-                "timezone": response.location.time_zone,
-                "postal_code": response.postal.code,
-                "continent": response.continent.name,
-            }
+        record = resolve_ips([ip])[ip]
     except Exception as e:
         print(f"Error looking up IP {ip}: {e!s}")
         return {}
+    return lookup_result(ip, record)
+
+
+def cache_stats() -> dict[str, int]:
+    """Return the hit/miss/eviction counters of the per-IP lookup result cache."""
+    return _result_cache.stats()
+
+
+def prefix_cache_stats() -> dict[str, int]:
+    """Return the hit/miss/eviction counters of the network prefix cache."""
+    return _prefix_cache.stats()
+
+
+def configure_cache(maxsize: int = DEFAULT_LRU_SIZE, prefix_maxsize: int = DEFAULT_PREFIX_CACHE_SIZE):
+    """Resize the lookup caches, dropping their current contents."""
+    global _result_cache, _prefix_cache  # noqa: PLW0603
+    _result_cache = LRUCache(maxsize)
+    _prefix_cache = PrefixCache(prefix_maxsize)
+
+
+def configure_persistent_cache(path: str | None, maxsize: int = DEFAULT_PERSISTENT_CACHE_SIZE):
+    """Use an on-disk cache at `path` in addition to the in-memory ones, or turn it off with None."""
+    global _persistent_cache  # noqa: PLW0603
+    if _persistent_cache is not None:
+        _persistent_cache.close()
+    _persistent_cache = None if path is None else PersistentCache(path, maxsize)
+
+
+def get_persistent_cache() -> PersistentCache | None:
+    """Return the on-disk cache, if one is configured."""
+    return _persistent_cache
+
+
+def persistent_cache_stats() -> dict[str, int] | None:
+    """Return the counters of the on-disk cache, or None if there is none."""
+    return None if _persistent_cache is None else _persistent_cache.stats()
+
+
+def failure_stats() -> dict[str, int]:
+    """Return how many database queries found nothing, by reason (not_found, malformed, error)."""
+    with _failures_lock:
+        return {reason: _failures[reason] for reason in ("not_found", "malformed", "error")}
+
+
+def clear_failure_stats():
+    """Reset the counters of `failure_stats`."""
+    with _failures_lock:
+        _failures.clear()
+
+
+def clear_cache():
+    """Drop all cached lookup results."""
+    _result_cache.clear()
+    _prefix_cache.clear()
 
 
 REQUIRED_ARG_COUNT = 2
@@ -0,0 +1,211 @@
+"""Bulk parsing of IP address strings into integer arrays."""
+
+import ipaddress
+from collections.abc import Iterable, Sized
+from dataclasses import dataclass
+
+import numpy as np
+
+# Longest string worth parsing: "[" + a full IPv6 address with an IPv4 tail + "]:65535"
+MAX_IP_LENGTH = 53
+MAX_OCTET = 255
+MAX_OCTET_DIGITS = 3
+IPV4 = 4
+IPV6 = 6
+INVALID = 0
+
+_DOT = ord(".")
+_COLON = ord(":")
+_ZERO = ord("0")
+_NINE = ord("9")
+_LOW_64 = (1 << 64) - 1
+
+# "0.".."255." and "0".."255", indexed by octet, for building dotted quads without a Python loop
+_OCTET_DOT = np.array([f"{i}." for i in range(256)], dtype=object)
+_OCTET = np.array([str(i) for i in range(256)], dtype=object)
+
+
+def format_ips(ip_array: np.ndarray) -> list[str]:
+    """Convert a uint32 array of IPv4 addresses to dotted-quad strings."""
+    ip_array = np.asarray(ip_array, dtype=np.uint32)
+    dotted = (
+        _OCTET_DOT[ip_array >> 24]
+        + _OCTET_DOT[(ip_array >> 16) & 0xFF]
+        + _OCTET_DOT[(ip_array >> 8) & 0xFF]
+        + _OCTET[ip_array & 0xFF]
+    )
+    return dotted.tolist()
+
+
+@dataclass(frozen=True)
+class ParsedIPs:
+    """
+    Parsed addresses as parallel arrays, one row per input string.
+
+    `version` is 4, 6 or 0 for rows that are not a valid address. IPv4 addresses are held in
+    `low`; IPv6 addresses are split into `high` and `low` 64-bit halves.
+    """
+
+    version: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.version)
+
+    @property
+    def valid(self) -> np.ndarray:
+        return self.version != INVALID
+
+    @property
+    def is_ipv4(self) -> np.ndarray:
+        return self.version == IPV4
+
+    @property
+    def is_ipv6(self) -> np.ndarray:
+        return self.version == IPV6
+
+    def ipv4(self) -> np.ndarray:
+        """The IPv4 rows as a uint32 array."""
+        return self.low[self.is_ipv4].astype(np.uint32)
+
+    def ipv6(self) -> np.ndarray:
+        """The IPv6 rows as an (n, 2) uint64 array of (high, low) halves, which sorts like the addresses."""
+        rows = self.is_ipv6
+        return np.column_stack((self.high[rows], self.low[rows]))
+
+    def value_counts(self) -> dict[str, int]:
+        """
+        Count each distinct valid address, keyed by its canonical string form.
+
+        IPv4 addresses come first, then IPv6, each in order of first appearance.
+        """
+        counts: dict[str, int] = {}
+        ipv4, first, ipv4_counts = np.unique(self.ipv4(), return_index=True, return_counts=True)
+        order = np.argsort(first)
+        counts.update(zip(format_ips(ipv4[order]), ipv4_counts[order].tolist(), strict=True))
+        if self.is_ipv6.any():
+            ipv6, first, ipv6_counts = np.unique(self.ipv6(), axis=0, return_index=True, return_counts=True)
+            order = np.argsort(first)
+            addresses = (str(ipaddress.IPv6Address((int(high) << 64) | int(low))) for high, low in ipv6[order].tolist())
+            counts.update(zip(addresses, ipv6_counts[order].tolist(), strict=True))
+        return counts
+
+
+def _to_bytes(values: Iterable) -> np.ndarray:
+    """
+    Lay the strings out as an (n, width) uint8 array of ASCII characters, zero-padded on the right.
+
+    NumPy converts the whole column in one call; None and NaN become "None" and "nan",
+    which parse as invalid anyway. Only if a value is non-ASCII or longer than any address
+    are values checked one by one, and those become empty, invalid rows.
+    """
+    if not isinstance(values, Sized):
+        values = list(values)
+    try:
+        array = np.array(values, dtype="S")
+    except UnicodeEncodeError:
+        array = None
+    if array is None or array.itemsize > MAX_IP_LENGTH:
+        strings = [
+            value if isinstance(value, str) and len(value) <= MAX_IP_LENGTH and value.isascii() else ""
+            for value in values
+        ]
+        array = np.array(strings, dtype=f"S{max(1, max(map(len, strings), default=0))}")
+    return array.view(np.uint8).reshape(len(array), array.itemsize)
+
+
+def _parse_ipv4(chars: np.ndarray, end: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse the first `end` characters of each row as a dotted quad.
+
+    Returns the uint64 values and a mask of rows that are well-formed: four fields of 1-3
+    digits, each at most 255 and without leading zeros (as `ipaddress` requires).
+    """
+    rows, width = chars.shape
+    active = np.arange(width) < end[:, None]
+    is_dot = active & (chars == _DOT)
+    is_digit = active & ((chars - np.uint8(_ZERO)) <= 9)  # noqa: PLR2004
+    ok = (end > 0) & np.all(~active | is_digit | is_dot, axis=1) & (is_dot.sum(axis=1) == 3)  # noqa: PLR2004
+
+    # With exactly three dots per row, the dot columns come out of nonzero three per row
+    candidates = np.nonzero(ok)[0]
+    dots = np.nonzero(is_dot[candidates])[1].reshape(-1, 3)
+    starts = np.column_stack((np.zeros(len(candidates), dtype=np.intp), dots + 1))
+    lengths = np.column_stack((dots, end[candidates])) - starts
+    valid = np.all((lengths >= 1) & (lengths <= MAX_OCTET_DIGITS), axis=1)
+
+    # Gather up to three digits per field and combine them by the field's length
+    digits = chars[candidates]
+    first, second, third = (
+        np.take_along_axis(digits, np.minimum(starts + offset, width - 1), axis=1).astype(np.int64) - _ZERO
+        for offset in range(MAX_OCTET_DIGITS)
+    )
+    octets = np.select([lengths == 1, lengths == 2], [first, first * 10 + second], first * 100 + second * 10 + third)  # noqa: PLR2004
+    valid &= np.all((octets <= MAX_OCTET) & ~((lengths > 1) & (first == 0)), axis=1)
+    ok[candidates] = valid
+
+    values = np.zeros(rows, dtype=np.uint64)
+    values[candidates] = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    values[~ok] = 0
+    return values, ok
+
+
+def _is_port(text: str) -> bool:
+    return text.isascii() and text.isdigit()
+
+
+def _parse_ipv6(text: str, strip_ports: bool) -> int | None:
+    """Parse one IPv6 address, optionally written as "[address]:port"; None if invalid."""
+    if text.startswith("["):
+        address, bracket, port = text[1:].partition("]")
+        if not bracket or not strip_ports or (port and not (port[0] == ":" and _is_port(port[1:]))):
+            return None
+        text = address
+    try:
+        return int(ipaddress.IPv6Address(text))
+    except ValueError:
+        return None
+
+
+def parse_ips(values: Iterable, strip_ports: bool = True) -> ParsedIPs:
+    """
+    Parse a column of address strings into integer arrays, marking invalid rows instead of raising.
+
+    IPv4 addresses are parsed for the whole column at once in NumPy. With `strip_ports`,
+    "a.b.c.d:port" and "[v6 address]:port" are accepted and the port dropped. IPv6
+    addresses, which are rare in most logs, go through `ipaddress` one by one. Anything
+    else, including None/NaN, is invalid.
+    """
+    chars = _to_bytes(values)
+    rows, width = chars.shape
+    columns = np.arange(width)
+
+    is_colon = chars == _COLON
+    colons = is_colon.sum(axis=1)
+    length = np.count_nonzero(chars, axis=1)
+    first_colon = np.where(colons > 0, np.argmax(is_colon, axis=1), length)
+
+    # One colon can only be an IPv4 address with a port; more means IPv6
+    ipv6_candidate = (colons > 1) | (chars[:, 0] == ord("["))
+    end = np.where(colons == 1, first_colon, length)
+    port_ok = np.ones(rows, dtype=bool)
+    if strip_ports:
+        after_colon = (columns > first_colon[:, None]) & (columns < length[:, None])
+        is_digit = (chars >= _ZERO) & (chars <= _NINE)
+        port_ok = np.all(~after_colon | is_digit, axis=1) & (length > first_colon + 1)
+    ipv4_rows = ~ipv6_candidate & ((colons == 0) | (strip_ports & (colons == 1) & port_ok))
+
+    values4, ok4 = _parse_ipv4(chars, np.where(ipv4_rows, end, 0))
+    version = np.where(ok4, IPV4, INVALID).astype(np.uint8)
+    high = np.zeros(rows, dtype=np.uint64)
+    low = values4
+
+    for row in np.nonzero(ipv6_candidate)[0].tolist():
+        text = chars[row, : length[row]].tobytes().decode("ascii")
+        address = _parse_ipv6(text, strip_ports)
+        if address is not None:
+            version[row] = IPV6
+            high[row] = address >> 64
+            low[row] = address & _LOW_64
+    return ParsedIPs(version=version, high=high, low=low)
@@ -7,82 +7,617 @@
 # "geoip2==5.1.0",
 # ]
 # ///
-from collections import defaultdict
+from collections import Counter
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
 
-import folium
-import geoip2.database
-import pandas as pd
-from folium.plugins import HeatMap
+import numpy as np
 
+from ip_visualizer.core.binning import (
+    DEFAULT_MAX_POINTS,
+    DEFAULT_MAX_ZOOM,
+    DEFAULT_MIN_ZOOM,
+    Grid,
+    bin_locations,
+    cap_points,
+)
+from ip_visualizer.core.choropleth import DEFAULT_BOUNDARY_KEY, create_choropleth, load_boundaries
+from ip_visualizer.core.geo_index import GeoIndex, ensure_index, index_coordinates, locate_ip_counts
+from ip_visualizer.core.geoip_reader import get_reader_manager
+from ip_visualizer.core.heatmap_state import HeatmapState, load_state, load_state_grid, save_state
+from ip_visualizer.core.instrumentation import add_busy_time, count, file_size, stage
+from ip_visualizer.core.ip_filter import RejectedIPs, split_routable
 from ip_visualizer.core.ip_generator import generate_ip_list
+from ip_visualizer.core.ip_lookup import cache_stats, failure_stats, get_persistent_cache, prefix_cache_stats
+from ip_visualizer.core.ip_parse import parse_ips
+from ip_visualizer.core.locations import LocationSet
+from ip_visualizer.core.log_files import (
+    DEFAULT_READERS,
+    READ_ERRORS,
+    expand_inputs,
+    iter_file_chunks,
+    iter_file_frames,
+    iter_files_chunks,
+    read_concurrently,
+)
+from ip_visualizer.core.parallel_lookup import (
+    locate_parallel,
+    locate_shard,
+    resolve_coordinates,
+    resolve_coordinates_parallel,
+)
+from ip_visualizer.core.time_windows import (
+    DEFAULT_TIME_COLUMN,
+    DEFAULT_WINDOW_MAX_POINTS,
+    WindowCounts,
+    count_windows,
+    create_timeline_heatmap,
+    parse_interval,
+)
 
+DEFAULT_IP_COLUMN = "_source.cg.detail.remote_addr"
+HEATMAP_FILE = "ip_heatmap.html"
+DEFAULT_CHUNK_SIZE = 500_000
 
-def load_ip_data_from_csv(csv_file: str) -> list[str]:
-    """Load IP addresses from CSV file."""
-    print("Loading data from CSV...")
-    df = pd.read_csv(csv_file)
-    return df["_source.cg.detail.remote_addr"].dropna().unique()
 
+def count_ips_in_csv(
+    csv_file: str,
+    column: str = DEFAULT_IP_COLUMN,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    remove_ports: bool = True,
+) -> Counter[str]:
+    """
+    Count requests per IP address in a CSV file; memory grows with distinct IPs, not file size.
 
-def get_ip_locations(ip_addresses: list[list[float]]) -> list[list[float]]:
-    """Convert IP addresses to geographical coordinates using MaxMind GeoLite2 database."""
+    Addresses are counted in their canonical form, so "8.8.8.8:443" and "8.8.8.8" are one
+    address. Rows that are not a valid address are skipped and reported. The one-file case
+    of `count_ips_in_files`.
+    """
+    return count_ips_in_files([Path(csv_file)], column, chunksize, remove_ports=remove_ports)
+
+
+def count_ips_in_files(
+    paths: Sequence[Path],
+    column: str = DEFAULT_IP_COLUMN,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    readers: int = DEFAULT_READERS,
+    remove_ports: bool = True,
+) -> Counter[str]:
+    """
+    Count requests per IP address over many CSV or NDJSON files, each optionally gzip/zstd compressed.
+
+    Up to `readers` files are read and parsed at once in threads and their counts combined,
+    so one run (and one database open) covers any number of shards. See `iter_file_chunks`.
+    """
+    print(f"Loading data from {len(paths)} files...")
+
+    def count_file(path: Path) -> Iterator[tuple[dict[str, int], int, int]]:
+        for chunk in iter_file_chunks(path, column, chunksize):
+            parsed = parse_ips(chunk, strip_ports=remove_ports)
+            yield parsed.value_counts(), len(parsed), len(parsed) - int(parsed.valid.sum())
+
+    counts: Counter[str] = Counter()
+    invalid = 0
+    for chunk_counts, chunk_rows, chunk_invalid in read_concurrently(paths, count_file, readers):
+        counts.update(chunk_counts)
+        invalid += chunk_invalid
+        count(rows_read=chunk_rows)
+    count(files=len(paths), invalid_rows=invalid)
+    if invalid:
+        print(f"Skipped {invalid} rows that are not valid IP addresses")
+    return counts
+
+
+def count_ips_per_window(  # noqa: PLR0913
+    paths: Sequence[Path],
+    interval: int,
+    column: str = DEFAULT_IP_COLUMN,
+    time_column: str = DEFAULT_TIME_COLUMN,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    readers: int = DEFAULT_READERS,
+    remove_ports: bool = True,
+) -> WindowCounts:
+    """
+    Count requests per time window of `interval` nanoseconds and IP address over many files.
+
+    Addresses and timestamps are read together, so each file is read once however many
+    windows it spans. Otherwise like `count_ips_in_files`; see `count_windows`.
+    """
+    print(f"Loading timed data from {len(paths)} files...")
+
+    def count_file(path: Path) -> Iterator[tuple[WindowCounts, int]]:
+        for frame in iter_file_frames(path, [column, time_column], chunksize):
+            yield count_windows(frame[column], frame[time_column], interval, remove_ports), len(frame)
+
+    windows = WindowCounts(interval)
+    for chunk_windows, chunk_rows in read_concurrently(paths, count_file, readers):
+        windows.update(chunk_windows)
+        count(rows_read=chunk_rows)
+    count(files=len(paths), invalid_rows=windows.invalid, untimed_rows=windows.untimed)
+    if windows.invalid:
+        print(f"Skipped {windows.invalid} rows that are not valid IP addresses")
+    if windows.untimed:
+        print(f"Skipped {windows.untimed} rows without a valid ISO 8601 timestamp in {time_column}")
+    return windows
+
+
+def load_ip_data_from_csv(
+    csv_file: str,
+    column: str = DEFAULT_IP_COLUMN,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    remove_ports: bool = True,
+) -> list[str]:
+    """Load the distinct IP addresses from a CSV file."""
+    return list(count_ips_in_csv(csv_file, column, chunksize, remove_ports))
+
+
+def get_ip_locations(
+    ip_addresses: Iterable[str] | Mapping[str, int],
+    workers: int = 1,
+    with_codes: bool = False,
+    index: GeoIndex | None = None,
+    rejected_file: str | None = None,
+) -> LocationSet:
+    """
+    Convert IP addresses to geographical coordinates using MaxMind GeoLite2 database.
+
+    `ip_addresses` is either a sequence of addresses (repeats allowed) or a mapping of
+    address to request count. Each distinct address is looked up once and the result has
+    one point per geolocated distinct address, carrying its request count. With `workers`
+    other than 1 the lookups are sharded across that many processes (0 means one per CPU).
+    `with_codes` also keeps each point's country and continent codes. With an `index`
+    (see `ensure_index`) all IPv4 addresses are resolved in one vectorised pass instead,
+    and only the IPv6 ones are looked up in the database.
+
+    Private, reserved, loopback and malformed addresses are set aside before any lookup
+    (see `split_routable`) and reported per reason; `rejected_file` receives a sample of them.
+    """
     print("Converting IPs to locations...")
-    locations = []
-    ip_counts = defaultdict(int)
+    occurrences, rejected = split_routable(Counter(ip_addresses))
+    report_rejected(rejected, rejected_file)
+    try:
+        locations = _locate_routable(occurrences, workers, with_codes, index)
+    except FileNotFoundError:
+        print("Error: GeoLite2-City.mmdb not found. Please download it from MaxMind.")
+        return LocationSet.empty(with_codes)
+    failed = len(occurrences) - len(locations)
+    if failed:
+        print(f"Could not locate {failed} addresses")
+    return locations
+
 
+def locate_windows(
+    windows: WindowCounts,
+    workers: int = 1,
+    index: GeoIndex | None = None,
+    rejected_file: str | None = None,
+) -> dict[int, LocationSet]:
+    """
+    Geolocate the requests of each time window, keyed by window start, including empty windows.
+
+    Like `get_ip_locations`, except the distinct addresses of all windows are looked up
+    together, once each and with at most one pool of `workers`, and each window's request
+    counts are then mapped onto those results. Returns an empty dict if the database is missing.
+    """
+    print(f"Converting IPs to locations in {len(windows.windows)} time windows...")
+    totals: Counter[str] = Counter()
+    for counts in windows.windows.values():
+        totals.update(counts)
+    occurrences, rejected = split_routable(totals)
+    report_rejected(rejected, rejected_file)
+    try:
+        coordinates = _locate_addresses(list(occurrences), workers, index)
+    except FileNotFoundError:
+        print("Error: GeoLite2-City.mmdb not found. Please download it from MaxMind.")
+        return {}
+    failed = int(np.isnan(coordinates[:, 0]).sum())
+    if failed:
+        print(f"Could not locate {failed} addresses")
+
+    rows = {ip: row for row, ip in enumerate(occurrences)}
+    window_locations: dict[int, LocationSet] = {}
+    for start in windows.starts():
+        counts = windows.windows.get(start, {})
+        # Rejected addresses have no row; -1 is dropped along with the ones that weren't located
+        window_rows = np.fromiter((rows.get(ip, -1) for ip in counts), dtype=np.int64, count=len(counts))
+        requests = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        keep = window_rows >= 0
+        keep[keep] = ~np.isnan(coordinates[window_rows[keep], 0])
+        points = coordinates[window_rows[keep]]
+        window_locations[start] = LocationSet.from_arrays(points[:, 0], points[:, 1], requests[keep])
+    return window_locations
+
+
+def _locate_addresses(ip_addresses: list[str], workers: int, index: GeoIndex | None) -> np.ndarray:
+    """
+    Latitude and longitude of each routable address as an (n, 2) array, NaN where it can't be located.
+
+    Counts the work like `_locate_routable`; raises FileNotFoundError if the database is missing.
+    """
+    counters_before = _lookup_counters()
+    if index is not None:
+        coordinates = index_coordinates(ip_addresses, index)
+    elif workers == 1:
+        coordinates = resolve_coordinates(ip_addresses)
+    else:
+        coordinates = resolve_coordinates_parallel(ip_addresses, workers or None)
+    counters = _lookup_counters_since(counters_before)
+    count(lookups=len(ip_addresses), failed_lookups=int(np.isnan(coordinates[:, 0]).sum()), **counters)
+    return coordinates
+
+
+def _locate_routable(
+    occurrences: dict[str, int],
+    workers: int,
+    with_codes: bool,
+    index: GeoIndex | None,
+) -> LocationSet:
+    """Look up routable addresses and count the work; raises FileNotFoundError if the database is missing."""
     # You'll need to download the GeoLite2 database from MaxMind
     # https://dev.maxmind.com/geoip/geolite2-free-geolocation-data
+    counters_before = _lookup_counters()
+    if index is not None:
+        locations = locate_ip_counts(occurrences, index, with_codes)
+    elif workers == 1:
+        locations = locate_shard(list(occurrences), list(occurrences.values()), with_codes)
+    else:
+        locations = locate_parallel(occurrences, workers or None, with_codes)
+    counters = _lookup_counters_since(counters_before)
+    count(lookups=len(occurrences), failed_lookups=len(occurrences) - len(locations), **counters)
+    return locations
+
+
+def _lookup_counters() -> dict[str, int]:
+    """Cache hits and failed queries in this process; those in worker processes aren't seen here."""
+    persistent_cache = get_persistent_cache()
+    failures = failure_stats()
+    return {
+        "cache_hits": cache_stats()["hits"],
+        "prefix_cache_hits": prefix_cache_stats()["hits"],
+        "persistent_cache_hits": 0 if persistent_cache is None else persistent_cache.hits,
+        "not_found": failures["not_found"],
+        "lookup_errors": failures["error"],
+    }
+
+
+def _lookup_counters_since(counters_before: dict[str, int]) -> dict[str, int]:
+    """How much each of `_lookup_counters` grew since `counters_before` was taken."""
+    return {name: value - counters_before[name] for name, value in _lookup_counters().items()}
+
+
+def report_rejected(rejected: RejectedIPs, rejected_file: str | None = None):
+    """Print and count the requests set aside before lookup, and write their sample to `rejected_file`."""
+    if rejected.total():
+        print(f"Skipped {rejected.total()} requests from addresses that can't be geolocated ({rejected.summary()})")
+    count(**{f"rejected_{reason}": requests for reason, requests in rejected.requests.items()})
+    if rejected_file:
+        rejected.write(rejected_file)
+        print(f"Sample of {len(rejected.sample)} rejected addresses written to {rejected_file}")
+
+
+def locate_files_pipelined(  # noqa: PLR0913
+    paths: Sequence[Path],
+    column: str = DEFAULT_IP_COLUMN,
+    workers: int = 1,
+    index: GeoIndex | None = None,
+    readers: int = DEFAULT_READERS,
+    rejected_file: str | None = None,
+    with_codes: bool = False,
+) -> LocationSet:
+    """
+    Read, parse, geolocate and aggregate many files chunk by chunk, with the stages overlapping.
+
+    Files are read `readers` at a time (see `count_ips_in_files`); see `run_pipeline`. The
+    result has one point per distinct coordinate.
+    """
+    print(f"Loading and geolocating data from {len(paths)} files...")
+    chunks = iter_files_chunks(paths, column, DEFAULT_CHUNK_SIZE, readers)
+    return _locate_pipelined(chunks, workers, index, rejected_file, with_codes)
+
+
+def _locate_pipelined(
+    chunks: Iterable,
+    workers: int,
+    index: GeoIndex | None,
+    rejected_file: str | None,
+    with_codes: bool = False,
+) -> LocationSet:
+    # Only --pipeline runs need asyncio
+    from ip_visualizer.core.pipeline import run_pipeline
+
+    counters_before = _lookup_counters()
     try:
-        with geoip2.database.Reader("./data/GeoLite2-City.mmdb") as reader:
-            for ip in ip_addresses:
-                try:
-                    response = reader.city(ip)
-                    lat = response.location.latitude
-                    lon = response.location.longitude
-                    if lat and lon:
-                        locations.append([lat, lon])
-                        ip_counts[(lat, lon)] += 1
-                except Exception as e:
-                    print(f"Error looking up IP {ip}: {e!s}")
-                    continue
+        result = run_pipeline(chunks, workers=workers, with_codes=with_codes, index=index)
     except FileNotFoundError:
         print("Error: GeoLite2-City.mmdb not found. Please download it from MaxMind.")
+        return LocationSet.empty(with_codes)
+    # Chunks are counted separately, so an address seen in several is counted (and looked up) in each
+    lookups = sum(result.distinct_per_chunk)
+    count(
+        rows_read=result.requests + result.invalid,
+        invalid_rows=result.invalid,
+        requests=result.requests,
+        distinct_ips=lookups,
+        lookups=lookups,
+        failed_lookups=lookups - result.located,
+        chunks=result.chunks,
+        located_points=len(result.locations),
+        **_lookup_counters_since(counters_before),
+    )
+    add_busy_time(**result.busy_seconds)
+    if result.invalid:
+        print(f"Skipped {result.invalid} rows that are not valid IP addresses")
+    report_rejected(result.rejected, rejected_file)
+    print(f"Processed {result.requests} requests in {result.chunks} chunks")
+    return result.locations
+
+
+def update_state_file(state_file: str, locations: LocationSet, grid: Grid | None = None) -> LocationSet:
+    """
+    Merge a batch of points into the aggregation state saved at `state_file` and return all of its points.
+
+    A new state is started on `grid` (or the default fine grid) if the file doesn't exist
+    yet. The result has one point per non-empty cell, covering every batch merged so far,
+    so only new data has to be geolocated on each run.
+    """
+    path = Path(state_file)
+    state = load_state(path) if path.exists() else HeatmapState.empty(grid)
+    _check_state_grid(state_file, state.grid, grid)
+    if len(locations):
+        state = state.update(locations)
+        save_state(state, path)
+        count(bytes_written=file_size(path))
+    count(state_cells=len(state), state_requests=state.total())
+    print(f"Heatmap state {state_file} holds {state.total()} requests from {state.batches} batches")
+    return state.to_locations()
+
+
+def check_state_file(state_file: str | None, grid: Grid | None = None):
+    """Raise ValueError if the state saved at `state_file` can't take batches binned on `grid`."""
+    if state_file and grid is not None and Path(state_file).exists():
+        _check_state_grid(state_file, load_state_grid(state_file), grid)
 
-    return locations, ip_counts
 
+def _check_state_grid(state_file: str, state_grid: Grid, grid: Grid | None):
+    if grid is not None and grid != state_grid:
+        raise ValueError(f"{state_file} is binned on a different grid; drop --cell-size/--geohash-precision")
+
+
+def create_heatmap(
+    locations: LocationSet,
+    grid: Grid | None = None,
+    max_points: int | None = DEFAULT_MAX_POINTS,
+):
+    """
+    Create an interactive heatmap using Folium.
+
+    Points are aggregated per distinct coordinate, or per `grid` cell if one is given, and
+    at most `max_points` of the heaviest points are written so the HTML stays small.
+    """
+    import folium
+    from folium.plugins import HeatMap
 
-def create_heatmap(locations: list[list[float]], ip_counts: dict[tuple[float, float], int]):
-    """Create an interactive heatmap using Folium."""
     print("Creating heatmap...")
     # Create a map centered at a default location
     m = folium.Map(location=[20, 0], zoom_start=2)
 
-    # Add heatmap layer
-    heat_data = [[lat, lon, count] for (lat, lon), count in ip_counts.items()]
-    heat_map = HeatMap(heat_data)
+    # Add heatmap layer, one weighted point per distinct coordinate or grid cell
+    if grid is None:
+        points = locations.aggregate()
+        if max_points is not None:
+            points = cap_points(points, max_points)
+    else:
+        points = bin_locations(locations, grid, max_points)
+    heat_map = HeatMap(points.heat_data())
     heat_map.add_to(m)
 
     # Save the map
-    m.save("ip_heatmap.html")
-    print("Map saved as ip_heatmap.html")
+    m.save(HEATMAP_FILE)
+    count(bins_emitted=len(points), bytes_written=file_size(HEATMAP_FILE))
+    print(f"Map saved as {HEATMAP_FILE}")
+
 
+def create_tiled_heatmap(
+    locations: LocationSet,
+    min_zoom: int = DEFAULT_MIN_ZOOM,
+    max_zoom: int = DEFAULT_MAX_ZOOM,
+    max_points: int | None = DEFAULT_MAX_POINTS,
+):
+    """
+    Create a zoomable heatmap whose data is pre-aggregated per zoom level.
 
-def main():
-    # Load IP addresses from CSV
-    # csv_file = "path_to_my_csv_file.csv"
-    # ip_addresses = load_ip_data(csv_file)
-    # Remove ":[port]" from the IP addresses
-    # ip_addresses = [ip.split(":")[0] for ip in ip_addresses]
-    ip_addresses = generate_ip_list(total_ips=100)
-    print(f"Found {len(ip_addresses)} unique IP addresses")
+    The levels are written next to the HTML file in a `<name>_tiles` directory and the map
+    loads only the level for the current zoom, so the page itself stays tiny.
+    """
+    import folium
+
+    from ip_visualizer.core.tiled_heatmap import TiledHeatMap, build_pyramid, write_pyramid
+
+    print("Creating tiled heatmap...")
+    m = folium.Map(location=[20, 0], zoom_start=2)
+
+    pyramid = build_pyramid(locations, min_zoom, max_zoom, max_points)
+    tiles_dir = Path(HEATMAP_FILE).stem + "_tiles"
+    paths = write_pyramid(pyramid, Path(HEATMAP_FILE).parent / tiles_dir)
+    TiledHeatMap(list(pyramid), base_url=tiles_dir).add_to(m)
+
+    m.save(HEATMAP_FILE)
+    count(bins_emitted=sum(map(len, pyramid.values())), bytes_written=file_size(HEATMAP_FILE, *paths))
+    print(f"Map saved as {HEATMAP_FILE} with {len(paths)} zoom levels in {tiles_dir}/")
+
+
+def locate_requests(  # noqa: PLR0913
+    paths: Sequence[Path],
+    column: str = DEFAULT_IP_COLUMN,
+    workers: int = 1,
+    index: GeoIndex | None = None,
+    pipeline: bool = False,
+    readers: int = DEFAULT_READERS,
+    rejected_file: str | None = None,
+    with_codes: bool = False,
+) -> LocationSet:
+    """
+    Geolocate the requests in the files at `paths`, or 100 random addresses if there are none.
+
+    `with_codes` keeps each point's country and continent codes, e.g. for `create_choropleth`.
+    """
+    if paths and pipeline:
+        with stage("pipeline"):
+            return locate_files_pipelined(paths, column, workers, index, readers, rejected_file, with_codes)
+    with stage("read"):
+        if paths:
+            ip_addresses = count_ips_in_files(paths, column, readers=readers)
+        else:
+            ip_addresses = Counter(generate_ip_list(total_ips=100))
+        count(requests=ip_addresses.total(), distinct_ips=len(ip_addresses))
+    print(f"Found {len(ip_addresses)} unique IP addresses in {ip_addresses.total()} requests")
 
     # Convert IPs to locations
-    locations, ip_counts = get_ip_locations(ip_addresses)
-    if locations:
+    with stage("lookup"):
+        return get_ip_locations(ip_addresses, workers, with_codes, index, rejected_file)
+
+
+def locate_requests_per_window(  # noqa: PLR0913
+    paths: Sequence[Path],
+    interval: int,
+    column: str = DEFAULT_IP_COLUMN,
+    time_column: str = DEFAULT_TIME_COLUMN,
+    workers: int = 1,
+    index: GeoIndex | None = None,
+    readers: int = DEFAULT_READERS,
+    rejected_file: str | None = None,
+) -> dict[int, LocationSet]:
+    """
+    Geolocate the requests in the files at `paths` per time window of `interval` nanoseconds.
+
+    Raises ValueError if the requests span too many windows (see `WindowCounts.starts`).
+    """
+    with stage("read"):
+        windows = count_ips_per_window(paths, interval, column, time_column, readers=readers)
+        count(requests=windows.total(), windows=len(windows.windows))
+        # Refuse an interval too fine for the time span before any lookups are spent
+        windows.starts()
+    print(f"Found {windows.total()} requests in {len(windows.windows)} time windows")
+
+    with stage("lookup"):
+        return locate_windows(windows, workers, index, rejected_file)
+
+
+def _open_index() -> GeoIndex | None:
+    """The database's index, built on first use; None if the database is missing."""
+    try:
+        with stage("index"):
+            return ensure_index(get_reader_manager().db_path)
+    except FileNotFoundError:
+        print("Error: GeoLite2-City.mmdb not found. Please download it from MaxMind.")
+        return None
+
+
+def _timeline_interval(interval: str | None, paths: Sequence[Path]) -> int | None:
+    if interval is None:
+        return None
+    if not paths:
+        raise ValueError("a time-windowed heatmap needs log files with timestamps")
+    return parse_interval(interval)
+
+
+def visualize_timeline(  # noqa: PLR0913
+    paths: Sequence[Path],
+    interval: int,
+    column: str = DEFAULT_IP_COLUMN,
+    time_column: str = DEFAULT_TIME_COLUMN,
+    workers: int = 1,
+    index: GeoIndex | None = None,
+    readers: int = DEFAULT_READERS,
+    rejected_file: str | None = None,
+    grid: Grid | None = None,
+    max_points: int | None = DEFAULT_WINDOW_MAX_POINTS,
+):
+    """Geolocate the requests per time window (see `locate_requests_per_window`) and render them on a time slider."""
+    try:
+        window_locations = locate_requests_per_window(
+            paths, interval, column, time_column, workers, index, readers, rejected_file
+        )
+    except READ_ERRORS as error:
+        print(f"Error: {error}")
+        return
+    located = sum(map(len, window_locations.values()))
+    if not located:
+        print("Failed to create visualization due to missing GeoLite2 database")
+        return
+    print(f"Successfully geolocated {located} IP addresses over {len(window_locations)} time windows")
+    with stage("render"):
+        create_timeline_heatmap(window_locations, grid, max_points)
+
+
+def main(  # noqa: PLR0913
+    csv_file: str | None = None,
+    column: str = DEFAULT_IP_COLUMN,
+    workers: int = 1,
+    grid: Grid | None = None,
+    max_points: int | None = DEFAULT_MAX_POINTS,
+    *,
+    tiled: bool = False,
+    max_zoom: int = DEFAULT_MAX_ZOOM,
+    use_index: bool = False,
+    pipeline: bool = False,
+    state_file: str | None = None,
+    inputs: Sequence[str] = (),
+    readers: int = DEFAULT_READERS,
+    rejected_file: str | None = None,
+    choropleth: str | None = None,
+    boundaries: str | None = None,
+    boundary_key: str = DEFAULT_BOUNDARY_KEY,
+    interval: str | None = None,
+    time_column: str = DEFAULT_TIME_COLUMN,
+    window_max_points: int | None = DEFAULT_WINDOW_MAX_POINTS,
+):
+    try:
+        paths = expand_inputs([csv_file, *inputs] if csv_file else inputs)
+        # Checked before any lookups are spent on a map that can't be drawn
+        boundary_data = load_boundaries(boundaries, boundary_key) if choropleth and boundaries else None
+        interval_length = _timeline_interval(interval, paths)
+        check_state_file(state_file, grid)
+    except (OSError, ValueError) as error:
+        print(f"Error: {error}")
+        return
+
+    index = None
+    if use_index and (index := _open_index()) is None:
+        return
+
+    if interval_length is not None:
+        visualize_timeline(
+            paths, interval_length, column, time_column, workers, index, readers, rejected_file, grid, window_max_points
+        )
+        return
+
+    try:
+        if state_file and not paths:
+            # Re-render the saved state without adding a batch
+            locations = LocationSet.empty()
+        else:
+            locations = locate_requests(
+                paths, column, workers, index, pipeline, readers, rejected_file, with_codes=choropleth is not None
+            )
+        if state_file:
+            with stage("state"):
+                locations = update_state_file(state_file, locations, grid)
+    except READ_ERRORS as error:
+        print(f"Error: {error}")
+        return
+
+    if len(locations):
         print(f"Successfully geolocated {len(locations)} IP addresses")
 
         # Create and save the heatmap
-        create_heatmap(locations, ip_counts)
+        with stage("render"):
+            if choropleth:
+                create_choropleth(locations, choropleth, boundary_data, boundary_key)
+            elif tiled:
+                create_tiled_heatmap(locations, max_zoom=max_zoom, max_points=max_points)
+            else:
+                create_heatmap(locations, grid, max_points)
     else:
         print("Failed to create visualization due to missing GeoLite2 database")
 
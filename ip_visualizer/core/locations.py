@@ -0,0 +1,127 @@
+"""Columnar, NumPy-backed storage for geolocated points."""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+COORDINATE_DTYPE = np.float32
+COUNT_DTYPE = np.uint64
+COUNTRY_DTYPE = np.uint16
+CONTINENT_DTYPE = np.uint8
+
+# Index 0 is reserved for "unknown"
+CONTINENT_CODES = ("", "AF", "AN", "AS", "EU", "NA", "OC", "SA")
+_CONTINENT_INDEX = {code: i for i, code in enumerate(CONTINENT_CODES) if code}
+_ISO_CODE_LENGTH = 2
+
+
+def encode_country(iso_code: object) -> int:
+    """Pack a two-letter ISO country code into a small integer (0 for unknown)."""
+    if not isinstance(iso_code, str) or len(iso_code) != _ISO_CODE_LENGTH or not iso_code.isascii():
+        return 0
+    return (ord(iso_code[0]) << 8) | ord(iso_code[1])
+
+
+def decode_country(code: int) -> str:
+    """Unpack a code produced by `encode_country`; unknown codes decode to an empty string."""
+    if not code:
+        return ""
+    return chr(code >> 8) + chr(code & 0xFF)
+
+
+def encode_continent(code: object) -> int:
+    """Map a two-letter continent code to its index in `CONTINENT_CODES` (0 for unknown)."""
+    return _CONTINENT_INDEX.get(code, 0) if isinstance(code, str) else 0
+
+
+@dataclass(frozen=True)
+class LocationSet:
+    """
+    Geolocated points as parallel arrays: latitude, longitude and request count.
+
+    Country and continent codes are optional and stored as small integers (see
+    `encode_country` and `CONTINENT_CODES`). At roughly 16-19 bytes per point this is an
+    order of magnitude smaller than lists of Python floats and tuples.
+    """
+
+    latitude: np.ndarray
+    longitude: np.ndarray
+    count: np.ndarray
+    country: np.ndarray | None = None
+    continent: np.ndarray | None = None
+
+    @classmethod
+    def from_arrays(
+        cls,
+        latitude,
+        longitude,
+        count=None,
+        country=None,
+        continent=None,
+    ) -> "LocationSet":
+        """Build a set from array-likes, converting them to the compact dtypes."""
+        latitude = np.ascontiguousarray(latitude, dtype=COORDINATE_DTYPE)
+        longitude = np.ascontiguousarray(longitude, dtype=COORDINATE_DTYPE)
+        if count is None:
+            count = np.ones(len(latitude), dtype=COUNT_DTYPE)
+        return cls(
+            latitude=latitude,
+            longitude=longitude,
+            count=np.ascontiguousarray(count, dtype=COUNT_DTYPE),
+            country=None if country is None else np.ascontiguousarray(country, dtype=COUNTRY_DTYPE),
+            continent=None if continent is None else np.ascontiguousarray(continent, dtype=CONTINENT_DTYPE),
+        )
+
+    @classmethod
+    def empty(cls, with_codes: bool = False) -> "LocationSet":
+        """Return a set with no points."""
+        codes = [] if with_codes else None
+        return cls.from_arrays([], [], [], country=codes, continent=codes)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["LocationSet"]) -> "LocationSet":
+        """Join several sets into one; codes are kept only if every part has them."""
+        if not parts:
+            return cls.empty()
+        with_country = all(part.country is not None for part in parts)
+        with_continent = all(part.continent is not None for part in parts)
+        return cls(
+            latitude=np.concatenate([part.latitude for part in parts]),
+            longitude=np.concatenate([part.longitude for part in parts]),
+            count=np.concatenate([part.count for part in parts]),
+            country=np.concatenate([part.country for part in parts]) if with_country else None,  # type: ignore[misc]
+            continent=np.concatenate([part.continent for part in parts]) if with_continent else None,  # type: ignore[misc]
+        )
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def total(self) -> int:
+        """Total request count over all points."""
+        return int(self.count.sum())
+
+    def aggregate(self) -> "LocationSet":
+        """Merge points with identical coordinates, summing their counts."""
+        if not len(self):
+            return self
+        # Pack both float32 coordinates into one uint64 key so a single np.unique does the grouping
+        keys = (self.latitude.view(np.uint32).astype(np.uint64) << np.uint64(32)) | self.longitude.view(np.uint32)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse, weights=self.count, minlength=len(first))
+        return LocationSet(
+            latitude=self.latitude[first],
+            longitude=self.longitude[first],
+            count=counts.astype(COUNT_DTYPE),
+            country=None if self.country is None else self.country[first],
+            continent=None if self.continent is None else self.continent[first],
+        )
+
+    def heat_data(self) -> list[list[float]]:
+        """Return [latitude, longitude, count] rows as expected by folium's HeatMap."""
+        return np.column_stack((self.latitude, self.longitude, self.count)).tolist()
+
+    def nbytes(self) -> int:
+        """Memory used by the underlying arrays."""
+        arrays = (self.latitude, self.longitude, self.count, self.country, self.continent)
+        return sum(array.nbytes for array in arrays if array is not None)
@@ -0,0 +1,217 @@
+"""Reading IP columns from many log files: globs, compressed CSV and NDJSON, concurrent readers."""
+
+import glob
+import gzip
+import io
+import json
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst inputs
+    zstandard = None
+
+# Imported where used: pandas takes a third of a second to load
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_READERS = 4
+NDJSON_SUFFIXES = frozenset({".ndjson", ".jsonl", ".json"})
+COMPRESSION_SUFFIXES = frozenset({".gz", ".zst"})
+# What reading inputs raises for a missing zstandard package, an unreadable file or a missing column
+READ_ERRORS = (ImportError, OSError, ValueError)
+# Poll interval for readers blocked on a full queue, so they notice when the consumer stops
+_PUT_TIMEOUT = 0.1
+
+# Sent by a reader when it has finished a file
+_FILE_DONE = object()
+
+
+def expand_inputs(patterns: Iterable[str | Path]) -> list[Path]:
+    """
+    Expand paths and glob patterns (`**` matches across directories) into a sorted list of files.
+
+    Raises FileNotFoundError for a path that doesn't exist or a pattern that matches nothing.
+    """
+    paths: set[Path] = set()
+    for pattern in map(str, patterns):
+        if glob.has_magic(pattern):
+            matches = [Path(match) for match in glob.glob(pattern, recursive=True) if Path(match).is_file()]
+            if not matches:
+                raise FileNotFoundError(f"No files match {pattern}")
+            paths.update(matches)
+        elif Path(pattern).is_file():
+            paths.add(Path(pattern))
+        else:
+            raise FileNotFoundError(f"No such file: {pattern}")
+    return sorted(paths)
+
+
+def open_text(path: str | Path) -> IO[str]:
+    """Open a text file, decompressing `.gz` and `.zst` files on the fly."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if suffix == ".zst":
+        if zstandard is None:
+            raise ImportError(f"Reading {path} requires the zstandard package (pip install 'ip-visualizer[zstd]')")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def is_ndjson(path: str | Path) -> bool:
+    """Whether `path` holds newline-delimited JSON, judged by its suffix under any compression suffix."""
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    if suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        suffixes.pop()
+    return bool(suffixes) and suffixes[-1] in NDJSON_SUFFIXES
+
+
+def get_field(record: object, column: str) -> object:
+    """
+    Look up `column` in a decoded JSON record, as a flat key or as a dotted path into nested objects.
+
+    Elasticsearch exports nest fields ({"_source": {"cg": {...}}}) while flattened exports use
+    the dotted name as the key; both are accepted. Returns None if the field is missing.
+    """
+    if not isinstance(record, dict):
+        return None
+    if column in record:
+        return record[column]
+    value: object = record
+    for key in column.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _iter_ndjson_frames(file: IO[str], columns: Sequence[str], chunksize: int) -> Iterator["pd.DataFrame"]:
+    import pandas as pd
+
+    # Not an address (or a timestamp), so reported as a skipped row rather than dropped
+    malformed = ("",) * len(columns)
+    rows: list[tuple] = []
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            rows.append(tuple(get_field(record, column) for column in columns))
+        except json.JSONDecodeError:
+            rows.append(malformed)
+        if len(rows) >= chunksize:
+            yield pd.DataFrame(rows, columns=list(columns), dtype=object).dropna()
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=list(columns), dtype=object).dropna()
+
+
+def iter_file_frames(path: str | Path, columns: Sequence[str], chunksize: int) -> Iterator["pd.DataFrame"]:
+    """
+    Stream some columns of one CSV or NDJSON file, optionally compressed, as chunks of raw values.
+
+    Rows missing any of the values are dropped. For NDJSON, each column may be a dotted path
+    (see `get_field`) and malformed lines are kept as empty, invalid values, so they are
+    reported.
+    """
+    import pandas as pd
+
+    columns = list(columns)
+    with open_text(path) as file:
+        if is_ndjson(path):
+            yield from _iter_ndjson_frames(file, columns, chunksize)
+            return
+        try:
+            reader = pd.read_csv(file, usecols=columns, dtype=dict.fromkeys(columns, str), chunksize=chunksize)
+        except ValueError as error:
+            # e.g. "Usecols do not match columns", which doesn't say which file
+            raise ValueError(f"{path}: {error}") from error
+        with reader:
+            for chunk in reader:
+                yield chunk[columns].dropna()
+
+
+def iter_file_chunks(path: str | Path, column: str, chunksize: int) -> Iterator["pd.Series"]:
+    """Stream the IP column of one CSV or NDJSON file as chunks of raw values (see `iter_file_frames`)."""
+    for frame in iter_file_frames(path, [column], chunksize):
+        yield frame[column]
+
+
+class _ReadError:
+    """Carries a reader thread's exception to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(output: queue.Queue, stop: threading.Event, item) -> bool:
+    """Block until `item` is queued or the consumer stops; False if it stopped."""
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=_PUT_TIMEOUT)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _read_file(path: Path, read: Callable[[Path], Iterable], output: queue.Queue, stop: threading.Event):
+    try:
+        for item in read(path):
+            if not _put(output, stop, item):
+                return
+    except Exception as error:
+        _put(output, stop, _ReadError(error))
+    _put(output, stop, _FILE_DONE)
+
+
+def read_concurrently[T](
+    paths: Iterable[Path],
+    read: Callable[[Path], Iterable[T]],
+    readers: int = DEFAULT_READERS,
+    buffer: int | None = None,
+) -> Iterator[T]:
+    """
+    Yield the items of `read(path)` for every path, reading up to `readers` files at once.
+
+    Items arrive in no particular order. At most `buffer` items (default: two per reader)
+    wait to be consumed, so fast readers block instead of filling memory. The first error
+    raised by a reader is re-raised here, and the readers stop once the consumer does.
+    """
+    paths = list(paths)
+    output: queue.Queue = queue.Queue(buffer or 2 * readers)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max(1, min(readers, len(paths))), thread_name_prefix="log-reader")
+    try:
+        for path in paths:
+            executor.submit(_read_file, path, read, output, stop)
+        remaining = len(paths)
+        while remaining:
+            item = output.get()
+            if item is _FILE_DONE:
+                remaining -= 1
+            elif isinstance(item, _ReadError):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_files_chunks(
+    paths: Iterable[Path],
+    column: str,
+    chunksize: int,
+    readers: int = DEFAULT_READERS,
+) -> Iterator["pd.Series"]:
+    """Stream the IP column of many files as chunks of raw values, reading `readers` files at once."""
+    return read_concurrently(paths, lambda path: iter_file_chunks(path, column, chunksize), readers)
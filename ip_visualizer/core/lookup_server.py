@@ -0,0 +1,204 @@
+"""Long-running local HTTP service for IP lookups, keeping the database and caches warm."""
+
+import json
+import os
+import socketserver
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from ip_visualizer.core.geoip_reader import get_reader
+from ip_visualizer.core.ip_lookup import (
+    cache_stats,
+    failure_stats,
+    lookup_result,
+    persistent_cache_stats,
+    prefix_cache_stats,
+    resolve_ips,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH = 10_000
+# Generous for DEFAULT_MAX_BATCH IPv6 addresses in JSON, small enough to refuse junk early
+MAX_BODY_BYTES = 1_000_000
+
+
+class LookupRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over the shared reader and caches of `ip_lookup`.
+
+    GET /lookup/<ip> (or /lookup?ip=<ip>) returns the fields of `lookup_ip`, with 404 and
+    an empty object if the address can't be located. POST /lookup with a JSON list of
+    addresses (or {"ips": [...]}) returns an object mapping each distinct address to its
+    fields, as `lookup_ips` does. GET /health and GET /stats report liveness and the cache
+    and failure counters. Connections are kept alive between requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "ip-visualizer"
+    max_batch = DEFAULT_MAX_BATCH
+    verbose = False
+
+    def do_GET(self):  # noqa: N802
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send_json({"status": "ok"})
+        elif url.path == "/stats":
+            self._send_json(
+                {
+                    "cache": cache_stats(),
+                    "prefix_cache": prefix_cache_stats(),
+                    "persistent_cache": persistent_cache_stats(),
+                    "failures": failure_stats(),
+                }
+            )
+        elif url.path == "/lookup" or url.path.startswith("/lookup/"):
+            # Clients percent-encode the colons of IPv6 addresses in the path
+            ip = unquote(url.path.removeprefix("/lookup").removeprefix("/")) or parse_qs(url.query).get("ip", [""])[0]
+            if not ip:
+                self._send_error(HTTPStatus.BAD_REQUEST, "Missing IP address")
+                return
+            results = self._resolve([ip])
+            if results is not None:
+                result = results[ip]
+                self._send_json(result, HTTPStatus.OK if result else HTTPStatus.NOT_FOUND)
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+
+    def do_POST(self):  # noqa: N802
+        if urlsplit(self.path).path != "/lookup":
+            # The unread body would be taken for the next request on this connection
+            self.close_connection = True
+            self._send_error(HTTPStatus.NOT_FOUND, f"No such endpoint: {self.path}")
+            return
+        ips = self._read_batch()
+        if ips is not None:
+            results = self._resolve(ips)
+            if results is not None:
+                self._send_json(results)
+
+    def _read_batch(self) -> list[str] | None:
+        """Parse the body of a batch request, sending an error response and returning None if it is invalid."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Where the body ends is unknown, so nothing more can be read from this connection
+            self.close_connection = True
+            self._send_error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length header")
+            return None
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # the body is not read
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body over {MAX_BODY_BYTES} bytes")
+            return None
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            self._send_error(HTTPStatus.BAD_REQUEST, "Request body must be JSON")
+            return None
+        ips = body.get("ips") if isinstance(body, dict) else body
+        if not isinstance(ips, list) or not all(isinstance(ip, str) for ip in ips):
+            self._send_error(HTTPStatus.BAD_REQUEST, 'Expected a list of IP addresses or {"ips": [...]}')
+            return None
+        if len(ips) > self.max_batch:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"At most {self.max_batch} addresses per request")
+            return None
+        return ips
+
+    def _resolve(self, ips: list[str]) -> dict[str, dict] | None:
+        """Look up `ips`, or send an error response and return None if the database is unusable."""
+        try:
+            records = resolve_ips(ips)
+        except FileNotFoundError:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "GeoLite2-City.mmdb not found")
+            return None
+        except Exception as e:
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Error looking up IPs: {e!s}")
+            return None
+        return {ip: lookup_result(ip, record) for ip, record in records.items()}
+
+    def _send_json(self, payload, status: HTTPStatus = HTTPStatus.OK):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json({"error": message}, status)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):  # noqa: A002
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class UnixLookupServer(socketserver.ThreadingUnixStreamServer):
+    """The lookup API on a Unix domain socket, for clients on the same host that skip TCP."""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        # A socket file left behind by a server that didn't shut down cleanly would block the bind
+        Path(self.server_address).unlink(missing_ok=True)
+        super().server_bind()
+
+    def server_close(self):
+        super().server_close()
+        Path(self.server_address).unlink(missing_ok=True)
+
+
+def create_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: str | None = None,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    verbose: bool = False,
+) -> socketserver.BaseServer:
+    """Create (but don't start) a threaded lookup server on `host`:`port`, or on a Unix socket at `socket_path`."""
+    settings = {
+        "max_batch": max_batch,
+        "verbose": verbose,
+        # Small responses on kept-alive TCP connections; don't let Nagle's algorithm hold them back
+        "disable_nagle_algorithm": socket_path is None,
+    }
+    handler = type("ConfiguredLookupRequestHandler", (LookupRequestHandler,), settings)
+    if socket_path is not None:
+        return UnixLookupServer(os.fspath(socket_path), handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def server_url(server: socketserver.BaseServer) -> str:
+    """Describe where `server` is listening."""
+    if isinstance(server.server_address, tuple):
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}"
+    return f"unix:{server.server_address}"
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: str | None = None,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    verbose: bool = False,
+):
+    """Open the database, then answer lookups until interrupted."""
+    try:
+        get_reader()
+    except FileNotFoundError:
+        print("Error: GeoLite2-City.mmdb not found. Please download it from MaxMind.")
+        return
+    with create_server(host, port, socket_path, max_batch, verbose) as server:
+        print(f"Serving lookups on {server_url(server)}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Shutting down")
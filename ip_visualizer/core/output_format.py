@@ -0,0 +1,9 @@
+"""Formats for streamed IP address output; free of heavy imports so the CLI can load it at startup."""
+
+from enum import StrEnum
+
+
+class OutputFormat(StrEnum):
+    PLAIN = "plain"
+    CSV = "csv"
+    BINARY = "binary"
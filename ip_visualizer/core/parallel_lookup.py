@@ -0,0 +1,125 @@
+"""Multiprocess geolocation of large IP sets."""
+
+import itertools
+import os
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ip_visualizer.core.geoip_reader import configure_reader, get_reader_manager
+from ip_visualizer.core.ip_lookup import configure_persistent_cache, get_persistent_cache, resolve_ips
+from ip_visualizer.core.locations import LocationSet, encode_continent, encode_country
+
+# Shards per worker; more than one so a slow shard doesn't leave the other workers idle
+SHARDS_PER_WORKER = 4
+MIN_SHARD_SIZE = 10_000
+
+
+def _init_worker(db_path: str, mode: int, cache_path: str | None, cache_size: int):
+    """Give each worker process its own memory-mapped reader and caches."""
+    configure_reader(db_path, mode=mode)
+    if cache_path is not None:
+        configure_persistent_cache(cache_path, cache_size)
+
+
+def locate_shard(ip_addresses: list[str], counts: list[int], with_codes: bool = False) -> LocationSet:
+    """Geolocate one shard, returning the located addresses with their counts."""
+    records = resolve_ips(ip_addresses)
+    latitudes: list[float] = []
+    longitudes: list[float] = []
+    located_counts: list[int] = []
+    countries: list[int] = []
+    continents: list[int] = []
+    for ip, count in zip(ip_addresses, counts, strict=True):
+        record = records[ip]
+        if record is None or not record["latitude"] or not record["longitude"]:
+            continue
+        latitudes.append(record["latitude"])  # type: ignore[arg-type]
+        longitudes.append(record["longitude"])  # type: ignore[arg-type]
+        located_counts.append(count)
+        if with_codes:
+            countries.append(encode_country(record["country_code"]))
+            continents.append(encode_continent(record["continent_code"]))
+    return LocationSet.from_arrays(
+        latitudes,
+        longitudes,
+        located_counts,
+        country=countries if with_codes else None,
+        continent=continents if with_codes else None,
+    )
+
+
+def resolve_coordinates(ip_addresses: list[str]) -> np.ndarray:
+    """Latitude and longitude of each address as an (n, 2) array, NaN where it can't be located."""
+    records = resolve_ips(ip_addresses)
+    coordinates = np.full((len(ip_addresses), 2), np.nan)
+    for row, ip in enumerate(ip_addresses):
+        record = records[ip]
+        # Same rule as locate_shard, which skips 0 or missing coordinates
+        if record is not None and record["latitude"] and record["longitude"]:
+            coordinates[row] = (record["latitude"], record["longitude"])
+    return coordinates
+
+
+def split_shards(ip_counts: Mapping[str, int], shard_count: int) -> list[tuple[list[str], list[int]]]:
+    """Split distinct addresses and their counts into roughly equal shards."""
+    shard_size = max(MIN_SHARD_SIZE, -(-len(ip_counts) // max(shard_count, 1)))
+    items = iter(ip_counts.items())
+    shards = []
+    while batch := list(itertools.islice(items, shard_size)):
+        ips, counts = zip(*batch, strict=True)
+        shards.append((list(ips), list(counts)))
+    return shards
+
+
+def create_worker_pool(workers: int) -> ProcessPoolExecutor:
+    """Start worker processes that open the same database and persistent cache as this one."""
+    manager = get_reader_manager()
+    persistent_cache = get_persistent_cache()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            manager.db_path,
+            manager.mode,
+            None if persistent_cache is None else persistent_cache.path,
+            0 if persistent_cache is None else persistent_cache.maxsize,
+        ),
+    )
+
+
+def locate_parallel(
+    ip_counts: Mapping[str, int],
+    workers: int | None = None,
+    with_codes: bool = False,
+) -> LocationSet:
+    """
+    Geolocate distinct addresses across a pool of worker processes.
+
+    Each worker opens the database once, memory-mapped, so its pages are shared between
+    workers through the OS page cache, and sends back a compact `LocationSet`.
+    Raises FileNotFoundError if the database is missing.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = split_shards(ip_counts, workers * SHARDS_PER_WORKER)
+    if not shards:
+        return LocationSet.empty(with_codes)
+
+    with create_worker_pool(min(workers, len(shards))) as executor:
+        ips, counts = zip(*shards, strict=True)
+        parts = list(executor.map(locate_shard, ips, counts, [with_codes] * len(shards)))
+
+    return LocationSet.concatenate(parts)
+
+
+def resolve_coordinates_parallel(ip_addresses: list[str], workers: int | None = None) -> np.ndarray:
+    """Like `resolve_coordinates`, across a pool of worker processes (see `locate_parallel`)."""
+    workers = workers or os.cpu_count() or 1
+    shard_size = max(MIN_SHARD_SIZE, -(-len(ip_addresses) // (workers * SHARDS_PER_WORKER)))
+    shards = [ip_addresses[i : i + shard_size] for i in range(0, len(ip_addresses), shard_size)]
+    if not shards:
+        return np.empty((0, 2))
+
+    with create_worker_pool(min(workers, len(shards))) as executor:
+        return np.concatenate(list(executor.map(resolve_coordinates, shards)))
@@ -0,0 +1,162 @@
+"""On-disk geolocation result cache shared across runs."""
+
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+DEFAULT_PERSISTENT_CACHE_SIZE = 5_000_000
+SCHEMA_VERSION = 1
+# Keeps each "IN (...)" query under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+
+class PersistentCache:
+    """
+    SQLite-backed cache of lookup results, keyed by IP address.
+
+    The cache is tagged with the build epoch of the database its results came from; when
+    it is used with a different build (see `ensure_epoch`) every entry is dropped. Entries
+    record when they were last used and the least recently used are deleted once the cache
+    grows past `maxsize`. Negative results (`None`) are cached too. WAL mode lets several
+    worker processes share one file.
+
+    The number of entries is kept in the `meta` table, updated in the same transaction as
+    the entries, so that stores needn't count the table.
+    """
+
+    def __init__(self, path: str | Path, maxsize: int = DEFAULT_PERSISTENT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.path = str(path)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._epoch: int | None = None
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (ip TEXT PRIMARY KEY, record TEXT, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        if self._meta("schema_version") != str(SCHEMA_VERSION):
+            self._reset(schema_version=str(SCHEMA_VERSION))
+        elif self._meta("size") is None:
+            # Written before the size was tracked; count it once
+            with self._connection:
+                (size,) = self._connection.execute("SELECT COUNT(*) FROM results").fetchone()
+                self._connection.execute("INSERT INTO meta VALUES ('size', ?)", (str(size),))
+
+    def _meta(self, key: str) -> str | None:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _reset(self, **meta: str):
+        with self._connection:
+            self._connection.execute("DELETE FROM results")
+            self._connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", {**meta, "size": "0"}.items())
+
+    def _size(self) -> int:
+        return int(self._meta("size") or 0)
+
+    def _count_cached(self, ips: list[str]) -> int:
+        cached = 0
+        for start in range(0, len(ips), _QUERY_BATCH):
+            batch = ips[start : start + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            (found,) = self._connection.execute(
+                f"SELECT COUNT(*) FROM results WHERE ip IN ({placeholders})",  # noqa: S608
+                batch,
+            ).fetchone()
+            cached += found
+        return cached
+
+    @property
+    def build_epoch(self) -> int | None:
+        value = self._meta("build_epoch")
+        return None if value is None else int(value)
+
+    def ensure_epoch(self, build_epoch: int):
+        """Drop every entry if the cache was filled from a different database build."""
+        with self._lock:
+            if self._epoch == build_epoch:
+                return
+            if self.build_epoch != build_epoch:
+                self._reset(build_epoch=str(build_epoch))
+            self._epoch = build_epoch
+
+    def get_many(self, ips: Iterable[str]) -> dict[str, Any]:
+        """Return the cached result of every address found; addresses not cached are left out."""
+        ips = list(ips)
+        found: dict[str, Any] = {}
+        with self._lock:
+            for start in range(0, len(ips), _QUERY_BATCH):
+                batch = ips[start : start + _QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT ip, record FROM results WHERE ip IN ({placeholders})",  # noqa: S608
+                    batch,
+                )
+                found.update((ip, None if record is None else json.loads(record)) for ip, record in rows)
+            if found:
+                now = time.time()
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE results SET last_used = ? WHERE ip = ?", ((now, ip) for ip in found)
+                    )
+            self.hits += len(found)
+            self.misses += len(ips) - len(found)
+        return found
+
+    def put_many(self, results: Mapping[str, Any]):
+        """Store results, evicting the least recently used entries when over `maxsize`."""
+        if not results:
+            return
+        now = time.time()
+        rows = ((ip, None if record is None else json.dumps(record), now) for ip, record in results.items())
+        with self._lock, self._connection:
+            # Take the write lock first, so other processes can't change the size in between
+            self._connection.execute("BEGIN IMMEDIATE")
+            size = self._size() + len(results) - self._count_cached(list(results))
+            self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", rows)
+            if size > self.maxsize:
+                evicted = self._connection.execute(
+                    "DELETE FROM results WHERE ip IN (SELECT ip FROM results ORDER BY last_used LIMIT ?)",
+                    (size - self.maxsize,),
+                ).rowcount
+                size -= evicted
+                self.evictions += evicted
+            self._connection.execute("UPDATE meta SET value = ? WHERE key = 'size'", (str(size),))
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._reset()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "size": self._size(),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        return self.stats()["size"]
@@ -0,0 +1,194 @@
+"""Staged asyncio pipeline that overlaps reading, parsing, geolocation and aggregation."""
+
+import asyncio
+import contextlib
+import os
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+
+from ip_visualizer.core.geo_index import GeoIndex, locate_ip_counts
+from ip_visualizer.core.ip_filter import RejectedIPs, split_routable
+from ip_visualizer.core.ip_parse import parse_ips
+from ip_visualizer.core.locations import LocationSet
+from ip_visualizer.core.parallel_lookup import create_worker_pool, locate_shard
+
+# Chunks buffered between two stages; with the chunks in flight in each stage this bounds memory
+DEFAULT_QUEUE_SIZE = 4
+# Merge partial results once they hold this many points, so the aggregator's memory stays bounded
+COMPACT_THRESHOLD = 1_000_000
+
+# Sent down a queue after the last item
+_DONE = object()
+
+
+@dataclass
+class PipelineResult:
+    """Aggregated points plus counters collected on the way."""
+
+    locations: LocationSet
+    chunks: int = 0
+    requests: int = 0
+    invalid: int = 0
+    # Valid addresses set aside before lookup, see `split_routable`
+    rejected: RejectedIPs = field(default_factory=RejectedIPs)
+    distinct_per_chunk: list[int] = field(default_factory=list)
+    # Distinct addresses of each chunk that were geolocated, summed over the chunks
+    located: int = 0
+    # Seconds each stage spent working rather than waiting on its queues; lookups run
+    # concurrently, so theirs add up across the running lookups
+    busy_seconds: dict[str, float] = field(default_factory=dict)
+
+    @contextlib.contextmanager
+    def busy(self, stage: str) -> Iterator[None]:
+        """Add the time spent in the enclosed block to `stage`'s busy time."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy_seconds[stage] = self.busy_seconds.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _count_chunk(chunk, strip_ports: bool, rejected: RejectedIPs) -> tuple[dict[str, int], int, int]:
+    """
+    Parse one chunk, returning the per-address counts worth looking up, its valid rows and its invalid rows.
+
+    Addresses that can't be geolocated are added to `rejected` instead.
+    """
+    parsed = parse_ips(chunk, strip_ports=strip_ports)
+    valid = int(parsed.valid.sum())
+    routable, _ = split_routable(parsed.value_counts(), rejected)
+    return routable, valid, len(parsed) - valid
+
+
+async def _read(chunks: Iterable, output: asyncio.Queue, result: PipelineResult):
+    """Pull raw chunks from the (blocking) source in a thread."""
+    iterator = iter(chunks)
+    while True:
+        with result.busy("read"):
+            chunk = await asyncio.to_thread(next, iterator, _DONE)
+        await output.put(chunk)
+        if chunk is _DONE:
+            return
+
+
+async def _parse(source: asyncio.Queue, output: asyncio.Queue, result: PipelineResult, strip_ports: bool):
+    while (chunk := await source.get()) is not _DONE:
+        # Chunks are parsed one at a time, so `result.rejected` has one writer
+        with result.busy("parse"):
+            counts, valid, invalid = await asyncio.to_thread(_count_chunk, chunk, strip_ports, result.rejected)
+        result.chunks += 1
+        result.requests += valid
+        result.invalid += invalid
+        result.distinct_per_chunk.append(len(counts))
+        await output.put(counts)
+    await output.put(_DONE)
+
+
+async def _locate(
+    source: asyncio.Queue,
+    output: asyncio.Queue,
+    locate: Callable[[Mapping[str, int]], Awaitable[LocationSet]],
+    concurrency: int,
+    result: PipelineResult,
+):
+    """Run up to `concurrency` lookups at once, passing results on as they finish."""
+
+    async def timed_locate(counts: Mapping[str, int]) -> LocationSet:
+        with result.busy("lookup"):
+            return await locate(counts)
+
+    running: set[asyncio.Future] = set()
+    while (counts := await source.get()) is not _DONE:
+        if len(running) >= concurrency:
+            finished, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                await output.put(task.result())
+        running.add(asyncio.ensure_future(timed_locate(counts)))
+    for task in asyncio.as_completed(running):
+        await output.put(await task)
+    await output.put(_DONE)
+
+
+async def _aggregate(source: asyncio.Queue, with_codes: bool, result: PipelineResult) -> LocationSet:
+    parts: list[LocationSet] = []
+    size = 0
+    while (part := await source.get()) is not _DONE:
+        # Each part has one point per address located in its chunk
+        result.located += len(part)
+        parts.append(part)
+        size += len(part)
+        if size > COMPACT_THRESHOLD:
+            with result.busy("aggregate"):
+                parts = [LocationSet.concatenate(parts).aggregate()]
+            size = len(parts[0])
+    with result.busy("aggregate"):
+        return LocationSet.concatenate(parts).aggregate() if parts else LocationSet.empty(with_codes)
+
+
+def _locator(
+    executor: Executor | None,
+    with_codes: bool,
+    index: GeoIndex | None,
+) -> Callable[[Mapping[str, int]], Awaitable[LocationSet]]:
+    if index is not None:
+        return lambda counts: asyncio.to_thread(locate_ip_counts, counts, index, with_codes)
+    if executor is None:
+        return lambda counts: asyncio.to_thread(locate_shard, list(counts), list(counts.values()), with_codes)
+    loop = asyncio.get_running_loop()
+    return lambda counts: loop.run_in_executor(executor, locate_shard, list(counts), list(counts.values()), with_codes)
+
+
+async def _run(  # noqa: PLR0913
+    chunks: Iterable,
+    workers: int,
+    with_codes: bool,
+    index: GeoIndex | None,
+    queue_size: int,
+    strip_ports: bool,
+) -> PipelineResult:
+    raw: asyncio.Queue = asyncio.Queue(queue_size)
+    counted: asyncio.Queue = asyncio.Queue(queue_size)
+    located: asyncio.Queue = asyncio.Queue(queue_size)
+    result = PipelineResult(LocationSet.empty(with_codes))
+
+    executor = create_worker_pool(workers) if workers > 1 and index is None else None
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(_read(chunks, raw, result))
+            group.create_task(_parse(raw, counted, result, strip_ports))
+            group.create_task(_locate(counted, located, _locator(executor, with_codes, index), workers, result))
+            aggregated = group.create_task(_aggregate(located, with_codes, result))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    result.locations = aggregated.result()
+    return result
+
+
+def run_pipeline(  # noqa: PLR0913
+    chunks: Iterable,
+    workers: int = 1,
+    with_codes: bool = False,
+    index: GeoIndex | None = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    strip_ports: bool = True,
+) -> PipelineResult:
+    """
+    Geolocate and aggregate a stream of raw address chunks, e.g. CSV columns read in chunks.
+
+    Reading, parsing, lookups and aggregation run as concurrent stages joined by queues of
+    at most `queue_size` chunks, so a slow stage holds the others back instead of letting
+    chunks pile up. Lookups run in `workers` processes (0 means one per CPU), or in one
+    thread with `workers=1`, or against `index` if one is given. Private, reserved and
+    similar addresses are counted in `rejected` instead of looked up. Points with the same
+    coordinates are merged as they arrive. The result records how long each stage was busy,
+    to tell which one holds the others back. If a stage fails the others are cancelled and
+    its exception is raised, e.g. FileNotFoundError if the database is missing.
+    """
+    workers = workers or os.cpu_count() or 1
+    try:
+        return asyncio.run(_run(chunks, workers, with_codes, index, queue_size, strip_ports))
+    except ExceptionGroup as group:
+        raise group.exceptions[0] from None
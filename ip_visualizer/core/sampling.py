@@ -0,0 +1,246 @@
+"""Weighted sampling of synthetic IPv4 traffic from a data-driven region/prefix configuration."""
+
+import ipaddress
+import json
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent.parent / "data" / "ip_ranges.json"
+
+
+@dataclass(frozen=True)
+class HotIPConfig:
+    """
+    A small pool of addresses that receives a share of the traffic with Zipf-like skew.
+
+    `count` addresses are drawn up front and `fraction` of all generated addresses are
+    repeats from that pool, the address of rank r being picked with weight r ** -exponent.
+    """
+
+    count: int = 0
+    fraction: float = 0.0
+    exponent: float = 1.1
+
+    def __post_init__(self):
+        if self.count < 0:
+            raise ValueError("Hot IP count must not be negative")
+        if not 0.0 <= self.fraction <= 1.0:
+            raise ValueError("Hot IP fraction must be between 0 and 1")
+        if self.exponent < 0:
+            raise ValueError("Zipf exponent must not be negative")
+
+
+@dataclass(frozen=True)
+class RegionConfig:
+    """A region's share of the traffic and the relative weight of each of its CIDR prefixes."""
+
+    weight: float
+    prefixes: dict[str, float]
+
+
+@dataclass(frozen=True)
+class SamplingConfig:
+    regions: dict[str, RegionConfig]
+    hot_ips: HotIPConfig = field(default_factory=HotIPConfig)
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "SamplingConfig":
+        """
+        Build a config from parsed JSON.
+
+        A region's "prefixes" is either a list of CIDRs, all weighted equally, or an
+        object mapping each CIDR to its weight.
+        """
+        regions = {}
+        for name, region in data["regions"].items():
+            prefixes = region.get("prefixes", [])
+            if not isinstance(prefixes, Mapping):
+                prefixes = dict.fromkeys(prefixes, 1.0)
+            regions[name] = RegionConfig(float(region["weight"]), {str(k): float(v) for k, v in prefixes.items()})
+        return cls(regions, HotIPConfig(**data.get("hot_ips", {})))
+
+
+def load_sampling_config(path: str | Path | None = None) -> SamplingConfig:
+    """Load a sampling config from JSON, defaulting to the bundled `ip_ranges.json`."""
+    with open(path or DEFAULT_CONFIG_PATH, encoding="utf-8") as f:
+        return SamplingConfig.from_dict(json.load(f))
+
+
+def apportion(total: int, weights: Sequence[float] | np.ndarray) -> np.ndarray:
+    """
+    Split `total` into integer parts proportional to `weights` that add up exactly to `total`.
+
+    Uses the largest remainder method: every part gets the floor of its quota and the
+    leftover units go to the parts with the largest fractional remainders.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if np.any(weights < 0) or weights.sum() <= 0:
+        raise ValueError("Weights must be non-negative and not all zero")
+    quotas = total * weights / weights.sum()
+    parts = np.floor(quotas).astype(np.int64)
+    leftover = total - int(parts.sum())
+    if leftover > 0:
+        # Stable sort so ties go to the earlier part and the result is deterministic
+        parts[np.argsort(parts - quotas, kind="stable")[:leftover]] += 1
+    return parts
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table for drawing indices with fixed weights in O(1) per draw.
+
+    Each draw picks a column uniformly, then either keeps it or takes its alias depending
+    on one uniform number, so a batch of draws is two vectorised lookups.
+    """
+
+    def __init__(self, weights: Sequence[float] | np.ndarray):
+        weights = np.asarray(weights, dtype=np.float64)
+        if not len(weights) or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("Weights must be non-empty, non-negative and not all zero")
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        self.probability = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.intp)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1 up to rounding error and keeps probability 1
+
+    def __len__(self) -> int:
+        return len(self.probability)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Draw `size` indices."""
+        columns = rng.integers(0, len(self), size=size)
+        keep = rng.random(size) < self.probability[columns]
+        return np.where(keep, columns, self.alias[columns])
+
+
+def _host_bounds(network: ipaddress.IPv4Network) -> tuple[int, int]:
+    """Usable host range, excluding the network and broadcast addresses unless there are only 1 or 2."""
+    network_int = int(network.network_address)
+    if network.num_addresses <= 2:  # noqa: PLR2004
+        return network_int, network_int
+    return network_int + 1, int(network.broadcast_address) - 1
+
+
+@dataclass(frozen=True)
+class _Region:
+    name: str
+    weight: float
+    lows: np.ndarray
+    highs: np.ndarray
+    prefixes: AliasTable
+
+
+class IPSampler:
+    """
+    Draws IPv4 addresses following a `SamplingConfig`, with exact per-region totals.
+
+    Prefixes are parsed and alias tables built once. A prefix listed under several regions
+    has its weight split evenly between them, so it is not drawn more often than its
+    weight says just because it appears twice.
+    """
+
+    def __init__(self, config: SamplingConfig):
+        self.config = config
+        networks: dict[str, dict[ipaddress.IPv4Network, float]] = {}
+        for name, region in config.regions.items():
+            if region.weight < 0:
+                raise ValueError(f"Region {name} has a negative weight")
+            merged: dict[ipaddress.IPv4Network, float] = {}
+            for prefix, weight in region.prefixes.items():
+                network = ipaddress.ip_network(prefix, strict=False)
+                if not isinstance(network, ipaddress.IPv4Network):
+                    raise ValueError(f"Only IPv4 prefixes are supported, got {prefix}")
+                merged[network] = merged.get(network, 0.0) + weight
+            if not merged or region.weight == 0:
+                print(f"Warning: No IP ranges defined for {name}. Skipping.")
+                continue
+            networks[name] = merged
+
+        listed_in: dict[ipaddress.IPv4Network, int] = {}
+        for merged in networks.values():
+            for network in merged:
+                listed_in[network] = listed_in.get(network, 0) + 1
+
+        self.regions: list[_Region] = []
+        for name, merged in networks.items():
+            bounds = np.array([_host_bounds(network) for network in merged], dtype=np.int64)
+            weights = [weight / listed_in[network] for network, weight in merged.items()]
+            self.regions.append(
+                _Region(name, config.regions[name].weight, bounds[:, 0], bounds[:, 1], AliasTable(weights))
+            )
+        if not self.regions:
+            raise ValueError("The sampling config has no usable regions")
+        self._region_weights = np.array([region.weight for region in self.regions])
+
+    def region_totals(self, total: int) -> dict[str, int]:
+        """Exact number of addresses each region contributes to `total`."""
+        return dict(zip((r.name for r in self.regions), apportion(total, self._region_weights).tolist(), strict=True))
+
+    def _draw_hosts(self, region: _Region, rng: np.random.Generator, size: int) -> np.ndarray:
+        selected = region.prefixes.sample(rng, size)
+        return rng.integers(region.lows[selected], region.highs[selected], endpoint=True).astype(np.uint32)
+
+    def _plan(self, total: int, rng: np.random.Generator) -> tuple[np.ndarray, list[tuple[np.ndarray, AliasTable]]]:
+        """
+        Decide how many fresh and hot addresses each region contributes, and draw the hot pools.
+
+        Returns one count per (region, fresh) followed by one per (region, hot), and each
+        region's hot pool with its Zipf rank table.
+        """
+        hot = self.config.hot_ips
+        region_counts = apportion(total, self._region_weights)
+        pool_sizes = apportion(hot.count, self._region_weights) if hot.count else np.zeros_like(region_counts)
+        hot_counts = np.where(pool_sizes > 0, np.rint(region_counts * hot.fraction), 0).astype(np.int64)
+        pools = []
+        for region, pool_size in zip(self.regions, pool_sizes.tolist(), strict=True):
+            pool = self._draw_hosts(region, rng, pool_size)
+            ranks = AliasTable(np.arange(1, pool_size + 1, dtype=np.float64) ** -hot.exponent) if pool_size else None
+            pools.append((pool, ranks))
+        return np.concatenate((region_counts - hot_counts, hot_counts)), pools
+
+    def _draw(self, counts: np.ndarray, pools, rng: np.random.Generator) -> np.ndarray:
+        parts = []
+        for i, (region, (pool, ranks)) in enumerate(zip(self.regions, pools, strict=True)):
+            parts.append(self._draw_hosts(region, rng, int(counts[i])))
+            if hot_count := int(counts[len(self.regions) + i]):
+                parts.append(pool[ranks.sample(rng, hot_count)])
+        chunk = np.concatenate(parts)
+        # Mix the regions, which were drawn one after another
+        rng.shuffle(chunk)
+        return chunk
+
+    def iter_chunks(self, total: int, chunk_size: int, rng: np.random.Generator) -> Iterator[np.ndarray]:
+        """
+        Yield `total` addresses as uint32 arrays of at most `chunk_size`.
+
+        Region and hot-IP totals are fixed up front and each chunk takes a random share of
+        what is left (a multivariate hypergeometric draw), so totals stay exact over the
+        whole stream while memory stays bounded by the chunk size.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        remaining, pools = self._plan(total, rng)
+        left = total
+        while left > 0:
+            size = min(chunk_size, left)
+            counts = remaining if size == left else rng.multivariate_hypergeometric(remaining, size)
+            remaining = remaining - counts
+            left -= size
+            yield self._draw(counts, pools, rng)
+
+    def sample(self, total: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw `total` addresses in one shuffled uint32 array."""
+        if total <= 0:
+            return np.empty(0, dtype=np.uint32)
+        return next(self.iter_chunks(total, total, rng))
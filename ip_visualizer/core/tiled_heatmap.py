@@ -0,0 +1,157 @@
+"""Multi-resolution heatmap output: one pre-aggregated data file per zoom level, loaded on demand."""
+
+import json
+from pathlib import Path
+
+import numpy as np
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import HeatMap
+from folium.template import Template
+from folium.utilities import remove_empty
+
+from ip_visualizer.core.binning import (
+    DEFAULT_MAX_POINTS,
+    DEFAULT_MAX_ZOOM,
+    DEFAULT_MIN_ZOOM,
+    bin_locations,
+    cap_points,
+    zoom_grid,
+)
+from ip_visualizer.core.locations import LocationSet
+
+# Decimal places written for coordinates; 4 places is ~11 m, far below the finest bin
+COORDINATE_DECIMALS = 4
+# Global callback the per-zoom data files call when loaded
+LOADED_CALLBACK = "ipVisualizerHeatLevelLoaded"
+
+
+def build_pyramid(
+    locations: LocationSet,
+    min_zoom: int = DEFAULT_MIN_ZOOM,
+    max_zoom: int = DEFAULT_MAX_ZOOM,
+    max_points: int | None = DEFAULT_MAX_POINTS,
+) -> dict[int, LocationSet]:
+    """
+    Bin `locations` once per zoom level, from fine to coarse.
+
+    Zoom grids nest (each cell splits into 2 x 2 at the next zoom), so every level is
+    binned from the uncapped level below it rather than from the raw points. Each level
+    is then capped at `max_points`.
+    """
+    if min_zoom > max_zoom:
+        raise ValueError("min_zoom must not be greater than max_zoom")
+    pyramid: dict[int, LocationSet] = {}
+    level = locations
+    for zoom in range(max_zoom, min_zoom - 1, -1):
+        level = bin_locations(level, zoom_grid(zoom), max_points=None)
+        pyramid[zoom] = level if max_points is None else cap_points(level, max_points)
+    return dict(sorted(pyramid.items()))
+
+
+def level_filename(zoom: int) -> str:
+    return f"z{zoom}.js"
+
+
+def write_pyramid(pyramid: dict[int, LocationSet], directory: str | Path) -> list[Path]:
+    """
+    Write each level as a small script that hands a flat [lat, lon, weight, ...] array to the map.
+
+    Script files (rather than JSON fetched with XHR) also load when the map is opened
+    straight from disk.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    dataset = json.dumps(directory.name)
+    paths = []
+    for zoom, level in pyramid.items():
+        flat = np.column_stack(
+            (
+                level.latitude.astype(np.float64).round(COORDINATE_DECIMALS),
+                level.longitude.astype(np.float64).round(COORDINATE_DECIMALS),
+                level.count.astype(np.float64),
+            )
+        ).ravel()
+        payload = json.dumps(flat.tolist(), separators=(",", ":"))
+        path = directory / level_filename(zoom)
+        path.write_text(f"{LOADED_CALLBACK}({dataset},{zoom},{payload});\n")
+        paths.append(path)
+    return paths
+
+
+class TiledHeatMap(JSCSSMixin, Layer):
+    """
+    Heatmap layer that shows the pyramid level matching the current zoom, loading it lazily.
+
+    `base_url` is where the level files written by `write_pyramid` are served from,
+    relative to the HTML page.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.heatLayer([], {{ this.options|tojavascript }});
+            (function(layer, map) {
+                var levels = {{ this.levels|tojson }};
+                var baseUrl = {{ this.base_url|tojson }};
+                var dataset = {{ this.dataset|tojson }};
+                var loaded = {};
+                var requested = {};
+                var handlers = window.ipVisualizerHeatHandlers = window.ipVisualizerHeatHandlers || {};
+                window.{{ this.callback }} = window.{{ this.callback }} || function(name, zoom, flat) {
+                    if (handlers[name]) { handlers[name](zoom, flat); }
+                };
+                function levelFor(zoom) {
+                    var best = levels[0];
+                    for (var i = 0; i < levels.length; i++) {
+                        if (levels[i] <= zoom) { best = levels[i]; }
+                    }
+                    return best;
+                }
+                function update() {
+                    var level = levelFor(map.getZoom());
+                    if (loaded[level]) {
+                        layer.setLatLngs(loaded[level]);
+                    } else if (!requested[level]) {
+                        requested[level] = true;
+                        var script = document.createElement("script");
+                        script.src = baseUrl + "z" + level + ".js";
+                        document.head.appendChild(script);
+                    }
+                }
+                handlers[dataset] = function(zoom, flat) {
+                    var points = [];
+                    for (var i = 0; i < flat.length; i += 3) {
+                        points.push([flat[i], flat[i + 1], flat[i + 2]]);
+                    }
+                    loaded[zoom] = points;
+                    if (levelFor(map.getZoom()) === zoom) { layer.setLatLngs(points); }
+                };
+                map.on("zoomend", update);
+                update();
+            })({{ this.get_name() }}, {{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    default_js = HeatMap.default_js
+
+    def __init__(  # noqa: PLR0913
+        self,
+        levels: list[int],
+        base_url: str,
+        name: str | None = None,
+        *,
+        radius: int = 25,
+        blur: int = 15,
+        min_opacity: float = 0.5,
+    ):
+        super().__init__(name=name, overlay=True, control=True, show=True)
+        self._name = "TiledHeatMap"
+        if not levels:
+            raise ValueError("At least one zoom level is required")
+        self.levels = sorted(levels)
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.dataset = Path(base_url.rstrip("/")).name
+        self.callback = LOADED_CALLBACK
+        self.options = remove_empty(min_opacity=min_opacity, radius=radius, blur=blur)
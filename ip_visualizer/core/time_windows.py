@@ -0,0 +1,147 @@
+"""Requests bucketed into fixed time windows, rendered as a heatmap with a time slider."""
+
+from collections import Counter
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ip_visualizer.core.binning import Grid, bin_locations, cap_points
+from ip_visualizer.core.instrumentation import count, file_size
+from ip_visualizer.core.ip_parse import ParsedIPs, parse_ips
+from ip_visualizer.core.locations import LocationSet
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+TIMELINE_FILE = "ip_heatmap_timeline.html"
+# Elasticsearch exports carry the event time next to the address
+DEFAULT_TIME_COLUMN = "_source.@timestamp"
+# Every window is embedded in the page, so each gets far fewer points than a single heatmap
+DEFAULT_WINDOW_MAX_POINTS = 2_000
+MAX_WINDOWS = 1_000
+
+
+def parse_interval(interval: str) -> int:
+    """Length in nanoseconds of a pandas-style interval such as "15min", "1h" or "1D"; raises ValueError."""
+    import pandas as pd
+
+    try:
+        length = pd.Timedelta(interval)
+    except ValueError as error:
+        raise ValueError(f"Invalid interval {interval!r}; use e.g. 15min, 1h or 1D") from error
+    if length.value <= 0:
+        raise ValueError(f"The interval must be positive, got {interval!r}")
+    return length.value
+
+
+@dataclass
+class WindowCounts:
+    """
+    Requests per IP address in each time window, keyed by the window's start in nanoseconds since the epoch.
+
+    Rows that aren't a valid address, or lack a parseable timestamp, are only counted.
+    """
+
+    interval: int
+    windows: dict[int, Counter[str]] = field(default_factory=dict)
+    invalid: int = 0
+    untimed: int = 0
+
+    def update(self, other: "WindowCounts"):
+        for start, counts in other.windows.items():
+            self.windows.setdefault(start, Counter()).update(counts)
+        self.invalid += other.invalid
+        self.untimed += other.untimed
+
+    def total(self) -> int:
+        return sum(counts.total() for counts in self.windows.values())
+
+    def starts(self) -> list[int]:
+        """
+        Start of every window from the first to the last one with requests, empty ones included.
+
+        The gaps are kept so the time slider moves at a steady pace. Raises ValueError if
+        that is more than MAX_WINDOWS windows.
+        """
+        if not self.windows:
+            return []
+        first, last = min(self.windows), max(self.windows)
+        if (last - first) // self.interval >= MAX_WINDOWS:
+            raise ValueError(f"The requests span more than {MAX_WINDOWS} windows; choose a longer --interval")
+        return list(range(first, last + 1, self.interval))
+
+
+def count_windows(
+    ip_addresses: "pd.Series",
+    timestamps: "pd.Series",
+    interval: int,
+    remove_ports: bool = True,
+) -> WindowCounts:
+    """
+    Count one chunk of requests per time window and IP address, in vectorised passes.
+
+    Timestamps are parsed as ISO 8601 (those without a time zone are taken as UTC) and
+    floored to a multiple of `interval` nanoseconds since the epoch.
+    """
+    import pandas as pd
+
+    parsed = parse_ips(ip_addresses, strip_ports=remove_ports)
+    times = pd.to_datetime(timestamps, utc=True, errors="coerce", format="ISO8601")
+    timed = times.notna().to_numpy()
+    starts = times.to_numpy(dtype="datetime64[ns]").astype(np.int64) // interval * interval
+    valid = parsed.valid & timed
+
+    result = WindowCounts(interval, invalid=int((timed & ~parsed.valid).sum()), untimed=int((~timed).sum()))
+    # Group the rows by window with one stable sort, rather than a pass over the chunk per window
+    rows = np.flatnonzero(valid)
+    rows = rows[np.argsort(starts[rows], kind="stable")]
+    boundaries = np.flatnonzero(np.diff(starts[rows])) + 1
+    for group in np.split(rows, boundaries) if len(rows) else []:
+        window = ParsedIPs(parsed.version[group], parsed.high[group], parsed.low[group])
+        result.windows[int(starts[group[0]])] = Counter(window.value_counts())
+    return result
+
+
+def window_label(start: int) -> str:
+    """E.g. "2024-05-01 13:00" for a window starting at `start` nanoseconds since the epoch (UTC)."""
+    return np.datetime_as_string(np.datetime64(start, "ns"), unit="m").replace("T", " ")
+
+
+def window_points(locations: LocationSet, grid: Grid | None = None, max_points: int | None = None) -> LocationSet:
+    """One window's points, aggregated per coordinate or `grid` cell and capped like `create_heatmap`'s."""
+    if grid is not None:
+        return bin_locations(locations, grid, max_points)
+    points = locations.aggregate()
+    return points if max_points is None else cap_points(points, max_points)
+
+
+def create_timeline_heatmap(
+    window_locations: Mapping[int, LocationSet],
+    grid: Grid | None = None,
+    max_points: int | None = DEFAULT_WINDOW_MAX_POINTS,
+):
+    """
+    Create a heatmap with one frame per time window and a slider to play through them.
+
+    `window_locations` maps each window's start (see `WindowCounts.starts`) to its points,
+    in order. Each frame holds at most `max_points` of its heaviest points, so the page
+    grows with the number of windows rather than the number of requests.
+    """
+    import folium
+    from folium.plugins import HeatMapWithTime
+
+    print(f"Creating heatmap of {len(window_locations)} time windows...")
+    m = folium.Map(location=[20, 0], zoom_start=2)
+
+    frames = {start: window_points(locations, grid, max_points) for start, locations in window_locations.items()}
+    HeatMapWithTime(
+        [points.heat_data() for points in frames.values()],
+        index=[window_label(start) for start in frames],
+        auto_play=True,
+    ).add_to(m)
+
+    m.save(TIMELINE_FILE)
+    count(windows=len(frames), bins_emitted=sum(map(len, frames.values())), bytes_written=file_size(TIMELINE_FILE))
+    print(f"Map saved as {TIMELINE_FILE}")
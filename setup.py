@@ -9,9 +9,13 @@ setup(
         "pandas>=2.2.3",
         "folium>=0.19.5",
         "geoip2>=5.1.0",
+        "maxminddb>=2.7.0",
         "typer>=0.9.0",
         "rich>=13.7.0",
     ],
+    extras_require={
+        "zstd": ["zstandard>=0.23.0"],
+    },
     entry_points={
         "console_scripts": [
             "ip-visualizer=ip_visualizer.cli:app",
@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+import pytest
+
+from ip_visualizer.core.geoip_reader import DEFAULT_DB_PATH, close_reader, configure_reader
+from ip_visualizer.core.ip_lookup import clear_cache, clear_failure_stats, configure_persistent_cache
+from tests.test_ip_visualizer import create_mock_geoip_response
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_reader():
+    """Make sure every test opens its own (usually mocked) GeoLite2 reader and starts with empty caches."""
+    close_reader()
+    clear_cache()
+    clear_failure_stats()
+    yield
+    close_reader()
+    clear_cache()
+    configure_persistent_cache(None)
+
+
+@pytest.fixture
+def mock_reader():
+    """A mocked GeoLite2 reader that locates 8.8.8.8 and 1.1.1.1 (see `create_mock_geoip_response`)."""
+    with patch("geoip2.database.Reader") as reader:
+        reader.return_value.city.side_effect = create_mock_geoip_response
+        yield reader
+    # Workers reconfigure the shared reader; put the default one back
+    configure_reader(DEFAULT_DB_PATH)
@@ -0,0 +1,124 @@
+"""Test the benchmark harness and its synthetic database."""
+
+import geoip2.database
+import geoip2.errors
+import maxminddb
+import pytest
+
+from benchmarks.mmdb_writer import encode, write_mmdb
+from benchmarks.run import compare_results, run_benchmarks, run_case
+from benchmarks.synthetic_db import build_synthetic_db
+from ip_visualizer.core.geoip_reader import configure_reader
+from ip_visualizer.core.ip_generator import generate_ip_list
+
+RECORD = {
+    "city": {"names": {"en": "Test City"}},
+    "country": {"iso_code": "US", "names": {"en": "United States"}},
+    "location": {"latitude": 37.5, "longitude": -122.25, "time_zone": "UTC"},
+}
+
+
+@pytest.fixture(scope="module")
+def synthetic_db(tmp_path_factory):
+    """A small synthetic database, built once for the module."""
+    return build_synthetic_db(tmp_path_factory.mktemp("db") / "GeoLite2-City.mmdb", subnet_prefix=12)
+
+
+@pytest.fixture
+def _restore_reader():
+    yield
+    configure_reader()
+
+
+@pytest.mark.parametrize("mode", [maxminddb.MODE_AUTO, maxminddb.MODE_MEMORY])
+def test_written_database_round_trips(tmp_path, mode):
+    """Test that geoip2 reads back what the writer stored, with more specific networks taking precedence."""
+    other = {**RECORD, "city": {"names": {"en": "Other City"}}}
+    path = write_mmdb(tmp_path / "test.mmdb", [("10.0.0.0/8", RECORD), ("10.1.0.0/16", other)], build_epoch=42)
+
+    with geoip2.database.Reader(str(path), mode=mode) as reader:
+        assert reader.metadata().build_epoch == 42
+        assert reader.metadata().database_type == "GeoLite2-City"
+        response = reader.city("10.2.3.4")
+        assert response.city.name == "Test City"
+        assert response.location.latitude == pytest.approx(37.5)
+        assert reader.city("10.1.2.3").city.name == "Other City"
+        with pytest.raises(geoip2.errors.AddressNotFoundError):
+            reader.city("11.0.0.1")
+
+
+def test_writer_rejects_network_overlapping_earlier_ones(tmp_path):
+    """Test that a network can't be inserted over more specific networks."""
+    with pytest.raises(ValueError, match="insert it first"):
+        write_mmdb(tmp_path / "test.mmdb", [("10.1.0.0/16", RECORD), ("10.0.0.0/8", RECORD)])
+
+
+def test_encode_rejects_unsupported_values():
+    """Test the values the writer can't store."""
+    with pytest.raises(ValueError, match="Unsupported integer"):
+        encode(-1)
+    with pytest.raises(TypeError):
+        encode(object())
+
+
+def test_synthetic_database_covers_generated_ips(synthetic_db):
+    """Test that every generated address resolves in the synthetic database."""
+    with geoip2.database.Reader(str(synthetic_db)) as reader:
+        for ip in generate_ip_list(200, seed=1):
+            assert reader.city(ip).location.latitude is not None
+
+
+def test_synthetic_database_is_reproducible(tmp_path):
+    """Test that the same arguments build the same file."""
+    first = build_synthetic_db(tmp_path / "a.mmdb", subnet_prefix=10)
+    second = build_synthetic_db(tmp_path / "b.mmdb", subnet_prefix=10)
+
+    assert first.read_bytes() == second.read_bytes()
+
+
+@pytest.mark.usefixtures("_restore_reader")
+def test_run_case_reports_latency_percentiles(synthetic_db):
+    """Test a lookup case in this process, with throughput and per-call latencies."""
+    result = run_case("lookup_ip", 100, str(synthetic_db))
+
+    assert result["stage"] == "lookup_ip"
+    assert result["size"] == 100
+    assert result["ips_per_second"] > 0
+    assert 0 < result["p50_us"] <= result["p99_us"]
+
+
+@pytest.mark.usefixtures("_restore_reader")
+def test_run_benchmarks_in_process(synthetic_db, capsys):
+    """Test that every requested case is run and printed, without latencies for whole-batch stages."""
+    results = run_benchmarks(["parse", "index_lookup", "render"], [50], synthetic_db, repeat=2, isolated=False)
+
+    assert [result["stage"] for result in results] == ["parse", "index_lookup", "render"]
+    assert all(result["p99_us"] is None for result in results)
+    assert "index_lookup" in capsys.readouterr().out
+
+
+def _report(**metrics):
+    result = {"stage": "lookup", "size": 1000, "ips_per_second": 1000.0, "peak_rss_mb": 100.0, "p99_us": None}
+    return {"results": [{**result, **metrics}]}
+
+
+def test_compare_results_flags_regressions():
+    """Test that slower or bigger cases beyond the tolerance are reported, and improvements are not."""
+    assert compare_results(_report(), _report(ips_per_second=950.0)) == []
+    assert compare_results(_report(), _report(ips_per_second=2000.0, peak_rss_mb=50.0)) == []
+
+    regressions = compare_results(_report(p99_us=10.0), _report(ips_per_second=800.0, peak_rss_mb=130.0, p99_us=20.0))
+    assert len(regressions) == 3
+    assert regressions[0].startswith("lookup at 1,000: throughput")
+
+
+def test_compare_results_ignores_cases_missing_from_baseline():
+    """Test that new cases aren't reported as regressions."""
+    current = _report(ips_per_second=1.0)
+    current["results"][0]["size"] = 10
+
+    assert compare_results(_report(), current) == []
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from ip_visualizer.core.binning import Grid, bin_locations, cap_points
+from ip_visualizer.core.locations import LocationSet
+
+
+def test_grid_from_cell_size():
+    """Test square cells."""
+    grid = Grid.from_cell_size(1.0)
+
+    assert grid.rows == 180
+    assert grid.columns == 360
+
+
+def test_grid_from_geohash_precision():
+    """Test that geohash precisions map to the matching cell sizes."""
+    # One character: 3 longitude bits and 2 latitude bits, i.e. 8 x 4 cells of 45 degrees
+    assert Grid.from_geohash_precision(1) == Grid(45.0, 45.0)
+    # Five characters: roughly 4.9 km x 4.9 km
+    grid = Grid.from_geohash_precision(5)
+    assert grid.lat_step == pytest.approx(180 / 2**12)
+    assert grid.lon_step == pytest.approx(360 / 2**13)
+
+
+@pytest.mark.parametrize("precision", [0, 13])
+def test_grid_rejects_invalid_geohash_precision(precision):
+    """Test the geohash precision bounds."""
+    with pytest.raises(ValueError):
+        Grid.from_geohash_precision(precision)
+
+
+def test_grid_rejects_non_positive_steps():
+    """Test that empty cells are rejected."""
+    with pytest.raises(ValueError):
+        Grid.from_cell_size(0)
+
+
+def test_cell_ids_include_edges():
+    """Test that points on the poles and antimeridian fall inside the grid."""
+    grid = Grid.from_cell_size(10.0)
+    ids = grid.cell_ids(np.array([-90.0, 90.0, 0.0]), np.array([-180.0, 180.0, 0.0]))
+
+    assert ids.tolist() == [0, grid.rows * grid.columns - 1, 9 * grid.columns + 18]
+
+
+def test_bin_locations_sums_counts_per_cell():
+    """Test that nearby points are merged into their cell centre."""
+    locations = LocationSet.from_arrays(
+        [37.7749, 37.3382, 34.0522],
+        [-122.4194, -121.8863, -118.2437],
+        [5, 2, 3],
+    )
+
+    binned = bin_locations(locations, Grid.from_cell_size(1.0))
+
+    rows = sorted(binned.heat_data())
+    assert rows == [
+        pytest.approx([34.5, -118.5, 3]),
+        pytest.approx([37.5, -122.5, 5]),
+        pytest.approx([37.5, -121.5, 2]),
+    ]
+    assert binned.total() == locations.total()
+
+
+def test_bin_locations_coarse_grid():
+    """Test that a coarse grid merges whole regions."""
+    locations = LocationSet.from_arrays([37.7749, 37.3382, 34.0522], [-122.4194, -121.8863, -118.2437], [5, 2, 3])
+
+    binned = bin_locations(locations, Grid.from_cell_size(10.0))
+
+    assert sorted(binned.heat_data()) == [pytest.approx([35.0, -125.0, 7]), pytest.approx([35.0, -115.0, 3])]
+
+
+def test_bin_locations_caps_output_points():
+    """Test that only the heaviest cells are kept."""
+    locations = LocationSet.from_arrays([0.5, 10.5, 20.5, 30.5], [0.5, 0.5, 0.5, 0.5], [1, 40, 3, 20])
+
+    binned = bin_locations(locations, Grid.from_cell_size(1.0), max_points=2)
+
+    assert sorted(binned.count.tolist()) == [20, 40]
+
+
+def test_bin_locations_empty():
+    """Test that binning nothing gives nothing."""
+    assert len(bin_locations(LocationSet.empty(), Grid.from_cell_size(1.0))) == 0
+
+
+def test_cap_points_keeps_small_sets():
+    """Test that sets under the cap are returned unchanged."""
+    locations = LocationSet.from_arrays([1.0], [2.0])
+
+    assert cap_points(locations, 10) is locations
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,114 @@
+import ipaddress
+
+import pytest
+
+from ip_visualizer.core.cache import MISSING, LRUCache, PrefixCache
+
+
+def test_lru_cache_hit_and_miss_counters():
+    """Test that hits and misses are counted."""
+    cache = LRUCache(maxsize=2)
+    cache.put("8.8.8.8", {"city": "Mountain View"})
+
+    assert cache.get("8.8.8.8") == {"city": "Mountain View"}
+    assert cache.get("1.1.1.1") is MISSING
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_lru_cache_caches_none():
+    """Test that None can be stored as a negative result."""
+    cache = LRUCache(maxsize=2)
+    cache.put("192.168.1.1", None)
+
+    assert cache.get("192.168.1.1") is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_clear_resets_counters():
+    """Test that clearing drops entries and counters."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "maxsize": 2, "hits": 0, "misses": 0, "evictions": 0}
+
+
+def test_lru_cache_rejects_invalid_size():
+    """Test that a cache must hold at least one entry."""
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_prefix_cache_answers_any_address_in_network():
+    """Test that a cached network answers every address inside it."""
+    cache = PrefixCache(maxsize=10)
+    cache.put(ipaddress.ip_network("8.8.8.0/24"), {"city": "Mountain View"})
+
+    assert cache.get("8.8.8.8") == {"city": "Mountain View"}
+    assert cache.get("8.8.8.200") == {"city": "Mountain View"}
+    assert cache.get("8.8.9.1") is MISSING
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_prefix_cache_prefers_longest_prefix():
+    """Test that the most specific cached network wins."""
+    cache = PrefixCache(maxsize=10)
+    cache.put(ipaddress.ip_network("10.0.0.0/8"), "wide")
+    cache.put(ipaddress.ip_network("10.1.0.0/16"), "narrow")
+
+    assert cache.get("10.1.2.3") == "narrow"
+    assert cache.get("10.2.2.3") == "wide"
+
+
+def test_prefix_cache_keeps_ip_versions_apart():
+    """Test that IPv4 and IPv6 networks don't collide."""
+    cache = PrefixCache(maxsize=10)
+    cache.put(ipaddress.ip_network("::/8"), "v6")
+
+    assert cache.get("0.0.0.1") is MISSING
+    assert cache.get("::1") == "v6"
+
+
+def test_prefix_cache_ignores_malformed_addresses():
+    """Test that malformed addresses are a miss rather than an error."""
+    cache = PrefixCache(maxsize=10)
+
+    assert cache.get("invalid.ip") is MISSING
+
+
+def test_prefix_cache_evicts_least_recently_used_network():
+    """Test that the cache stays within its bound."""
+    cache = PrefixCache(maxsize=2)
+    cache.put(ipaddress.ip_network("1.0.0.0/24"), "a")
+    cache.put(ipaddress.ip_network("2.0.0.0/16"), "b")
+    cache.get("1.0.0.1")
+    cache.put(ipaddress.ip_network("3.0.0.0/24"), "c")
+
+    assert len(cache) == 2
+    assert cache.get("2.0.0.1") is MISSING
+    assert cache.get("1.0.0.1") == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
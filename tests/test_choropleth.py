@@ -0,0 +1,107 @@
+"""Test the per-country and per-continent aggregation and maps."""
+
+import json
+
+import pytest
+
+from ip_visualizer.core.choropleth import (
+    CHOROPLETH_FILE,
+    country_continents,
+    create_choropleth,
+    load_boundaries,
+    region_totals,
+)
+from ip_visualizer.core.locations import CONTINENT_CODES, LocationSet, encode_country
+
+EU, NA = CONTINENT_CODES.index("EU"), CONTINENT_CODES.index("NA")
+LOCATIONS = LocationSet.from_arrays(
+    [48.0, 52.0, 40.0, 50.0, 10.0],
+    [2.0, 13.0, -100.0, 10.0, 10.0],
+    [3, 5, 10, 1, 4],
+    country=[encode_country(code) for code in ("FR", "DE", "US", "DE", None)],
+    continent=[EU, EU, NA, EU, 0],
+)
+
+
+def _feature(code: str) -> dict:
+    ring = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    return {"type": "Feature", "properties": {"ISO_A2": code}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+
+BOUNDARIES = {"type": "FeatureCollection", "features": [_feature(code) for code in ("FR", "DE", "US", "BR")]}
+
+
+def test_region_totals_per_country():
+    """Test that requests are summed per country, heaviest first, leaving out unknown countries."""
+    totals = region_totals(LOCATIONS)
+
+    assert totals.as_dict() == {"US": 10, "DE": 6, "FR": 3}
+    # Request-weighted centre of the two German points
+    assert totals.latitude[1] == pytest.approx((52.0 * 5 + 50.0) / 6)
+    assert totals.longitude[1] == pytest.approx((13.0 * 5 + 10.0) / 6)
+
+
+def test_region_totals_per_continent():
+    """Test the continent level."""
+    assert region_totals(LOCATIONS, "continent").as_dict() == {"NA": 10, "EU": 9}
+
+
+def test_region_totals_requires_codes():
+    """Test that points geolocated without codes are refused."""
+    with pytest.raises(ValueError, match="with_codes"):
+        region_totals(LocationSet.from_arrays([1.0], [2.0]))
+    with pytest.raises(ValueError, match="Unknown level"):
+        region_totals(LOCATIONS, "city")
+
+
+def test_region_totals_of_empty_set():
+    """Test that no points give no regions."""
+    assert len(region_totals(LocationSet.empty(with_codes=True))) == 0
+
+
+def test_country_continents():
+    """Test the country to continent mapping learned from the points."""
+    assert country_continents(LOCATIONS) == {"DE": "EU", "FR": "EU", "US": "NA"}
+
+
+def test_load_boundaries(tmp_path):
+    """Test that boundary files without the ISO code property are rejected."""
+    path = tmp_path / "countries.geojson"
+    path.write_text(json.dumps(BOUNDARIES))
+
+    assert load_boundaries(path) == BOUNDARIES
+    with pytest.raises(ValueError, match="--boundary-key"):
+        load_boundaries(path, key="ISO_A2_EH")
+    path.write_text("{not json")
+    with pytest.raises(ValueError, match="not valid GeoJSON"):
+        load_boundaries(path)
+    path.write_text("[]")
+    with pytest.raises(ValueError, match="FeatureCollection"):
+        load_boundaries(path)
+
+
+@pytest.mark.parametrize("level", ["country", "continent"])
+def test_create_choropleth_with_boundaries(tmp_path, monkeypatch, level):
+    """Test that the boundaries are filled and embedded in the map."""
+    monkeypatch.chdir(tmp_path)
+
+    create_choropleth(LOCATIONS, level, BOUNDARIES)
+
+    html = (tmp_path / CHOROPLETH_FILE).read_text()
+    assert "feature.properties.ISO_A2" in html
+    assert f"Requests per {level}" in html
+
+
+def test_create_choropleth_without_boundaries(tmp_path, monkeypatch):
+    """Test the fallback of one circle per region."""
+    monkeypatch.chdir(tmp_path)
+
+    create_choropleth(LOCATIONS)
+
+    html = (tmp_path / CHOROPLETH_FILE).read_text()
+    assert html.count("L.circleMarker(") == 3
+    assert "US: 10 requests" in html
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
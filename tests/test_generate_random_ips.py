@@ -1,9 +1,22 @@
+import io
 import ipaddress
-from unittest.mock import patch
 
+import numpy as np
 import pytest
 
-from ip_visualizer.core.ip_generator import generate_ip_list, generate_random_ip
+from ip_visualizer.core.ip_generator import (
+    OutputFormat,
+    format_ips,
+    generate_ip_array,
+    generate_ip_chunks,
+    generate_ip_list,
+    generate_random_ip,
+    stream_ips,
+    write_ips,
+)
+from ip_visualizer.core.sampling import load_sampling_config
+
+IP_RANGES = {name: list(region.prefixes) for name, region in load_sampling_config().regions.items()}
 
 
 def test_generate_random_ip_with_standard_network():
@@ -80,51 +93,35 @@ def test_generate_random_ip_with_non_strict_network():
 
 def test_generate_ip_list_default_count():
     """Test generating default number of IPs."""
-    with patch("ip_visualizer.core.ip_generator.generate_random_ip") as mock_gen_ip:
-        # Mock generate_random_ip to return predictable values
-        mock_gen_ip.side_effect = [f"192.168.1.{i}" for i in range(100)]
-
-        result = generate_ip_list()
+    result = generate_ip_list()
 
-        assert len(result) == 100
-        assert all(ip.startswith("192.168.1.") for ip in result)
+    assert len(result) == 100
+    assert all(isinstance(ip, str) for ip in result)
 
 
 def test_generate_ip_list_custom_count():
     """Test generating a custom number of IPs."""
-    with patch("ip_visualizer.core.ip_generator.generate_random_ip") as mock_gen_ip:
-        # Mock generate_random_ip to return predictable values
-        mock_gen_ip.side_effect = [f"10.0.0.{i}" for i in range(50)]
-
-        result = generate_ip_list(total_ips=50)
+    result = generate_ip_list(total_ips=50)
 
-        assert len(result) == 50
-        assert all(ip.startswith("10.0.0.") for ip in result)
+    assert len(result) == 50
 
 
 def test_generate_ip_list_regional_distribution():
-    """Test that IPs are generated from different regions."""
-    # Mock the random choice to ensure we test the distribution logic
-    with (
-        patch("random.choice") as mock_choice,
-        patch("ip_visualizer.core.ip_generator.generate_random_ip") as mock_gen_ip,
-    ):
-        # Mock the continent selection to cycle through regions
-        mock_choice.side_effect = [
-            "Asia",
-            "Europe",
-            "North America",
-            "South America",
-        ] * 25
-
-        # Mock IP generation to return unique IPs
-        mock_gen_ip.side_effect = [f"10.0.{i}.1" for i in range(100)]
-
-        result = generate_ip_list(total_ips=100)
-
-        assert len(result) == 100
-        assert len(set(result)) == 100  # All IPs should be unique
-        assert all(ip.startswith("10.0.") for ip in result)
+    """Test that IPs are generated from the configured regional ranges in the right proportions."""
+    networks = {region: [ipaddress.ip_network(prefix) for prefix in prefixes] for region, prefixes in IP_RANGES.items()}
+
+    result = generate_ip_list(total_ips=1000, seed=7)
+
+    assert len(result) == 1000
+    south_america = 0
+    for ip in result:
+        ip_obj = ipaddress.IPv4Address(ip)
+        regions = [region for region, nets in networks.items() if any(ip_obj in net for net in nets)]
+        assert regions, f"{ip} is outside every configured range"
+        # 167.0.0.0/8 is listed under two regions
+        south_america += "South America" in regions and "North America" not in regions
+    # Exactly 100 come from South America, a few of them from the shared 167.0.0.0/8
+    assert 90 <= south_america <= 100
 
 
 def test_generate_ip_list_with_small_quantity():
@@ -138,14 +135,128 @@ def test_generate_ip_list_with_small_quantity():
 
 def test_generate_ip_list_with_large_quantity():
     """Test generating a large number of IPs."""
-    with patch("ip_visualizer.core.ip_generator.generate_random_ip") as mock_gen_ip:
-        # Mock generate_random_ip to return unique IPs
-        mock_gen_ip.side_effect = [f"192.168.{i // 256}.{i % 256}" for i in range(1000)]
+    result = generate_ip_list(total_ips=100_000)
+
+    assert len(result) == 100_000
+    assert len(set(result)) > 99_000  # /8 ranges make collisions rare
+
+
+def test_generate_ip_list_is_reproducible_with_seed():
+    """Test that a seed gives the same addresses every time."""
+    assert generate_ip_list(total_ips=20, seed=42) == generate_ip_list(total_ips=20, seed=42)
+    assert generate_ip_list(total_ips=20, seed=42) != generate_ip_list(total_ips=20, seed=43)
+
+
+def test_generate_ip_array_excludes_network_and_broadcast():
+    """Test that generated hosts avoid the network and broadcast addresses of each /8."""
+    ip_array = generate_ip_array(total_ips=10_000, seed=1)
+
+    assert ip_array.dtype == np.uint32
+    host_bits = ip_array & 0x00FFFFFF
+    assert not np.any(host_bits == 0)
+    assert not np.any(host_bits == 0x00FFFFFF)
+
+
+def test_generate_ip_array_uses_given_rng():
+    """Test that an existing generator can be passed in."""
+    first = generate_ip_array(total_ips=10, rng=np.random.default_rng(5))
+    second = generate_ip_array(total_ips=10, seed=5)
+
+    assert first.tolist() == second.tolist()
+
+
+def test_format_ips():
+    """Test converting integer addresses to dotted quads."""
+    ip_array = np.array([1, 0x08080808, 0xC0A80101, 0xFFFFFFFF], dtype=np.uint32)
+
+    assert format_ips(ip_array) == ["0.0.0.1", "8.8.8.8", "192.168.1.1", "255.255.255.255"]
+
+
+def test_generate_ip_chunks_sizes():
+    """Test that chunks add up to the requested total."""
+    chunks = list(generate_ip_chunks(25, chunk_size=10, seed=3))
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert all(chunk.dtype == np.uint32 for chunk in chunks)
+
+
+def test_generate_ip_chunks_preserves_regional_mix_per_chunk():
+    """Test that regions are interleaved rather than generated one after another."""
+    south_america = [ipaddress.ip_network(prefix) for prefix in IP_RANGES["South America"]]
+    south_america_firsts = {int(net.network_address) >> 24 for net in south_america}
+
+    for chunk in generate_ip_chunks(20_000, chunk_size=5_000, seed=11):
+        share = np.isin(chunk >> 24, list(south_america_firsts)).mean()
+        # 10% South America, plus North America's half share of 167/8
+        assert 0.09 < share < 0.115
+
+
+def test_generate_ip_chunks_totals_are_exact():
+    """Test that region totals over a whole stream match the configured weights exactly."""
+    south_america = {int(ipaddress.ip_network(prefix).network_address) >> 24 for prefix in IP_RANGES["South America"]}
+    south_america.discard(167)  # shared with North America
+
+    chunks = list(generate_ip_chunks(10_000, chunk_size=3_000, seed=2))
+    first_octets = np.concatenate(chunks) >> 24
+
+    assert len(first_octets) == 10_000
+    assert 960 <= np.isin(first_octets, list(south_america)).sum() <= 1_000
+
+
+def test_generate_ip_chunks_is_reproducible_with_seed():
+    """Test that a seed gives the same stream."""
+    first = np.concatenate(list(generate_ip_chunks(100, chunk_size=30, seed=9)))
+    second = np.concatenate(list(generate_ip_chunks(100, chunk_size=30, seed=9)))
+
+    assert first.tolist() == second.tolist()
+
+
+def test_write_ips_plain():
+    """Test writing one address per line."""
+    output = io.BytesIO()
+
+    written = write_ips([np.array([0x08080808, 0x01010101], dtype=np.uint32)], output)
+
+    assert written == 2
+    assert output.getvalue() == b"8.8.8.8\n1.1.1.1\n"
+
+
+def test_write_ips_csv():
+    """Test writing a CSV with a header."""
+    output = io.BytesIO()
+
+    write_ips([np.array([0x08080808], dtype=np.uint32), np.array([], dtype=np.uint32)], output, OutputFormat.CSV)
+
+    assert output.getvalue() == b"ip\n8.8.8.8\n"
+
+
+def test_write_ips_binary():
+    """Test writing addresses as 4 bytes each in network byte order."""
+    output = io.BytesIO()
+
+    write_ips([np.array([0x08080808, 0xC0A80101], dtype=np.uint32)], output, OutputFormat.BINARY)
+
+    assert output.getvalue() == bytes([8, 8, 8, 8, 192, 168, 1, 1])
+
+
+def test_stream_ips_to_file(tmp_path):
+    """Test streaming straight to a file."""
+    path = tmp_path / "ips.txt"
+
+    written = stream_ips(1_000, str(path), chunk_size=300, seed=5)
+
+    lines = path.read_text().splitlines()
+    assert written == 1_000
+    assert len(lines) == 1_000
+    for ip in lines:
+        ipaddress.IPv4Address(ip)
+
 
-        result = generate_ip_list(total_ips=1000)
+def test_stream_ips_to_stdout(capsysbinary):
+    """Test streaming to stdout when no file is given."""
+    stream_ips(3, output_format=OutputFormat.BINARY, seed=5)
 
-        assert len(result) == 1000
-        assert len(set(result)) == 1000  # All IPs should be unique
+    assert len(capsysbinary.readouterr().out) == 12
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""Test the compact geolocation index."""
+
+import ipaddress
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from ip_visualizer.core.geo_index import (
+    NOT_FOUND,
+    build_index,
+    default_index_path,
+    ensure_index,
+    index_coordinates,
+    load_index,
+    locate_ip_counts,
+    write_index,
+)
+from ip_visualizer.core.locations import encode_continent, encode_country
+
+LONDON = {
+    "location": {"latitude": 51.5, "longitude": -0.12},
+    "country": {"iso_code": "GB"},
+    "continent": {"code": "EU"},
+}
+NEW_YORK = {
+    "location": {"latitude": 40.71, "longitude": -74.0},
+    "country": {"iso_code": "US"},
+    "continent": {"code": "NA"},
+}
+NETWORKS = [
+    (ipaddress.ip_network("81.2.69.0/24"), LONDON),
+    (ipaddress.ip_network("81.2.70.0/24"), LONDON),
+    (ipaddress.ip_network("8.8.8.0/24"), NEW_YORK),
+    (ipaddress.ip_network("9.9.9.0/24"), {"country": {"iso_code": "US"}}),
+    (ipaddress.ip_network("2001:db8::/32"), NEW_YORK),
+]
+
+
+def ip_ints(*ips):
+    return np.array([int(ipaddress.IPv4Address(ip)) for ip in ips], dtype=np.uint32)
+
+
+def mock_city_response(ip):
+    """What the database reader finds for the IPv6 addresses of these tests: Paris for 2001:db8::1 only."""
+    response = MagicMock()
+    found = ip == "2001:db8::1"
+    response.location.latitude, response.location.longitude = (48.86, 2.35) if found else (None, None)
+    response.country.iso_code, response.continent.code = ("FR", "EU") if found else (None, None)
+    return response
+
+
+def mock_database(networks, build_epoch):
+    reader = MagicMock()
+    reader.__enter__.return_value = reader
+    reader.__iter__.side_effect = lambda: iter(networks)
+    reader.metadata.return_value.build_epoch = build_epoch
+    return reader
+
+
+def test_build_index_merges_ranges_and_deduplicates_locations():
+    """Test that adjacent ranges with one location merge and locations are stored once."""
+    index = build_index(NETWORKS, build_epoch=123)
+
+    assert index.build_epoch == 123
+    # 8.8.8.0/24 and the merged 81.2.69.0-81.2.70.255; no coordinates for 9.9.9.0/24, IPv6 skipped
+    assert len(index) == 2
+    assert index.start.tolist() == ip_ints("8.8.8.0", "81.2.69.0").tolist()
+    assert index.end.tolist() == ip_ints("8.8.8.255", "81.2.70.255").tolist()
+    assert len(index.latitude) == 2
+
+
+def test_build_index_skips_overlapping_duplicates():
+    """Test that a block reached twice is indexed once."""
+    index = build_index(NETWORKS[:1] * 2, build_epoch=1)
+
+    assert len(index) == 1
+
+
+def test_lookup():
+    """Test range lookups, including gaps and addresses past either end."""
+    index = build_index(NETWORKS, build_epoch=1)
+
+    location_ids = index.lookup(ip_ints("0.0.0.1", "8.8.8.8", "8.8.9.0", "81.2.70.200", "255.255.255.255"))
+
+    assert location_ids[[0, 2, 4]].tolist() == [NOT_FOUND] * 3
+    assert index.latitude[location_ids[1]] == pytest.approx(40.71)
+    assert index.latitude[location_ids[3]] == pytest.approx(51.5)
+
+
+def test_lookup_empty_index():
+    """Test that an empty index finds nothing."""
+    index = build_index([], build_epoch=1)
+
+    assert index.lookup(ip_ints("8.8.8.8")).tolist() == [NOT_FOUND]
+
+
+@patch("geoip2.database.Reader")
+def test_locate_ip_counts(mock_reader):
+    """Test resolving IPv4 against the index and IPv6 with the database, dropping unknown and malformed ones."""
+    mock_reader.return_value.city.side_effect = mock_city_response
+    index = build_index(NETWORKS, build_epoch=1)
+    ip_counts = {"81.2.69.142": 3, "8.8.8.8": 2, "1.1.1.1": 5, "2001:db8::1": 4, "2001:db8::2": 1, "not-an-ip": 1}
+
+    locations = locate_ip_counts(ip_counts, index, with_codes=True)
+
+    assert locations.latitude.tolist() == pytest.approx([51.5, 40.71, 48.86])
+    assert locations.count.tolist() == [3, 2, 4]
+    assert locations.country.tolist() == [encode_country("GB"), encode_country("US"), encode_country("FR")]
+    assert locations.continent.tolist() == [encode_continent("EU"), encode_continent("NA"), encode_continent("EU")]
+    assert sorted(call.args[0] for call in mock_reader.return_value.city.call_args_list) == [
+        "2001:db8::1",
+        "2001:db8::2",
+    ]
+
+
+@patch("geoip2.database.Reader")
+def test_index_coordinates(mock_reader):
+    """Test per-address coordinates in input order, NaN for unknown and malformed addresses."""
+    mock_reader.return_value.city.side_effect = mock_city_response
+    index = build_index(NETWORKS, build_epoch=1)
+
+    coordinates = index_coordinates(["8.8.8.8", "2001:db8::1", "81.2.69.142", "1.1.1.1", "not-an-ip"], index)
+
+    np.testing.assert_allclose(coordinates[[0, 1, 2]], [[40.71, -74.0], [48.86, 2.35], [51.5, -0.12]], rtol=1e-6)
+    assert np.isnan(coordinates[[3, 4]]).all()
+
+
+@patch("geoip2.database.Reader", side_effect=FileNotFoundError)
+def test_index_without_database_drops_ipv6(mock_reader):
+    """Test that an index used without its database still resolves IPv4, leaving IPv6 unlocated."""
+    index = build_index(NETWORKS, build_epoch=1)
+
+    assert locate_ip_counts({"8.8.8.8": 2, "2001:db8::1": 4}, index).count.tolist() == [2]
+    assert np.isnan(index_coordinates(["8.8.8.8", "2001:db8::1"], index)[1]).all()
+
+
+def test_write_and_load_round_trip(tmp_path):
+    """Test that a saved index is memory-mapped back unchanged."""
+    index = build_index(NETWORKS, build_epoch=456)
+    path = tmp_path / "GeoLite2-City.idx"
+
+    write_index(index, path)
+    loaded = load_index(path)
+
+    assert loaded.build_epoch == 456
+    for name in ("start", "end", "location_id", "latitude", "longitude", "country", "continent"):
+        assert getattr(loaded, name).tolist() == getattr(index, name).tolist()
+    assert loaded.lookup(ip_ints("81.2.69.1")).tolist() == index.lookup(ip_ints("81.2.69.1")).tolist()
+    assert not (tmp_path / "GeoLite2-City.idx.tmp").exists()
+
+
+def test_load_index_rejects_other_files(tmp_path):
+    """Test that a file without the index magic is refused."""
+    path = tmp_path / "bogus.idx"
+    path.write_bytes(b"not an index at all")
+
+    with pytest.raises(ValueError):
+        load_index(path)
+
+
+def test_default_index_path():
+    """Test that the index lives next to the database."""
+    assert str(default_index_path("data/GeoLite2-City.mmdb")) == "data/GeoLite2-City.idx"
+
+
+def test_ensure_index_builds_and_reuses(tmp_path):
+    """Test that the index is built once and reused while the database is unchanged."""
+    db_path = tmp_path / "GeoLite2-City.mmdb"
+    with patch("maxminddb.open_database", return_value=mock_database(NETWORKS, 100)) as open_database:
+        first = ensure_index(db_path)
+        built = open_database.return_value.__iter__.call_count
+        second = ensure_index(db_path)
+
+    assert built == 1
+    assert open_database.return_value.__iter__.call_count == 1
+    assert (tmp_path / "GeoLite2-City.idx").exists()
+    assert first.build_epoch == second.build_epoch == 100
+
+
+def test_ensure_index_in_read_only_directory(tmp_path, capsys):
+    """Test that an index that can't be saved next to the database is still used for the run."""
+    db_path = tmp_path / "GeoLite2-City.mmdb"
+    with (
+        patch("maxminddb.open_database", return_value=mock_database(NETWORKS, 100)),
+        patch("os.replace", side_effect=PermissionError("read-only")),
+    ):
+        index = ensure_index(db_path)
+
+    assert index.lookup(ip_ints("8.8.8.8")).tolist() != [NOT_FOUND]
+    assert "Could not save the index (read-only)" in capsys.readouterr().out
+    assert not list(tmp_path.iterdir())
+
+
+def test_ensure_index_rebuilds_when_stale(tmp_path):
+    """Test that a newer database build triggers a rebuild."""
+    db_path = tmp_path / "GeoLite2-City.mmdb"
+    write_index(build_index(NETWORKS[:1], build_epoch=100), default_index_path(db_path))
+
+    with patch("maxminddb.open_database", return_value=mock_database(NETWORKS, 200)):
+        index = ensure_index(db_path)
+
+    assert index.build_epoch == 200
+    assert len(index) == 2
+
+
+def test_ensure_index_without_database(tmp_path):
+    """Test that an existing index is used when the database is gone, and an error if neither exists."""
+    db_path = tmp_path / "GeoLite2-City.mmdb"
+    with pytest.raises(FileNotFoundError):
+        ensure_index(db_path)
+
+    write_index(build_index(NETWORKS, build_epoch=100), default_index_path(db_path))
+    assert ensure_index(db_path).build_epoch == 100
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
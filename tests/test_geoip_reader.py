@@ -0,0 +1,142 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import maxminddb
+import pytest
+
+from benchmarks.mmdb_writer import write_mmdb
+from ip_visualizer.core.geoip_reader import GeoIPReaderManager, configure_reader, get_reader, get_reader_manager
+from ip_visualizer.core.ip_lookup import lookup_ip
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = tmp_path / "test.mmdb"
+    path.write_bytes(b"first version")
+    return path
+
+
+@patch("geoip2.database.Reader")
+def test_reader_is_opened_once(mock_reader, db_file):
+    """Test that repeated calls share a single reader."""
+    manager = GeoIPReaderManager(str(db_file), check_interval=0)
+
+    first = manager.get_reader()
+    second = manager.get_reader()
+
+    assert first is second
+    mock_reader.assert_called_once_with(str(db_file), mode=maxminddb.MODE_AUTO)
+
+
+@patch("geoip2.database.Reader")
+def test_reader_uses_configured_mode(mock_reader, db_file):
+    """Test that the open mode is passed through to geoip2."""
+    manager = GeoIPReaderManager(str(db_file), mode=maxminddb.MODE_MEMORY)
+    manager.get_reader()
+
+    mock_reader.assert_called_once_with(str(db_file), mode=maxminddb.MODE_MEMORY)
+
+
+@patch("geoip2.database.Reader")
+def test_reader_reloads_when_file_changes(mock_reader, db_file):
+    """Test that a replaced database file is picked up without a restart."""
+    mock_reader.side_effect = [MagicMock(name="old"), MagicMock(name="new")]
+    manager = GeoIPReaderManager(str(db_file), check_interval=0)
+
+    old_reader = manager.get_reader()
+    db_file.write_bytes(b"second, longer version")
+    new_reader = manager.get_reader()
+
+    assert old_reader is not new_reader
+    assert mock_reader.call_count == 2
+    # The old reader may still be in use by other threads, so it is not closed
+    old_reader.close.assert_not_called()
+
+
+@patch("geoip2.database.Reader")
+def test_generation_changes_on_reload_and_close(mock_reader, db_file):
+    """Test that caches can tell when the database they were filled from has gone."""
+    manager = GeoIPReaderManager(str(db_file), check_interval=0)
+
+    first = manager.current_generation()
+    manager.get_reader()
+    assert manager.current_generation() == first
+
+    db_file.write_bytes(b"second, longer version")
+    reloaded = manager.current_generation()
+    assert reloaded != first
+    assert mock_reader.call_count == 2
+
+    manager.close()
+    assert manager.current_generation() not in {first, reloaded}
+
+
+@pytest.mark.parametrize("mode", [maxminddb.MODE_AUTO, maxminddb.MODE_MEMORY])
+def test_reader_keeps_serving_when_new_file_is_unreadable(tmp_path, mode):
+    """Test that a half-written database file leaves the open one in use, and its cached results valid."""
+    record = {"location": {"latitude": 37.5, "longitude": -122.25}}
+    db_path = write_mmdb(tmp_path / "test.mmdb", [("8.8.8.0/24", record)])
+    original = get_reader_manager()
+    try:
+        manager = configure_reader(str(db_path), mode=mode, check_interval=0)
+        assert lookup_ip("8.8.8.8")["latitude"] == 37.5
+        reader, generation = manager.get_reader(), manager.current_generation()
+
+        db_path.write_bytes(db_path.read_bytes()[: db_path.stat().st_size // 2])
+
+        assert lookup_ip("8.8.8.9")["latitude"] == 37.5
+        assert manager.get_reader() is reader
+        assert manager.current_generation() == generation
+    finally:
+        configure_reader(original.db_path, original.mode, original.check_interval)
+
+
+@patch("geoip2.database.Reader")
+def test_reader_keeps_serving_while_file_is_missing(mock_reader, db_file):
+    """Test that a briefly missing file does not drop the open reader."""
+    manager = GeoIPReaderManager(str(db_file), check_interval=0)
+
+    reader = manager.get_reader()
+    os.remove(db_file)
+
+    assert manager.get_reader() is reader
+    mock_reader.assert_called_once()
+
+
+@patch("geoip2.database.Reader")
+def test_reader_skips_stat_within_check_interval(mock_reader, db_file):
+    """Test that the file is not re-checked on every lookup."""
+    manager = GeoIPReaderManager(str(db_file), check_interval=3600)
+
+    reader = manager.get_reader()
+    db_file.write_bytes(b"second, longer version")
+
+    assert manager.get_reader() is reader
+    mock_reader.assert_called_once()
+
+
+@patch("geoip2.database.Reader")
+def test_close_reopens_on_next_use(mock_reader, db_file):
+    """Test that closing the manager forces a fresh reader."""
+    manager = GeoIPReaderManager(str(db_file))
+
+    reader = manager.get_reader()
+    manager.close()
+    manager.get_reader()
+
+    reader.close.assert_called_once()
+    assert mock_reader.call_count == 2
+
+
+@patch("geoip2.database.Reader")
+def test_configure_reader_replaces_shared_manager(mock_reader, db_file):
+    """Test that the shared reader can be pointed at another database."""
+    original = get_reader_manager()
+    try:
+        manager = configure_reader(str(db_file))
+        get_reader()
+
+        assert get_reader_manager() is manager
+        mock_reader.assert_called_once_with(str(db_file), mode=maxminddb.MODE_AUTO)
+    finally:
+        configure_reader(original.db_path, original.mode, original.check_interval)
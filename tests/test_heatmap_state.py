@@ -0,0 +1,123 @@
+"""Test the persistent heatmap aggregation state."""
+
+import numpy as np
+import pytest
+
+from ip_visualizer.core.binning import Grid
+from ip_visualizer.core.heatmap_state import (
+    DEFAULT_STATE_CELL_SIZE,
+    HeatmapState,
+    load_state,
+    load_state_grid,
+    merge_state_files,
+    save_state,
+)
+from ip_visualizer.core.locations import LocationSet
+
+GRID = Grid.from_cell_size(1.0)
+MONDAY = LocationSet.from_arrays([37.7749, 37.3382, 51.5], [-122.4194, -122.1, -0.12], [5, 2, 1])
+TUESDAY = LocationSet.from_arrays([37.6, 34.0522], [-122.3, -118.2437], [4, 3])
+
+
+def test_from_locations_bins_points():
+    """Test that points are summed per grid cell."""
+    state = HeatmapState.from_locations(MONDAY, GRID)
+
+    assert len(state) == 2
+    assert state.total() == 8
+    assert state.batches == 1
+    assert np.all(np.diff(state.cells) > 0)
+
+
+def test_empty_state_uses_default_grid():
+    """Test the default grid and the empty state."""
+    state = HeatmapState.empty()
+
+    assert state.grid == Grid.from_cell_size(DEFAULT_STATE_CELL_SIZE)
+    assert state.total() == 0
+    assert len(state.to_locations()) == 0
+
+
+def test_merge_sums_counts_per_cell():
+    """Test that merging is the same as binning all the data at once."""
+    merged = HeatmapState.from_locations(MONDAY, GRID).merge(HeatmapState.from_locations(TUESDAY, GRID))
+    together = HeatmapState.from_locations(LocationSet.concatenate([MONDAY, TUESDAY]), GRID)
+
+    assert merged.cells.tolist() == together.cells.tolist()
+    assert merged.counts.tolist() == together.counts.tolist()
+    assert merged.batches == 2
+
+
+def test_merge_is_order_independent():
+    """Test that partials can be combined in any order."""
+    first, second = HeatmapState.from_locations(MONDAY, GRID), HeatmapState.from_locations(TUESDAY, GRID)
+
+    assert first.merge(second).counts.tolist() == second.merge(first).counts.tolist()
+
+
+def test_merge_rejects_different_grids():
+    """Test that states binned on different grids can't be merged."""
+    with pytest.raises(ValueError):
+        HeatmapState.from_locations(MONDAY, GRID).merge(HeatmapState.from_locations(TUESDAY))
+
+
+def test_update_and_to_locations():
+    """Test that a new batch lands in the existing cells and renders at cell centres."""
+    state = HeatmapState.from_locations(MONDAY, GRID).update(TUESDAY)
+
+    rows = sorted(state.to_locations().heat_data())
+    assert rows == [
+        pytest.approx([34.5, -118.5, 3]),
+        pytest.approx([37.5, -122.5, 11]),
+        pytest.approx([51.5, -0.5, 1]),
+    ]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    """Test that a saved state loads back unchanged."""
+    state = HeatmapState.from_locations(MONDAY, GRID).update(TUESDAY)
+    path = tmp_path / "state.npz"
+
+    save_state(state, path)
+    loaded = load_state(path)
+
+    assert loaded.grid == GRID
+    assert loaded.batches == 2
+    assert loaded.cells.tolist() == state.cells.tolist()
+    assert loaded.counts.tolist() == state.counts.tolist()
+    assert not (tmp_path / "state.npz.tmp").exists()
+
+
+def test_load_state_rejects_other_files(tmp_path):
+    """Test that a file that isn't a state is refused."""
+    path = tmp_path / "bogus.npz"
+    path.write_bytes(b"not a state at all")
+
+    with pytest.raises(ValueError, match="not a heatmap state"):
+        load_state(path)
+    with pytest.raises(ValueError, match="not a heatmap state"):
+        load_state_grid(path)
+
+
+def test_load_state_grid(tmp_path):
+    """Test reading just the grid of a saved state."""
+    save_state(HeatmapState.from_locations(MONDAY, GRID), tmp_path / "state.npz")
+
+    assert load_state_grid(tmp_path / "state.npz") == GRID
+
+
+def test_merge_state_files(tmp_path):
+    """Test combining shards saved separately."""
+    save_state(HeatmapState.from_locations(MONDAY, GRID), tmp_path / "a.npz")
+    save_state(HeatmapState.from_locations(TUESDAY, GRID), tmp_path / "b.npz")
+
+    merged = merge_state_files([tmp_path / "a.npz", tmp_path / "b.npz"])
+
+    assert merged.total() == 15
+    assert merged.batches == 2
+    with pytest.raises(ValueError):
+        merge_state_files([])
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
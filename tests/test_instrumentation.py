@@ -0,0 +1,112 @@
+"""Test the per-stage timings, counters and profiling hooks."""
+
+import json
+import pstats
+
+import pytest
+
+from ip_visualizer.core.instrumentation import RunStats, add_busy_time, collect_stats, count, file_size, stage
+
+
+def test_stage_records_time_and_counters():
+    """Test that counters go to the innermost running stage and re-entering a stage adds to it."""
+    run_stats = RunStats()
+    with collect_stats(run_stats):
+        count(files=2)
+        with stage("read"):
+            count(rows_read=10)
+            with stage("lookup"):
+                count(lookups=3)
+            count(rows_read=5)
+        with stage("read"):
+            count(rows_read=1)
+
+    assert run_stats.counters == {"files": 2}
+    assert run_stats.stages["read"].counters == {"rows_read": 16}
+    assert run_stats.stages["lookup"].counters == {"lookups": 3}
+    assert run_stats.stages["read"].wall_seconds >= run_stats.stages["lookup"].wall_seconds > 0
+
+
+def test_busy_time_of_concurrent_steps():
+    """Test that step timings add up within the innermost stage and are dropped outside any stage."""
+    run_stats = RunStats()
+    with collect_stats(run_stats):
+        add_busy_time(parse=1.0)
+        with stage("pipeline"):
+            add_busy_time(parse=0.5, lookup=2.0)
+            add_busy_time(lookup=1.5)
+
+    assert run_stats.stages["pipeline"].busy_seconds == {"parse": 0.5, "lookup": 3.5}
+    assert "parse" not in run_stats.counters
+
+
+def test_stage_and_count_do_nothing_without_collector():
+    """Test that instrumented code runs normally when no run is collected."""
+    with stage("read") as stats:
+        count(rows_read=1)
+
+    assert stats is None
+
+
+def test_stage_is_closed_on_error():
+    """Test that a failing stage still records its time and later counters go elsewhere."""
+    run_stats = RunStats()
+    with collect_stats(run_stats), pytest.raises(FileNotFoundError):
+        with stage("lookup"):
+            raise FileNotFoundError
+    with collect_stats(run_stats):
+        count(lookups=1)
+
+    assert run_stats.stages["lookup"].wall_seconds > 0
+    assert run_stats.counters == {"lookups": 1}
+
+
+def test_profile_and_trace_memory_selected_stages(tmp_path):
+    """Test that only the selected stages are profiled, and 'all' traces memory in every stage."""
+    run_stats = RunStats(profile=["render"], trace_memory=["all"], profile_dir=tmp_path)
+    with collect_stats(run_stats):
+        with stage("read"):
+            data = [bytes(1000) for _ in range(1000)]
+        with stage("render"):
+            sorted(range(1000), key=str)
+
+    read, render = run_stats.stages["read"], run_stats.stages["render"]
+    assert read.profile_file is None
+    assert read.peak_traced_bytes >= 1_000_000 > render.peak_traced_bytes
+    assert render.profile_file == str(tmp_path / "profile_render.prof")
+    assert pstats.Stats(render.profile_file).total_calls > 0
+    del data
+
+
+def test_write_report(tmp_path):
+    """Test the JSON report."""
+    run_stats = RunStats()
+    with collect_stats(run_stats), stage("read"):
+        count(rows_read=4)
+    run_stats.write(tmp_path / "stats.json")
+
+    report = json.loads((tmp_path / "stats.json").read_text())
+    assert report["version"] == 1
+    assert report["wall_seconds"] >= report["stages"][0]["wall_seconds"]
+    assert report["stages"] == [
+        {
+            "name": "read",
+            "wall_seconds": pytest.approx(run_stats.stages["read"].wall_seconds),
+            "cpu_seconds": pytest.approx(run_stats.stages["read"].cpu_seconds),
+            "counters": {"rows_read": 4},
+            "busy_seconds": {},
+            "peak_traced_bytes": None,
+            "profile_file": None,
+        }
+    ]
+
+
+def test_file_size_skips_missing_files(tmp_path):
+    """Test that only existing files are counted."""
+    (tmp_path / "a.html").write_text("12345")
+
+    assert file_size(tmp_path / "a.html", tmp_path / "missing") == 5
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
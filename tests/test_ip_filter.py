@@ -0,0 +1,92 @@
+"""Test the bulk pre-filter of addresses that can't be geolocated."""
+
+import csv
+import ipaddress
+
+import pytest
+
+from ip_visualizer.core.ip_filter import REASONS, RejectedIPs, classify_ips, split_routable
+from ip_visualizer.core.ip_parse import parse_ips
+
+CASES = {
+    "8.8.8.8": "routable",
+    "1.1.1.1": "routable",
+    "10.1.2.3": "private",
+    "172.16.0.1": "private",
+    "172.32.0.1": "routable",
+    "192.168.1.1": "private",
+    "100.64.0.1": "private",
+    "127.0.0.1": "loopback",
+    "169.254.10.1": "link_local",
+    "224.0.0.251": "multicast",
+    "0.0.0.0": "reserved",  # noqa: S104
+    "192.0.2.0": "reserved",
+    "203.0.113.9": "reserved",
+    "255.255.255.255": "reserved",
+    "2606:4700::1111": "routable",
+    "::1": "loopback",
+    "::": "reserved",
+    "fd12:3456::1": "private",
+    "fe80::1": "link_local",
+    "ff02::1": "multicast",
+    "2001:db8::1": "reserved",
+    "::ffff:192.168.0.1": "private",
+    "::ffff:8.8.8.8": "routable",
+    "not-an-ip": "malformed",
+    "999.1.1.1": "malformed",
+}
+
+
+def test_classify_ips():
+    """Test the reason given to each kind of address."""
+    reasons = classify_ips(parse_ips(list(CASES), strip_ports=False))
+
+    assert dict(zip(CASES, (REASONS[reason] for reason in reasons), strict=True)) == CASES
+
+
+def test_classify_ips_agrees_with_ipaddress():
+    """Test that the addresses kept are globally routable according to `ipaddress`."""
+    addresses = [str(ipaddress.IPv4Address(value)) for value in range(0, 2**32, 2**32 // 5_000)]
+
+    reasons = classify_ips(parse_ips(addresses))
+
+    for address, reason in zip(addresses, reasons.tolist(), strict=True):
+        if reason == 0:
+            assert ipaddress.IPv4Address(address).is_global, address
+
+
+def test_split_routable():
+    """Test that rejected addresses are counted per reason with their request counts."""
+    routable, rejected = split_routable({"8.8.8.8": 5, "10.0.0.1": 3, "10.0.0.2": 1, "::1": 2, "bogus": 1})
+
+    assert routable == {"8.8.8.8": 5}
+    assert rejected.requests == {"private": 4, "loopback": 2, "malformed": 1}
+    assert rejected.total() == 7
+    assert rejected.summary() == "4 private, 2 loopback, 1 malformed"
+
+
+def test_split_routable_adds_to_existing_rejected():
+    """Test that the sample is capped but sampled addresses keep accumulating requests."""
+    rejected = RejectedIPs(sample_size=2)
+    split_routable({"10.0.0.1": 1, "10.0.0.2": 1, "10.0.0.3": 1}, rejected)
+    split_routable({"10.0.0.1": 4, "127.0.0.1": 1}, rejected)
+
+    assert rejected.requests == {"private": 7, "loopback": 1}
+    assert rejected.sample == {"10.0.0.1": ("private", 5), "10.0.0.2": ("private", 1)}
+
+
+def test_write_rejected_sample(tmp_path):
+    """Test the CSV written for the sample."""
+    _, rejected = split_routable({"192.168.1.1": 3, "8.8.8.8": 1, "224.0.0.1": 1})
+    rejected.write(tmp_path / "rejected.csv")
+
+    with open(tmp_path / "rejected.csv", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert rows == [
+        {"ip": "192.168.1.1", "reason": "private", "requests": "3"},
+        {"ip": "224.0.0.1", "reason": "multicast", "requests": "1"},
+    ]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -1,10 +1,21 @@
+import ipaddress
 from unittest.mock import MagicMock, patch
 
 import geoip2.database
 import geoip2.errors
 import pytest
 
-from ip_visualizer.core.ip_lookup import lookup_ip
+from ip_visualizer.core.geoip_reader import configure_reader, get_reader_manager
+from ip_visualizer.core.ip_lookup import (
+    cache_stats,
+    clear_cache,
+    configure_persistent_cache,
+    failure_stats,
+    lookup_ip,
+    lookup_ips,
+    persistent_cache_stats,
+    prefix_cache_stats,
+)
 
 
 class MockGeoIP2City:
@@ -19,6 +30,9 @@ class MockGeoIP2City:
     def __exit__(self, exc_type, exc_val, exc_tb):
         pass
 
+    def close(self):
+        pass
+
     def city(self, ip):
         if ip == "8.8.8.8":  # Google's public DNS
             return self._create_mock_response(
@@ -30,7 +44,7 @@ class MockGeoIP2City:
                 postal_code="94043",
                 continent_name="North America",
             )
-        elif ip == "1.1.1.1":  # Cloudflare's DNS
+        elif ip in ("1.1.1.1", "2606:4700:4700::1111"):  # Cloudflare's DNS
             return self._create_mock_response(
                 city_name="Los Angeles",
                 country_name="United States",
@@ -61,6 +75,7 @@ class MockGeoIP2City:
 
         response.country = MagicMock()
         response.country.name = country_name
+        response.country.iso_code = "US"
 
         response.location = MagicMock()
         response.location.latitude = latitude
@@ -72,6 +87,7 @@ class MockGeoIP2City:
 
         response.continent = MagicMock()
         response.continent.name = continent_name
+        response.continent.code = "NA"
 
         return response
 
@@ -115,11 +131,180 @@ def test_lookup_ip_different_location():
 def test_lookup_ip_database_error(mock_reader):
     """Test handling of database errors during IP lookup."""
     # Simulate a database read error
-    mock_reader.return_value.__enter__.return_value.city.side_effect = Exception("Database read error")
+    mock_reader.return_value.city.side_effect = Exception("Database read error")
 
     result = lookup_ip("8.8.8.8")
     assert result == {}
 
 
+def test_lookup_ips_batch():
+    """Test batch lookup of several IP addresses."""
+    with patch("geoip2.database.Reader", new=MockGeoIP2City):
+        result = lookup_ips(["8.8.8.8", "1.1.1.1", "192.0.2.0"])
+
+        assert list(result) == ["8.8.8.8", "1.1.1.1", "192.0.2.0"]
+        assert result["8.8.8.8"]["city"] == "Mountain View"
+        assert result["1.1.1.1"]["city"] == "Los Angeles"
+        assert result["192.0.2.0"] == {}
+
+
+def test_lookup_ips_deduplicates_and_caches():
+    """Test that repeated IPs are resolved once and served from the cache afterwards."""
+    with (
+        patch("geoip2.database.Reader", new=MockGeoIP2City),
+        patch.object(MockGeoIP2City, "city", autospec=True, side_effect=MockGeoIP2City.city) as mock_city,
+    ):
+        lookup_ips(["8.8.8.8", "8.8.8.8", "1.1.1.1"])
+        assert mock_city.call_count == 2
+
+        result = lookup_ip("8.8.8.8")
+        assert result["city"] == "Mountain View"
+        assert mock_city.call_count == 2
+
+        stats = cache_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+
+def test_lookup_ips_caches_not_found():
+    """Test that addresses missing from the database are not looked up again."""
+    with (
+        patch("geoip2.database.Reader", new=MockGeoIP2City),
+        patch.object(MockGeoIP2City, "city", autospec=True, side_effect=MockGeoIP2City.city) as mock_city,
+    ):
+        assert lookup_ip("192.0.2.0") == {}
+        assert lookup_ip("192.0.2.0") == {}
+        assert mock_city.call_count == 1
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_ips_does_not_cache_database_errors(mock_reader):
+    """Test that unexpected database errors are retried on the next lookup."""
+    mock_reader.return_value.city.side_effect = Exception("Database read error")
+
+    assert lookup_ips(["8.8.8.8"]) == {"8.8.8.8": {}}
+    assert lookup_ips(["8.8.8.8"]) == {"8.8.8.8": {}}
+    assert mock_reader.return_value.city.call_count == 2
+
+
+def test_lookup_failures_are_counted_not_printed(capsys):
+    """Test that failed queries are tallied by reason without printing anything per address."""
+    with patch("geoip2.database.Reader", new=MockGeoIP2City):
+        lookup_ips(["192.0.2.0", "192.0.2.1", "8.8.8.8"])
+
+    assert failure_stats() == {"not_found": 2, "malformed": 0, "error": 0}
+    assert capsys.readouterr().out == ""
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_errors_are_counted(mock_reader):
+    """Test that unexpected database errors are counted separately."""
+    mock_reader.return_value.city.side_effect = Exception("Database read error")
+
+    lookup_ips(["8.8.8.8", "1.1.1.1"])
+
+    assert failure_stats()["error"] == 2
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_ips_reuses_resolved_network(mock_reader):
+    """Test that addresses in an already resolved network don't query the database."""
+    response = MockGeoIP2City._create_mock_response(
+        city_name="Mountain View",
+        country_name="United States",
+        latitude=37.40599,
+        longitude=-122.078514,
+        time_zone="America/Los_Angeles",
+        postal_code="94043",
+        continent_name="North America",
+    )
+    response.traits.network = ipaddress.ip_network("8.8.8.0/24")
+    mock_reader.return_value.city.return_value = response
+
+    result = lookup_ips(["8.8.8.8", "8.8.8.4", "8.8.8.200"])
+
+    assert mock_reader.return_value.city.call_count == 1
+    assert result["8.8.8.4"] == {**result["8.8.8.8"], "ip": "8.8.8.4"}
+    assert prefix_cache_stats()["hits"] == 2
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_ips_reuses_unknown_network(mock_reader):
+    """Test that a network known to be absent from the database is not queried again."""
+    mock_reader.return_value.city.side_effect = geoip2.errors.AddressNotFoundError(
+        "not found", ip_address="192.0.2.1", prefix_len=24
+    )
+
+    result = lookup_ips(["192.0.2.1", "192.0.2.2"])
+
+    assert result == {"192.0.2.1": {}, "192.0.2.2": {}}
+    assert mock_reader.return_value.city.call_count == 1
+
+
+def _city_response(city_name):
+    response = MockGeoIP2City._create_mock_response(
+        city_name=city_name,
+        country_name="Australia",
+        latitude=-27.4766,
+        longitude=153.0166,
+        time_zone="Australia/Brisbane",
+        postal_code="4000",
+        continent_name="Oceania",
+    )
+    response.traits.network = ipaddress.ip_network("1.2.0.0/16")
+    return response
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_ip_sees_reloaded_database(mock_reader, tmp_path):
+    """Test that results cached from a database are dropped once its file is replaced."""
+    db_file = tmp_path / "live.mmdb"
+    db_file.write_bytes(b"first version")
+    old_reader, new_reader = MagicMock(name="old"), MagicMock(name="new")
+    old_reader.city.return_value = _city_response("Brisbane")
+    new_reader.city.return_value = _city_response("Gold Coast")
+    mock_reader.side_effect = [old_reader, new_reader]
+    original = get_reader_manager()
+    try:
+        configure_reader(str(db_file), check_interval=0)
+        assert lookup_ip("1.2.3.4")["city"] == "Brisbane"
+        assert lookup_ip("1.2.3.4")["city"] == "Brisbane"
+
+        db_file.write_bytes(b"second, longer version")
+
+        assert lookup_ip("1.2.3.4")["city"] == "Gold Coast"
+        # Never looked up, but in a network cached from the old database
+        assert lookup_ip("1.2.99.1")["city"] == "Gold Coast"
+        assert new_reader.city.call_count == 1
+        # The counters cover the whole process, across reloads
+        assert cache_stats()["hits"] == 1
+    finally:
+        configure_reader(original.db_path, original.mode, original.check_interval)
+
+
+@patch("geoip2.database.Reader")
+def test_lookup_ips_warm_run_uses_persistent_cache(mock_reader, tmp_path):
+    """Test that a later run is served from the on-disk cache until the database changes."""
+    mock_reader.return_value.city.side_effect = MockGeoIP2City().city
+    mock_reader.return_value.metadata.return_value.build_epoch = 1
+    configure_persistent_cache(str(tmp_path / "lookups.sqlite"))
+
+    first = lookup_ips(["8.8.8.8", "1.1.1.1", "192.0.2.1"])
+    # A new run: in-memory caches start empty, the cache file is reopened
+    clear_cache()
+    configure_persistent_cache(str(tmp_path / "lookups.sqlite"))
+    second = lookup_ips(["8.8.8.8", "1.1.1.1", "192.0.2.1"])
+
+    assert second == first
+    assert mock_reader.return_value.city.call_count == 3
+    assert persistent_cache_stats()["hits"] == 3
+
+    # A new database build invalidates the cached results
+    clear_cache()
+    mock_reader.return_value.metadata.return_value.build_epoch = 2
+    lookup_ips(["8.8.8.8"])
+    assert mock_reader.return_value.city.call_count == 4
+
+
 if __name__ == "__main__":
     pytest.main(["-v"])
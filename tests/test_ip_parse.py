@@ -0,0 +1,90 @@
+"""Test bulk IP address parsing."""
+
+import ipaddress
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ip_visualizer.core.ip_parse import IPV4, IPV6, format_ips, parse_ips
+
+
+def test_parse_ipv4():
+    """Test that dotted quads become uint32 values."""
+    parsed = parse_ips(["8.8.8.8", "0.0.0.1", "255.255.255.255", "192.168.1.10"])
+
+    assert parsed.valid.all()
+    assert parsed.ipv4().dtype == np.uint32
+    assert parsed.ipv4().tolist() == [0x08080808, 1, 0xFFFFFFFF, 0xC0A8010A]
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["256.1.1.1", "01.2.3.4", "1.2.3", "1.2.3.4.5", "1..2.3", "1.2.3.1000", "a.b.c.d", " 1.2.3.4", "1.2.3.4 ", ""],
+)
+def test_parse_invalid_ipv4(value):
+    """Test that malformed addresses are masked out instead of raising."""
+    parsed = parse_ips(["8.8.8.8", value])
+
+    assert parsed.valid.tolist() == [True, False]
+
+
+@pytest.mark.parametrize("value", [None, float("nan"), 42, "é.1.1.1", "1" * 100])
+def test_parse_non_address_values(value):
+    """Test that missing, non-string, non-ASCII and overlong values are invalid."""
+    assert parse_ips([value, "1.1.1.1"]).valid.tolist() == [False, True]
+
+
+def test_parse_strips_ports():
+    """Test that ports are dropped from IPv4 and bracketed IPv6 addresses."""
+    parsed = parse_ips(["8.8.8.8:443", "[2001:db8::1]:8080", "[::1]", "8.8.8.8:", "8.8.8.8:http", "[::1]:x"])
+
+    assert parsed.version.tolist() == [IPV4, IPV6, IPV6, 0, 0, 0]
+    assert parsed.ipv4().tolist() == [0x08080808]
+
+
+def test_parse_keeps_ports_invalid_when_not_stripping():
+    """Test that addresses with ports are invalid when port stripping is off."""
+    parsed = parse_ips(["8.8.8.8:443", "[2001:db8::1]:8080", "8.8.8.8"], strip_ports=False)
+
+    assert parsed.valid.tolist() == [False, False, True]
+
+
+def test_parse_ipv6():
+    """Test that IPv6 addresses are split into 64-bit halves."""
+    address = "2001:db8:85a3::8a2e:370:7334"
+    parsed = parse_ips([address, "not::an::address"])
+
+    expected = int(ipaddress.IPv6Address(address))
+    assert parsed.version.tolist() == [IPV6, 0]
+    assert parsed.ipv6().tolist() == [[expected >> 64, expected & ((1 << 64) - 1)]]
+
+
+def test_parse_pandas_series_and_generators():
+    """Test the accepted input types."""
+    series = pd.Series(["1.1.1.1", None, "2.2.2.2"])
+
+    assert parse_ips(series).valid.tolist() == [True, False, True]
+    assert parse_ips(ip for ip in ["3.3.3.3"]).ipv4().tolist() == [0x03030303]
+    assert len(parse_ips([])) == 0
+
+
+def test_value_counts():
+    """Test counting canonical addresses in order of first appearance."""
+    parsed = parse_ips(["8.8.8.8", "1.1.1.1:80", "8.8.8.8:443", "2001:DB8::1", "[2001:db8::1]:1", "bogus"])
+
+    assert parsed.value_counts() == {"8.8.8.8": 2, "1.1.1.1": 1, "2001:db8::1": 2}
+    assert list(parsed.value_counts()) == ["8.8.8.8", "1.1.1.1", "2001:db8::1"]
+
+
+def test_parse_matches_ipaddress():
+    """Test the vectorised parser against the standard library on random addresses."""
+    ip_ints = np.random.default_rng(0).integers(0, 2**32, size=1_000, dtype=np.uint32)
+    strings = [str(ipaddress.IPv4Address(int(ip))) for ip in ip_ints]
+
+    assert parse_ips(strings).ipv4().tolist() == ip_ints.tolist()
+    assert format_ips(ip_ints) == strings
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -1,8 +1,19 @@
+import ipaddress
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
-from ip_visualizer.core.ip_visualizer import create_heatmap, get_ip_locations, load_ip_data_from_csv
+from ip_visualizer.core.binning import Grid
+from ip_visualizer.core.geo_index import build_index
+from ip_visualizer.core.instrumentation import RunStats, collect_stats
+from ip_visualizer.core.ip_visualizer import (
+    count_ips_in_csv,
+    create_heatmap,
+    get_ip_locations,
+    load_ip_data_from_csv,
+    main,
+)
+from ip_visualizer.core.locations import CONTINENT_CODES, LocationSet, decode_country
 
 # Test data
 TEST_CSV_DATA = """_source.cg.detail.remote_addr,other_field
@@ -31,33 +42,61 @@ def create_mock_geoip_response(ip):
     return mock_response
 
 
-def test_load_ip_data_from_csv():
+def test_load_ip_data_from_csv(tmp_path):
     """Test loading IP addresses from a CSV file."""
-    # Create a mock file object with our test data
-    with patch("pandas.read_csv") as mock_read_csv:
-        # Setup mock return value
-        mock_df = MagicMock()
-        mock_df.__getitem__.return_value.dropna.return_value.unique.return_value = [
-            "8.8.8.8",
-            "1.1.1.1",
-        ]
-        mock_read_csv.return_value = mock_df
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA)
+
+    result = load_ip_data_from_csv(str(csv_file))
+
+    # Verify the result
+    assert len(result) == 3
+    assert "8.8.8.8" in result
+    assert "1.1.1.1" in result
+    assert "192.168.1.1" in result
+
+
+def test_count_ips_in_csv(tmp_path):
+    """Test that per-IP request counts survive ingestion."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA)
+
+    assert count_ips_in_csv(str(csv_file)) == {"8.8.8.8": 2, "1.1.1.1": 1, "192.168.1.1": 1}
+
+
+def test_load_ip_data_from_csv_in_chunks(tmp_path):
+    """Test that chunked reading gives the same result as a single pass."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA)
+
+    assert load_ip_data_from_csv(str(csv_file), chunksize=1) == load_ip_data_from_csv(str(csv_file))
+
+
+def test_count_ips_in_csv_custom_column_and_ports(tmp_path):
+    """Test counting IPs in a configurable column with ports stripped."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text("client,other_field\n8.8.8.8:443,a\n8.8.8.8:80,b\n[2001:db8::1]:8080,c\n2001:db8::2,d\n,e\n")
 
-        # Call the function with a dummy filename
-        result = load_ip_data_from_csv("dummy.csv")
+    counts = count_ips_in_csv(str(csv_file), column="client", chunksize=2)
 
-        # Verify the result
-        assert len(result) == 2
-        assert "8.8.8.8" in result
-        assert "1.1.1.1" in result
+    assert counts == {"8.8.8.8": 2, "2001:db8::1": 1, "2001:db8::2": 1}
 
 
-@patch("ip_visualizer.core.ip_visualizer.geoip2.database.Reader")
+def test_count_ips_in_csv_rejects_ports_when_asked(tmp_path, capsys):
+    """Test that with port stripping turned off, addresses with ports are skipped as invalid."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text("client\n8.8.8.8:443\n1.1.1.1\nnot-an-ip\n")
+
+    assert count_ips_in_csv(str(csv_file), column="client", remove_ports=False) == {"1.1.1.1": 1}
+    assert "Skipped 2 rows" in capsys.readouterr().out
+
+
+@patch("geoip2.database.Reader")
 def test_get_ip_locations_success(mock_reader):
     """Test successful IP to location conversion."""
     # Setup mock reader
     mock_reader_instance = MagicMock()
-    mock_reader.return_value.__enter__.return_value = mock_reader_instance
+    mock_reader.return_value = mock_reader_instance
 
     # Configure the mock to return different responses based on IP
     def mock_city(ip):
@@ -69,37 +108,119 @@ def test_get_ip_locations_success(mock_reader):
     test_ips = ["8.8.8.8", "1.1.1.1"]
 
     # Call the function
-    locations, ip_counts = get_ip_locations(test_ips)
+    locations = get_ip_locations(test_ips)
 
     # Verify results
     assert len(locations) == 2
-    assert len(ip_counts) == 2
-    assert (37.40599, -122.078514) in ip_counts
-    assert (34.0522, -118.2437) in ip_counts
-    assert ip_counts[(37.40599, -122.078514)] == 1
+    assert locations.latitude.tolist() == pytest.approx([37.40599, 34.0522])
+    assert locations.longitude.tolist() == pytest.approx([-122.078514, -118.2437])
+    assert locations.count.tolist() == [1, 1]
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_weights_by_request_count(mock_reader):
+    """Test that request counts, not distinct IPs, drive the heat weights."""
+    mock_reader_instance = MagicMock()
+    mock_reader.return_value = mock_reader_instance
+    mock_reader_instance.city.side_effect = create_mock_geoip_response
+
+    locations = get_ip_locations({"8.8.8.8": 120, "1.1.1.1": 3, "192.168.1.1": 7})
+
+    # One lookup and one location per distinct address; the private one is skipped before lookup
+    assert mock_reader_instance.city.call_count == 2
+    assert len(locations) == 2
+    assert locations.count.tolist() == [120, 3]
+    assert locations.total() == 123
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_counts_repeated_ips(mock_reader):
+    """Test that repeated addresses in a plain list are looked up once and counted."""
+    mock_reader_instance = MagicMock()
+    mock_reader.return_value = mock_reader_instance
+    mock_reader_instance.city.side_effect = create_mock_geoip_response
+
+    locations = get_ip_locations(["8.8.8.8", "1.1.1.1", "8.8.8.8"])
+
+    assert mock_reader_instance.city.call_count == 2
+    assert len(locations) == 2
+    assert locations.count.tolist() == [2, 1]
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_with_codes(mock_reader):
+    """Test that country and continent codes can be kept alongside the coordinates."""
+    mock_reader_instance = MagicMock()
+    mock_reader.return_value = mock_reader_instance
+
+    def mock_city(ip):
+        response = create_mock_geoip_response(ip)
+        response.country.iso_code = "US"
+        response.continent.code = "NA"
+        return response
+
+    mock_reader_instance.city.side_effect = mock_city
 
+    with_codes = get_ip_locations(["8.8.8.8"], with_codes=True)
+    without_codes = get_ip_locations(["8.8.8.8"])
 
-@patch("ip_visualizer.core.ip_visualizer.geoip2.database.Reader")
+    assert [decode_country(code) for code in with_codes.country.tolist()] == ["US"]
+    assert [CONTINENT_CODES[code] for code in with_codes.continent.tolist()] == ["NA"]
+    assert without_codes.country is None
+
+
+@patch("geoip2.database.Reader")
 def test_get_ip_locations_invalid_ip(mock_reader):
     """Test handling of invalid IP addresses."""
     # Setup mock reader to raise an exception for invalid IPs
     mock_reader_instance = MagicMock()
-    mock_reader.return_value.__enter__.return_value = mock_reader_instance
+    mock_reader.return_value = mock_reader_instance
     mock_reader_instance.city.side_effect = Exception("Invalid IP")
 
     # Test with an invalid IP
-    locations, ip_counts = get_ip_locations(["invalid.ip"])
+    locations = get_ip_locations(["invalid.ip"])
 
     # Verify no locations were returned
     assert len(locations) == 0
-    assert len(ip_counts) == 0
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_with_index(mock_reader):
+    """Test that an index resolves IPv4 addresses without touching the GeoIP reader."""
+    index = build_index(
+        [(ipaddress.ip_network("8.8.8.0/24"), {"location": {"latitude": 37.4, "longitude": -122.1}})],
+        build_epoch=1,
+    )
+
+    locations = get_ip_locations(["8.8.8.8", "8.8.8.8", "1.1.1.1"], index=index)
+
+    assert locations.latitude.tolist() == pytest.approx([37.4])
+    assert locations.count.tolist() == [2]
+    mock_reader.assert_not_called()
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_with_index_keeps_ipv6(mock_reader, capsys):
+    """Test that IPv6 addresses, which the index doesn't cover, are still looked up in the database."""
+    mock_reader.return_value.city.return_value.location.latitude = 37.77
+    mock_reader.return_value.city.return_value.location.longitude = -122.42
+    index = build_index(
+        [(ipaddress.ip_network("8.8.8.0/24"), {"location": {"latitude": 37.4, "longitude": -122.1}})],
+        build_epoch=1,
+    )
+
+    locations = get_ip_locations(["8.8.8.8", "2606:4700:4700::1111", "2606:4700:4700::1111"], index=index)
+
+    assert locations.latitude.tolist() == pytest.approx([37.4, 37.77])
+    assert locations.count.tolist() == [1, 2]
+    mock_reader.return_value.city.assert_called_once_with("2606:4700:4700::1111")
+    assert "Could not locate" not in capsys.readouterr().out
 
 
 def test_create_heatmap():
     """Test creation of heatmap (basic verification)."""
-    # Setup test data
-    locations = [(37.7749, -122.4194), (34.0522, -118.2437)]
-    ip_counts = {(37.7749, -122.4194): 5, (34.0522, -118.2437): 3}
+    # Setup test data; the first coordinate appears twice and is aggregated
+    locations = LocationSet.from_arrays([37.7749, 34.0522, 37.7749], [-122.4194, -118.2437, -122.4194], [4, 3, 1])
 
     # Create a mock for the HeatMap class
     mock_heatmap_instance = MagicMock()
@@ -107,21 +228,25 @@ def test_create_heatmap():
     # Mock folium.Map and HeatMap
     with (
         patch("folium.Map") as mock_map,
-        patch("ip_visualizer.core.ip_visualizer.HeatMap", return_value=mock_heatmap_instance) as mock_heatmap,
+        patch("folium.plugins.HeatMap", return_value=mock_heatmap_instance) as mock_heatmap,
     ):
         # Setup mock map
         mock_map_instance = MagicMock()
         mock_map.return_value = mock_map_instance
 
         # Call the function
-        create_heatmap(locations, ip_counts)
+        create_heatmap(locations)
 
         # Verify the map was created with correct parameters
         mock_map.assert_called_once()
 
         # Verify heatmap was created with correct data
-        expected_heat_data = [[37.7749, -122.4194, 5], [34.0522, -118.2437, 3]]
-        mock_heatmap.assert_called_once_with(expected_heat_data)
+        mock_heatmap.assert_called_once()
+        heat_data = sorted(mock_heatmap.call_args.args[0])
+        assert heat_data == [
+            pytest.approx([34.0522, -118.2437, 3]),
+            pytest.approx([37.7749, -122.4194, 5]),
+        ]
 
         # Verify heatmap was added to the map
         mock_heatmap_instance.add_to.assert_called_once_with(mock_map_instance)
@@ -130,6 +255,20 @@ def test_create_heatmap():
         mock_map_instance.save.assert_called_once_with("ip_heatmap.html")
 
 
+def test_create_heatmap_with_grid_and_cap():
+    """Test that the heatmap can be binned and capped before rendering."""
+    locations = LocationSet.from_arrays([37.7749, 37.3382, 34.0522], [-122.4194, -121.8863, -118.2437], [5, 2, 3])
+
+    with (
+        patch("folium.Map"),
+        patch("folium.plugins.HeatMap") as mock_heatmap,
+    ):
+        create_heatmap(locations, grid=Grid.from_cell_size(1.0), max_points=2)
+
+    heat_data = sorted(mock_heatmap.call_args.args[0])
+    assert heat_data == [pytest.approx([34.5, -118.5, 3]), pytest.approx([37.5, -122.5, 5])]
+
+
 @patch("builtins.open", new_callable=mock_open)
 @patch("pandas.read_csv")
 def test_main_with_mock_data(mock_read_csv, mock_file):
@@ -144,17 +283,14 @@ def test_main_with_mock_data(mock_read_csv, mock_file):
 
     # Mock the rest of the dependencies
     with (
-        patch("ip_visualizer.core.ip_generator.generate_ip_list") as mock_gen_ips,
+        patch("ip_visualizer.core.ip_visualizer.generate_ip_list") as mock_gen_ips,
         patch("ip_visualizer.core.ip_visualizer.get_ip_locations") as mock_get_locations,
         patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
         patch("sys.argv", ["ip_visualizer.py", "test.csv"]),
     ):
         # Setup mock return values
         mock_gen_ips.return_value = ["8.8.8.8", "1.1.1.1"]
-        mock_get_locations.return_value = (
-            [(37.7749, -122.4194)],
-            {(37.7749, -122.4194): 1},
-        )
+        mock_get_locations.return_value = LocationSet.from_arrays([37.7749], [-122.4194])
 
         # Import and run main
         from ip_visualizer.core.ip_visualizer import main
@@ -165,5 +301,215 @@ def test_main_with_mock_data(mock_read_csv, mock_file):
         mock_create_heatmap.assert_called_once()
 
 
+def test_main_appends_to_state_file(tmp_path):
+    """Test that each run adds only its own batch to the saved state and renders all of it."""
+    state_file = str(tmp_path / "state.npz")
+    day1, day2 = tmp_path / "day1.csv", tmp_path / "day2.csv"
+    day1.write_text(TEST_CSV_DATA)
+    day2.write_text(TEST_CSV_DATA)
+    batches = [LocationSet.from_arrays([37.7749], [-122.4194], [5]), LocationSet.from_arrays([37.7], [-122.4], [2])]
+
+    with (
+        patch("ip_visualizer.core.ip_visualizer.locate_requests", side_effect=batches) as mock_locate,
+        patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
+    ):
+        main(str(day1), state_file=state_file, grid=Grid.from_cell_size(1.0))
+        main(str(day2), state_file=state_file)
+        main(state_file=state_file)
+
+    # The last run only re-renders the saved state
+    assert mock_locate.call_count == 2
+    rendered = mock_create_heatmap.call_args.args[0]
+    assert rendered.heat_data() == [pytest.approx([37.5, -122.5, 7])]
+
+
+def test_main_rejects_state_on_another_grid(tmp_path, capsys):
+    """Test that a run binned differently from the saved state is refused."""
+    state_file = str(tmp_path / "state.npz")
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA)
+    batch = LocationSet.from_arrays([37.7749], [-122.4194], [5])
+
+    with (
+        patch("ip_visualizer.core.ip_visualizer.locate_requests", return_value=batch) as mock_locate,
+        patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
+    ):
+        main(str(csv_file), state_file=state_file)
+        main(str(csv_file), state_file=state_file, grid=Grid.from_cell_size(1.0))
+
+    # Refused before any lookups are spent on the second run
+    assert mock_locate.call_count == 1
+    assert mock_create_heatmap.call_count == 1
+    assert "different grid" in capsys.readouterr().out
+
+
+@patch("geoip2.database.Reader")
+def test_get_ip_locations_skips_unroutable_addresses(mock_reader, tmp_path, capsys):
+    """Test that private and malformed addresses are reported in one line and sampled, not looked up."""
+    mock_reader.return_value.city.side_effect = create_mock_geoip_response
+    rejected_file = tmp_path / "rejected.csv"
+
+    locations = get_ip_locations(
+        {"8.8.8.8": 2, "10.0.0.1": 3, "127.0.0.1": 1, "bogus": 1}, rejected_file=str(rejected_file)
+    )
+
+    assert len(locations) == 1
+    assert mock_reader.return_value.city.call_count == 1
+    output = capsys.readouterr().out
+    assert "Skipped 5 requests from addresses that can't be geolocated (3 private, 1 loopback, 1 malformed)" in output
+    assert rejected_file.read_text().splitlines() == [
+        "ip,reason,requests",
+        "10.0.0.1,private,3",
+        "127.0.0.1,loopback,1",
+        "bogus,malformed,1",
+    ]
+
+
+@patch("geoip2.database.Reader")
+def test_main_records_stage_stats(mock_reader, tmp_path):
+    """Test that a run records counters for each stage it goes through."""
+    mock_reader.return_value.city.side_effect = create_mock_geoip_response
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA + "not-an-ip,test5\n")
+
+    run_stats = RunStats()
+    with collect_stats(run_stats), patch("ip_visualizer.core.ip_visualizer.create_heatmap"):
+        main(str(csv_file))
+
+    assert list(run_stats.stages) == ["read", "lookup", "render"]
+    assert run_stats.stages["read"].counters == {
+        "rows_read": 5,
+        "files": 1,
+        "invalid_rows": 1,
+        "requests": 4,
+        "distinct_ips": 3,
+    }
+    lookup = run_stats.stages["lookup"].counters
+    assert lookup["rejected_private"] == 1
+    assert lookup["lookups"] == 2
+    assert lookup["failed_lookups"] == 0
+
+
+@patch("geoip2.database.Reader")
+def test_main_records_pipeline_stats(mock_reader, tmp_path):
+    """Test that a pipelined run records the same lookup counters, and how long each of its stages was busy."""
+    mock_reader.return_value.city.side_effect = create_mock_geoip_response
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA + "not-an-ip,test5\n9.9.9.9,test6\n")
+
+    run_stats = RunStats()
+    with collect_stats(run_stats), patch("ip_visualizer.core.ip_visualizer.create_heatmap"):
+        main(inputs=[str(csv_file)], pipeline=True)
+
+    pipeline = run_stats.stages["pipeline"]
+    names = ("rows_read", "distinct_ips", "lookups", "failed_lookups", "cache_hits")
+    assert {name: pipeline.counters[name] for name in names} == {
+        "rows_read": 6,
+        "distinct_ips": 3,
+        "lookups": 3,
+        "failed_lookups": 1,
+        "cache_hits": 0,
+    }
+    assert set(pipeline.busy_seconds) == {"read", "parse", "lookup", "aggregate"}
+
+
+def test_main_choropleth_keeps_country_codes(tmp_path):
+    """Test that choropleth mode geolocates with country codes and draws regions instead of a heatmap."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TEST_CSV_DATA)
+    batch = LocationSet.from_arrays([37.7749], [-122.4194], [5], country=[0], continent=[0])
+
+    with (
+        patch("ip_visualizer.core.ip_visualizer.locate_requests", return_value=batch) as mock_locate,
+        patch("ip_visualizer.core.ip_visualizer.create_choropleth") as mock_choropleth,
+        patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
+    ):
+        main(str(csv_file), choropleth="continent")
+
+    assert mock_locate.call_args.kwargs["with_codes"] is True
+    mock_choropleth.assert_called_once_with(batch, "continent", None, "ISO_A2")
+    mock_create_heatmap.assert_not_called()
+
+
+def test_main_checks_boundaries_before_lookups(tmp_path, capsys):
+    """Test that an unusable boundary file is reported before any address is looked up."""
+    boundaries = tmp_path / "countries.geojson"
+    boundaries.write_text('{"type": "FeatureCollection", "features": []}')
+
+    with patch("ip_visualizer.core.ip_visualizer.locate_requests") as mock_locate:
+        main(choropleth="country", boundaries=str(boundaries))
+
+    mock_locate.assert_not_called()
+    assert "Error: No feature" in capsys.readouterr().out
+
+
+def test_main_reports_read_errors(tmp_path, capsys):
+    """Test that unreadable inputs end the run with an error message rather than a traceback."""
+    wrong_column = tmp_path / "export.csv"
+    wrong_column.write_text("address,other_field\n8.8.8.8,test1\n")
+    compressed = tmp_path / "export.csv.zst"
+    compressed.write_bytes(b"\x28\xb5\x2f\xfd")
+
+    with (
+        patch("ip_visualizer.core.log_files.zstandard", None),
+        patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
+    ):
+        main(str(wrong_column))
+        main(str(compressed))
+        main(str(wrong_column), interval="1h")
+
+    mock_create_heatmap.assert_not_called()
+    errors = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Error: ")]
+    assert len(errors) == 3
+    assert "export.csv: Usecols do not match columns" in errors[0]
+    assert "ip-visualizer[zstd]" in errors[1]
+    assert "export.csv: Usecols do not match columns" in errors[2]
+
+
+TIMED_CSV_DATA = """_source.cg.detail.remote_addr,_source.@timestamp
+8.8.8.8,2024-05-01T00:05:00Z
+1.1.1.1,2024-05-01T00:45:00Z
+8.8.8.8,2024-05-01T02:30:00Z
+10.0.0.1,2024-05-01T02:31:00Z
+8.8.8.8,not-a-time
+"""
+
+
+@patch("geoip2.database.Reader")
+def test_main_renders_time_windows(mock_reader, tmp_path, capsys):
+    """Test that the file is read once and every window between the first and last becomes a frame."""
+    mock_reader.return_value.city.side_effect = create_mock_geoip_response
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text(TIMED_CSV_DATA)
+
+    run_stats = RunStats()
+    with (
+        collect_stats(run_stats),
+        patch("ip_visualizer.core.ip_visualizer.create_timeline_heatmap") as mock_timeline,
+        patch("ip_visualizer.core.ip_visualizer.create_heatmap") as mock_create_heatmap,
+    ):
+        main(str(csv_file), interval="1h", window_max_points=10)
+
+    window_locations, grid, max_points = mock_timeline.call_args.args
+    assert [locations.total() for locations in window_locations.values()] == [2, 0, 1]
+    assert (grid, max_points) == (None, 10)
+    mock_create_heatmap.assert_not_called()
+    assert run_stats.stages["read"].counters["untimed_rows"] == 1
+    assert run_stats.stages["lookup"].counters["rejected_private"] == 1
+    assert "Found 4 requests in 2 time windows" in capsys.readouterr().out
+
+
+def test_main_time_windows_need_log_files(capsys):
+    """Test that time windows without input files, or with a bad interval, are refused before any lookup."""
+    with patch("ip_visualizer.core.ip_visualizer.locate_requests_per_window") as mock_locate:
+        main(interval="1h")
+        main(inputs=[__file__], interval="soon")
+
+    mock_locate.assert_not_called()
+    output = capsys.readouterr().out
+    assert "Error: a time-windowed heatmap needs log files" in output
+    assert "Error: Invalid interval 'soon'" in output
+
+
 if __name__ == "__main__":
     pytest.main(["-v"])
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from ip_visualizer.core.locations import (
+    CONTINENT_CODES,
+    LocationSet,
+    decode_country,
+    encode_continent,
+    encode_country,
+)
+
+
+def test_from_arrays_uses_compact_dtypes():
+    """Test that coordinates and counts are stored in compact arrays."""
+    locations = LocationSet.from_arrays([37.7749, 34.0522], [-122.4194, -118.2437], [5, 3])
+
+    assert locations.latitude.dtype == np.float32
+    assert locations.longitude.dtype == np.float32
+    assert locations.count.dtype == np.uint64
+    assert locations.nbytes() == 2 * (4 + 4 + 8)
+
+
+def test_from_arrays_defaults_counts_to_one():
+    """Test that points without counts weigh one request each."""
+    locations = LocationSet.from_arrays([1.0, 2.0], [3.0, 4.0])
+
+    assert locations.count.tolist() == [1, 1]
+    assert locations.total() == 2
+
+
+def test_aggregate_sums_counts_per_coordinate():
+    """Test that identical coordinates are merged and their counts summed."""
+    locations = LocationSet.from_arrays(
+        [37.7749, 34.0522, 37.7749, 37.7749],
+        [-122.4194, -118.2437, -122.4194, 0.5],
+        [4, 3, 1, 2],
+    )
+
+    aggregated = locations.aggregate()
+
+    rows = sorted(aggregated.heat_data())
+    assert rows == [
+        pytest.approx([34.0522, -118.2437, 3]),
+        pytest.approx([37.7749, -122.4194, 5]),
+        pytest.approx([37.7749, 0.5, 2]),
+    ]
+    assert aggregated.total() == locations.total()
+
+
+def test_aggregate_keeps_codes():
+    """Test that country and continent codes survive aggregation."""
+    us = encode_country("US")
+    na = encode_continent("NA")
+    locations = LocationSet.from_arrays([1.0, 1.0], [2.0, 2.0], [1, 1], country=[us, us], continent=[na, na])
+
+    aggregated = locations.aggregate()
+
+    assert aggregated.country.tolist() == [us]
+    assert aggregated.continent.tolist() == [na]
+
+
+def test_aggregate_empty():
+    """Test that an empty set aggregates to an empty set."""
+    assert len(LocationSet.empty().aggregate()) == 0
+
+
+def test_concatenate_drops_codes_unless_all_parts_have_them():
+    """Test joining sets with and without codes."""
+    with_codes = LocationSet.from_arrays([1.0], [2.0], country=[encode_country("DE")], continent=[4])
+    without_codes = LocationSet.from_arrays([3.0], [4.0])
+
+    assert len(LocationSet.concatenate([with_codes, with_codes]).country) == 2
+    joined = LocationSet.concatenate([with_codes, without_codes])
+    assert len(joined) == 2
+    assert joined.country is None
+
+
+def test_country_codes_round_trip():
+    """Test packing ISO country codes into integers and back."""
+    assert decode_country(encode_country("US")) == "US"
+    assert encode_country(None) == 0
+    assert encode_country("USA") == 0
+    assert decode_country(0) == ""
+
+
+def test_continent_codes():
+    """Test mapping continent codes to small integers."""
+    assert CONTINENT_CODES[encode_continent("EU")] == "EU"
+    assert encode_continent("XX") == 0
+    assert encode_continent(None) == 0
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,188 @@
+"""Test reading IP columns from many, possibly compressed, log files."""
+
+import gzip
+import json
+import threading
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+from ip_visualizer.core.ip_visualizer import count_ips_in_files
+from ip_visualizer.core.log_files import (
+    expand_inputs,
+    get_field,
+    is_ndjson,
+    iter_file_chunks,
+    iter_file_frames,
+    iter_files_chunks,
+    open_text,
+    read_concurrently,
+)
+
+COLUMN = "_source.cg.detail.remote_addr"
+CSV_DATA = f"{COLUMN},other_field\n8.8.8.8,a\n1.1.1.1:443,b\n,c\n8.8.8.8,d\n"
+
+
+def es_hit(ip):
+    return json.dumps({"_index": "logs", "_source": {"cg": {"detail": {"remote_addr": ip}}}})
+
+
+NDJSON_DATA = "\n".join([es_hit("8.8.8.8"), "", json.dumps({COLUMN: "1.1.1.1"}), "{broken", es_hit("8.8.4.4")]) + "\n"
+
+
+def values(chunks):
+    return [value for chunk in chunks for value in chunk.tolist()]
+
+
+def test_expand_inputs(tmp_path):
+    """Test that paths and globs expand to a sorted, de-duplicated file list."""
+    (tmp_path / "day1").mkdir()
+    for name in ("day1/00.csv", "day1/01.csv.gz", "02.ndjson"):
+        (tmp_path / name).write_text("")
+
+    paths = expand_inputs([str(tmp_path / "**" / "*.csv*"), str(tmp_path / "day1" / "00.csv"), tmp_path / "02.ndjson"])
+
+    assert [path.relative_to(tmp_path).as_posix() for path in paths] == ["02.ndjson", "day1/00.csv", "day1/01.csv.gz"]
+
+
+@pytest.mark.parametrize("pattern", ["missing.csv", "*.nothing"])
+def test_expand_inputs_missing(tmp_path, pattern):
+    """Test that a missing file or an empty glob is an error rather than silently skipped."""
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / pattern)])
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("a.csv", False),
+        ("a.csv.gz", False),
+        ("a.ndjson", True),
+        ("a.jsonl.gz", True),
+        ("a.JSON.zst", True),
+        ("a", False),
+    ],
+)
+def test_is_ndjson(name, expected):
+    """Test format detection from the suffix under any compression suffix."""
+    assert is_ndjson(name) is expected
+
+
+def test_get_field():
+    """Test flat dotted keys, nested paths and missing fields."""
+    assert get_field({COLUMN: "1.1.1.1"}, COLUMN) == "1.1.1.1"
+    assert get_field(json.loads(es_hit("8.8.8.8")), COLUMN) == "8.8.8.8"
+    assert get_field({"_source": {"cg": "flat"}}, COLUMN) is None
+    assert get_field(None, COLUMN) is None
+
+
+def test_iter_file_chunks_csv(tmp_path):
+    """Test that CSV values are streamed in chunks with blank rows dropped."""
+    path = tmp_path / "export.csv"
+    path.write_text(CSV_DATA)
+
+    chunks = list(iter_file_chunks(path, COLUMN, chunksize=2))
+
+    assert len(chunks) == 2
+    assert values(chunks) == ["8.8.8.8", "1.1.1.1:443", "8.8.8.8"]
+
+
+def test_iter_file_frames(tmp_path):
+    """Test streaming several columns, dropping rows that miss any of them."""
+    csv_path, ndjson_path = tmp_path / "export.csv", tmp_path / "export.ndjson"
+    csv_path.write_text(CSV_DATA)
+    ndjson_path.write_text(NDJSON_DATA)
+
+    csv_rows = [
+        row for frame in iter_file_frames(csv_path, [COLUMN, "other_field"], 10) for row in frame.values.tolist()
+    ]
+    ndjson_rows = [
+        row for frame in iter_file_frames(ndjson_path, ["_index", COLUMN], 2) for row in frame.values.tolist()
+    ]
+
+    assert csv_rows == [["8.8.8.8", "a"], ["1.1.1.1:443", "b"], ["8.8.8.8", "d"]]
+    assert ndjson_rows == [["logs", "8.8.8.8"], ["", ""], ["logs", "8.8.4.4"]]
+
+
+def test_iter_file_chunks_gzip(tmp_path):
+    """Test gzip-compressed CSV and NDJSON."""
+    csv_path, ndjson_path = tmp_path / "export.csv.gz", tmp_path / "export.ndjson.gz"
+    csv_path.write_bytes(gzip.compress(CSV_DATA.encode()))
+    ndjson_path.write_bytes(gzip.compress(NDJSON_DATA.encode()))
+
+    assert values(iter_file_chunks(csv_path, COLUMN, 10)) == ["8.8.8.8", "1.1.1.1:443", "8.8.8.8"]
+    assert values(iter_file_chunks(ndjson_path, COLUMN, 10)) == ["8.8.8.8", "1.1.1.1", "", "8.8.4.4"]
+
+
+def test_iter_file_chunks_zstd(tmp_path):
+    """Test zstd-compressed NDJSON, when zstandard is installed."""
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "export.ndjson.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(NDJSON_DATA.encode()))
+
+    assert values(iter_file_chunks(path, COLUMN, 10)) == ["8.8.8.8", "1.1.1.1", "", "8.8.4.4"]
+
+
+def test_open_text_zstd_without_zstandard(tmp_path):
+    """Test that a missing optional dependency is reported clearly."""
+    path = tmp_path / "export.csv.zst"
+    path.write_bytes(b"")
+
+    with patch("ip_visualizer.core.log_files.zstandard", None), pytest.raises(ImportError, match="zstandard"):
+        open_text(path)
+
+
+def test_iter_files_chunks_combines_files(tmp_path):
+    """Test that every chunk of every file is delivered exactly once."""
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i:02}.csv"
+        path.write_text(f"{COLUMN}\n" + "".join(f"10.0.{i}.{j}\n" for j in range(25)))
+        paths.append(path)
+
+    ips = values(iter_files_chunks(paths, COLUMN, chunksize=7, readers=3))
+
+    assert sorted(ips) == sorted(f"10.0.{i}.{j}" for i in range(10) for j in range(25))
+
+
+def test_read_concurrently_reraises_reader_errors(tmp_path):
+    """Test that a failing file stops the read with its exception."""
+    good, bad = tmp_path / "good.csv", tmp_path / "bad.csv"
+    good.write_text(CSV_DATA)
+    bad.write_text("no_such_column\n1.1.1.1\n")
+
+    with pytest.raises(ValueError):
+        list(iter_files_chunks([good, bad], COLUMN, chunksize=1, readers=2))
+
+
+def test_read_concurrently_stops_readers_when_consumer_stops():
+    """Test that readers blocked on a full buffer exit once the consumer goes away."""
+    produced = []
+
+    def read(path):
+        for i in range(1_000):
+            produced.append(i)
+            yield i
+
+    items = read_concurrently(["a", "b"], read, readers=2, buffer=1)
+    next(items)
+    items.close()
+
+    assert len(produced) < 10
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("log-reader")]
+
+
+def test_count_ips_in_files(tmp_path, capsys):
+    """Test one combined count over mixed CSV and NDJSON inputs."""
+    (tmp_path / "a.csv").write_text(CSV_DATA)
+    (tmp_path / "b.ndjson.gz").write_bytes(gzip.compress(NDJSON_DATA.encode()))
+
+    counts = count_ips_in_files(expand_inputs([str(tmp_path / "*")]), readers=2)
+
+    assert counts == Counter({"8.8.8.8": 3, "1.1.1.1": 2, "8.8.4.4": 1})
+    assert "Skipped 1 rows" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
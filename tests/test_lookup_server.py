@@ -0,0 +1,170 @@
+"""Test the local lookup service."""
+
+import http.client
+import json
+import socket
+import threading
+from unittest.mock import patch
+from urllib.parse import quote
+
+import pytest
+
+from ip_visualizer.core.lookup_server import create_server, server_url
+from tests.test_ip_lookup import MockGeoIP2City
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP client over a Unix domain socket."""
+
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(connection, method, path, body=None):
+    payload = None if body is None else json.dumps(body)
+    connection.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def run_server(**kwargs):
+    server = create_server(port=0, **kwargs)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def server():
+    with patch("geoip2.database.Reader", new=MockGeoIP2City):
+        server = run_server(max_batch=3)
+        yield server
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def connection(server):
+    host, port = server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    yield connection
+    connection.close()
+
+
+def test_single_lookup(connection):
+    """Test that a single lookup returns the fields of lookup_ip."""
+    status, result = request(connection, "GET", "/lookup/8.8.8.8")
+
+    assert status == 200
+    assert result["ip"] == "8.8.8.8"
+    assert result["city"] == "Mountain View"
+    assert set(result) == {"ip", "city", "country", "latitude", "longitude", "timezone", "postal_code", "continent"}
+
+
+def test_single_lookup_query_string_and_not_found(connection):
+    """Test the query-string form and an address that isn't in the database."""
+    assert request(connection, "GET", "/lookup?ip=1.1.1.1")[1]["city"] == "Los Angeles"
+    assert request(connection, "GET", "/lookup/192.0.2.1") == (404, {})
+    assert request(connection, "GET", "/lookup")[0] == 400
+
+
+def test_single_lookup_ipv6_path(connection):
+    """Test an IPv6 address in the path, percent-encoded as urllib.parse.quote does."""
+    status, result = request(connection, "GET", "/lookup/" + quote("2606:4700:4700::1111", safe=""))
+
+    assert status == 200
+    assert result["ip"] == "2606:4700:4700::1111"
+    assert request(connection, "GET", "/lookup/2606:4700:4700::1111")[1]["city"] == "Los Angeles"
+    assert request(connection, "GET", "/stats")[1]["failures"]["malformed"] == 0
+
+
+def test_batch_lookup(connection):
+    """Test batch lookups, as a list or wrapped in an object, over one kept-alive connection."""
+    status, results = request(connection, "POST", "/lookup", ["8.8.8.8", "192.0.2.1", "8.8.8.8"])
+
+    assert status == 200
+    assert list(results) == ["8.8.8.8", "192.0.2.1"]
+    assert results["8.8.8.8"]["city"] == "Mountain View"
+    assert results["192.0.2.1"] == {}
+    assert request(connection, "POST", "/lookup", {"ips": ["1.1.1.1"]})[1]["1.1.1.1"]["city"] == "Los Angeles"
+
+
+@pytest.mark.parametrize(
+    ("body", "status"),
+    [({"addresses": []}, 400), ([1, 2], 400), (["1.1.1.1"] * 4, 413)],
+)
+def test_batch_lookup_rejects_bad_requests(connection, body, status):
+    """Test malformed and oversized batches."""
+    assert request(connection, "POST", "/lookup", body)[0] == status
+
+
+def test_batch_lookup_rejects_invalid_json(connection):
+    """Test a body that isn't JSON."""
+    connection.request("POST", "/lookup", body=b"{not json")
+    response = connection.getresponse()
+
+    assert response.status == 400
+    assert "error" in json.loads(response.read())
+
+
+@pytest.mark.parametrize("length", ["-1", "abc"])
+def test_batch_lookup_rejects_invalid_content_length(connection, length):
+    """Test that a negative or non-numeric Content-Length is refused instead of hanging or dropping the connection."""
+    connection.putrequest("POST", "/lookup")
+    connection.putheader("Content-Length", length)
+    connection.endheaders()
+    response = connection.getresponse()
+
+    assert response.status == 400
+    assert json.loads(response.read()) == {"error": "Invalid Content-Length header"}
+
+
+def test_health_stats_and_unknown_paths(connection):
+    """Test the housekeeping endpoints."""
+    assert request(connection, "GET", "/health") == (200, {"status": "ok"})
+    request(connection, "GET", "/lookup/8.8.8.8")
+    request(connection, "GET", "/lookup/8.8.8.8")
+    status, stats = request(connection, "GET", "/stats")
+    assert status == 200
+    assert stats["cache"]["hits"] == 1
+    assert stats["persistent_cache"] is None
+    assert request(connection, "GET", "/nowhere")[0] == 404
+    assert request(connection, "POST", "/nowhere", [])[0] == 404
+
+
+def test_missing_database():
+    """Test that lookups report the missing database instead of failing silently."""
+    with patch("geoip2.database.Reader", side_effect=FileNotFoundError("no database")):
+        server = run_server()
+        try:
+            connection = http.client.HTTPConnection(*server.server_address[:2], timeout=5)
+            assert request(connection, "GET", "/lookup/8.8.8.8")[0] == 503
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets not supported")
+def test_unix_socket(tmp_path):
+    """Test serving over a Unix domain socket, which is removed on close."""
+    path = tmp_path / "lookup.sock"
+    with patch("geoip2.database.Reader", new=MockGeoIP2City):
+        server = run_server(socket_path=str(path))
+        try:
+            assert server_url(server) == f"unix:{path}"
+            connection = UnixHTTPConnection(str(path))
+            assert request(connection, "GET", "/lookup/8.8.8.8")[1]["city"] == "Mountain View"
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+    assert not path.exists()
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,130 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ip_visualizer.core.geoip_reader import configure_reader
+from ip_visualizer.core.ip_visualizer import get_ip_locations, locate_windows
+from ip_visualizer.core.parallel_lookup import (
+    locate_parallel,
+    locate_shard,
+    resolve_coordinates,
+    resolve_coordinates_parallel,
+    split_shards,
+)
+from ip_visualizer.core.time_windows import WindowCounts
+
+
+@pytest.fixture
+def thread_pool():
+    """Run the worker pool in threads so the mocked reader is visible to workers."""
+    with patch("ip_visualizer.core.parallel_lookup.ProcessPoolExecutor", new=ThreadPoolExecutor):
+        yield
+
+
+def test_split_shards_keeps_every_ip_and_count():
+    """Test that sharding neither drops nor duplicates addresses."""
+    ip_counts = {f"10.0.{i // 256}.{i % 256}": i for i in range(25_000)}
+
+    shards = split_shards(ip_counts, shard_count=8)
+
+    assert len(shards) == 3  # shards are never smaller than MIN_SHARD_SIZE
+    merged = {ip: count for ips, counts in shards for ip, count in zip(ips, counts, strict=True)}
+    assert merged == ip_counts
+
+
+def test_split_shards_empty():
+    """Test that no shards are produced for no input."""
+    assert split_shards({}, shard_count=4) == []
+
+
+def test_locate_shard_skips_unlocated_ips(mock_reader):
+    """Test that a shard returns aligned arrays for located addresses only."""
+    locations = locate_shard(["8.8.8.8", "192.168.1.1", "1.1.1.1"], [5, 2, 1])
+
+    assert locations.latitude.tolist() == pytest.approx([37.40599, 34.0522])
+    assert locations.longitude.tolist() == pytest.approx([-122.078514, -118.2437])
+    assert locations.count.tolist() == [5, 1]
+
+
+def test_locate_parallel_merges_shards(mock_reader, thread_pool):
+    """Test that results from all workers are merged."""
+    with patch("ip_visualizer.core.parallel_lookup.MIN_SHARD_SIZE", 1):
+        locations = locate_parallel({"8.8.8.8": 5, "1.1.1.1": 1, "192.168.1.1": 2}, workers=2)
+
+    assert sorted(locations.latitude.tolist()) == pytest.approx([34.0522, 37.40599])
+    assert locations.total() == 6
+
+
+def test_locate_parallel_opens_database_in_workers(mock_reader, thread_pool, tmp_path):
+    """Test that each worker opens the configured database memory-mapped."""
+    configure_reader(str(tmp_path / "other.mmdb"), mode=1)
+
+    locate_parallel({"8.8.8.8": 1}, workers=2)
+
+    mock_reader.assert_called_with(str(tmp_path / "other.mmdb"), mode=1)
+
+
+def test_get_ip_locations_with_workers(mock_reader, thread_pool):
+    """Test that the parallel mode gives the same result as the sequential one."""
+    ip_counts = {"8.8.8.8": 120, "1.1.1.1": 3, "192.168.1.1": 7}
+
+    parallel = get_ip_locations(ip_counts, workers=2)
+    sequential = get_ip_locations(ip_counts)
+
+    assert parallel.heat_data() == sequential.heat_data()
+
+
+def test_get_ip_locations_with_workers_missing_database(thread_pool):
+    """Test that a missing database is reported rather than raised from the workers."""
+    with patch("ip_visualizer.core.ip_visualizer.locate_parallel", side_effect=FileNotFoundError):
+        locations = get_ip_locations({"8.8.8.8": 1}, workers=2)
+
+    assert len(locations) == 0
+
+
+def test_get_ip_locations_uses_processes_by_default(mock_reader):
+    """Test that workers are real processes unless patched."""
+    with patch("ip_visualizer.core.parallel_lookup.ProcessPoolExecutor") as mock_pool:
+        mock_pool.return_value.__enter__.return_value.map.return_value = [
+            locate_shard(["8.8.8.8"], [1]),
+        ]
+        locations = get_ip_locations({"8.8.8.8": 1}, workers=3)
+
+    assert locations.heat_data() == [pytest.approx([37.40599, -122.078514, 1])]
+    # Never more workers than shards
+    assert mock_pool.call_args.kwargs["max_workers"] == 1
+
+
+def test_resolve_coordinates_keeps_input_order(mock_reader, thread_pool):
+    """Test that coordinates line up with the addresses, NaN where they can't be located."""
+    ips = ["1.1.1.1", "192.168.1.1", "8.8.8.8"]
+
+    coordinates = resolve_coordinates(ips)
+    with patch("ip_visualizer.core.parallel_lookup.MIN_SHARD_SIZE", 1):
+        parallel = resolve_coordinates_parallel(ips, workers=2)
+
+    np.testing.assert_allclose(coordinates, [[34.0522, -118.2437], [np.nan, np.nan], [37.40599, -122.078514]])
+    np.testing.assert_array_equal(parallel, coordinates)
+    assert resolve_coordinates_parallel([], workers=2).shape == (0, 2)
+
+
+def test_locate_windows_starts_one_pool(mock_reader):
+    """Test that the addresses of all windows are looked up together, with a single pool."""
+    windows = WindowCounts(10, {0: Counter({"8.8.8.8": 2, "1.1.1.1": 1}), 20: Counter({"8.8.8.8": 1, "10.0.0.1": 4})})
+
+    with (
+        patch("ip_visualizer.core.parallel_lookup.MIN_SHARD_SIZE", 1),
+        patch("ip_visualizer.core.parallel_lookup.ProcessPoolExecutor", wraps=ThreadPoolExecutor) as mock_pool,
+    ):
+        window_locations = locate_windows(windows, workers=2)
+
+    assert mock_pool.call_count == 1
+    assert mock_reader.return_value.city.call_count == 2
+    assert [locations.total() for locations in window_locations.values()] == [3, 0, 1]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,116 @@
+"""Test the on-disk lookup result cache."""
+
+import sqlite3
+
+import pytest
+
+from ip_visualizer.core.persistent_cache import PersistentCache
+
+RECORD = {"city": "Mountain View", "latitude": 37.40599, "longitude": -122.078514}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "cache" / "lookups.sqlite"
+
+
+def test_round_trip_including_negative_results(cache_path):
+    """Test that records and None survive, and unknown addresses are left out."""
+    cache = PersistentCache(cache_path)
+    cache.ensure_epoch(1)
+    cache.put_many({"8.8.8.8": RECORD, "192.0.2.1": None})
+
+    assert cache.get_many(["8.8.8.8", "192.0.2.1", "1.1.1.1"]) == {"8.8.8.8": RECORD, "192.0.2.1": None}
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_persist_across_instances(cache_path):
+    """Test that a new process sees what an earlier one stored."""
+    cache = PersistentCache(cache_path)
+    cache.ensure_epoch(1)
+    cache.put_many({"8.8.8.8": RECORD})
+    cache.close()
+
+    reopened = PersistentCache(cache_path)
+    reopened.ensure_epoch(1)
+    assert reopened.get_many(["8.8.8.8"]) == {"8.8.8.8": RECORD}
+
+
+def test_new_build_epoch_invalidates_entries(cache_path):
+    """Test that results from an older database build are dropped."""
+    cache = PersistentCache(cache_path)
+    cache.ensure_epoch(1)
+    cache.put_many({"8.8.8.8": RECORD})
+    cache.close()
+
+    reopened = PersistentCache(cache_path)
+    reopened.ensure_epoch(2)
+    assert reopened.get_many(["8.8.8.8"]) == {}
+    assert reopened.build_epoch == 2
+
+
+def test_evicts_least_recently_used(cache_path):
+    """Test that the size limit drops the entries used longest ago."""
+    cache = PersistentCache(cache_path, maxsize=2)
+    cache.ensure_epoch(1)
+    cache.put_many({"1.1.1.1": None})
+    cache.put_many({"2.2.2.2": None})
+    cache.get_many(["1.1.1.1"])
+    cache.put_many({"3.3.3.3": None})
+
+    assert set(cache.get_many(["1.1.1.1", "2.2.2.2", "3.3.3.3"])) == {"1.1.1.1", "3.3.3.3"}
+    assert cache.stats()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_size_is_tracked_without_counting_the_table(cache_path):
+    """Test that stores keep the entry count up to date, across instances, without scanning the table."""
+    cache = PersistentCache(cache_path, maxsize=3)
+    cache.ensure_epoch(1)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+    cache.put_many({"1.1.1.1": None, "2.2.2.2": None})
+    cache.put_many({"2.2.2.2": RECORD, "3.3.3.3": None, "4.4.4.4": None})
+
+    assert not any(statement.endswith("COUNT(*) FROM results") for statement in statements)
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+    other = PersistentCache(cache_path, maxsize=3)
+    other.put_many({"5.5.5.5": None})
+    assert len(other) == 3
+    assert len(PersistentCache(cache_path)) == 3
+
+
+def test_counts_entries_of_older_cache_files(cache_path):
+    """Test that a cache file written before its size was tracked is counted once on opening."""
+    cache = PersistentCache(cache_path)
+    cache.ensure_epoch(1)
+    cache.put_many({"1.1.1.1": None, "2.2.2.2": None})
+    cache.close()
+    with sqlite3.connect(cache_path) as connection:
+        connection.execute("DELETE FROM meta WHERE key = 'size'")
+
+    assert len(PersistentCache(cache_path)) == 2
+
+
+def test_large_batches(cache_path):
+    """Test lookups of more addresses than fit in one query."""
+    cache = PersistentCache(cache_path)
+    cache.ensure_epoch(1)
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(2_000)]
+    cache.put_many(dict.fromkeys(ips))
+
+    assert len(cache.get_many(ips)) == 2_000
+
+
+def test_rejects_invalid_size(cache_path):
+    """Test that the cache needs room for at least one entry."""
+    with pytest.raises(ValueError):
+        PersistentCache(cache_path, maxsize=0)
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,131 @@
+"""Test the staged ingestion pipeline."""
+
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from ip_visualizer.core.geo_index import build_index
+from ip_visualizer.core.ip_visualizer import locate_files_pipelined
+from ip_visualizer.core.parallel_lookup import locate_shard
+from ip_visualizer.core.pipeline import run_pipeline
+
+CHUNKS = [
+    ["8.8.8.8", "1.1.1.1:443", "8.8.8.8"],
+    ["192.168.1.1", "not-an-ip", "1.1.1.1"],
+    ["8.8.8.8"],
+]
+
+
+def test_run_pipeline_aggregates_all_chunks(mock_reader):
+    """Test that every chunk is counted, located and merged per coordinate."""
+    result = run_pipeline(CHUNKS)
+
+    assert result.chunks == 3
+    assert result.requests == 6
+    assert result.invalid == 1
+    # 192.168.1.1 is set aside before lookup
+    assert result.rejected.requests == {"private": 1}
+    assert result.distinct_per_chunk == [2, 1, 1]
+    assert result.located == 4
+    assert set(result.busy_seconds) == {"read", "parse", "lookup", "aggregate"}
+    assert result.locations.latitude.tolist() == pytest.approx([34.0522, 37.40599])
+    assert result.locations.count.tolist() == [2, 3]
+
+
+def test_run_pipeline_with_worker_pool(mock_reader):
+    """Test the multi-worker path, with threads standing in for processes."""
+    with patch("ip_visualizer.core.parallel_lookup.ProcessPoolExecutor", new=ThreadPoolExecutor):
+        result = run_pipeline(CHUNKS, workers=2, with_codes=True)
+
+    assert result.locations.total() == 5
+    assert result.locations.country is not None
+
+
+def test_run_pipeline_with_index(mock_reader):
+    """Test that an index replaces database lookups."""
+    index = build_index(
+        [(ipaddress.ip_network("8.8.8.0/24"), {"location": {"latitude": 1.5, "longitude": 2.5}})],
+        build_epoch=1,
+    )
+
+    result = run_pipeline(CHUNKS, index=index)
+
+    assert result.locations.latitude.tolist() == [1.5]
+    assert result.locations.total() == 3
+    mock_reader.assert_not_called()
+
+
+def test_run_pipeline_empty_input(mock_reader):
+    """Test that no chunks give an empty result."""
+    result = run_pipeline([])
+
+    assert len(result.locations) == 0
+    assert result.chunks == 0
+
+
+def test_run_pipeline_bounds_chunks_in_flight(mock_reader):
+    """Test backpressure: the reader can't run far ahead of a stalled lookup stage."""
+    release = threading.Event()
+    read = []
+
+    def chunks():
+        for i in range(50):
+            read.append(i)
+            yield ["8.8.8.8"]
+
+    def slow_locate(ips, counts, with_codes=False):
+        release.wait(timeout=5)
+        return locate_shard(ips, counts, with_codes)
+
+    def check_and_release():
+        # Give the reader time to run ahead if it could
+        threading.Event().wait(0.3)
+        observed.append(len(read))
+        release.set()
+
+    observed: list[int] = []
+    threading.Thread(target=check_and_release).start()
+    with patch("ip_visualizer.core.pipeline.locate_shard", side_effect=slow_locate):
+        result = run_pipeline(chunks(), queue_size=2)
+
+    assert result.locations.total() == 50
+    # One lookup running, two queues of 2, one chunk in each of the reader and parser
+    assert observed[0] <= 10
+
+
+def test_run_pipeline_raises_stage_errors(mock_reader):
+    """Test that a failing stage stops the pipeline with its own exception."""
+    mock_reader.side_effect = FileNotFoundError("no database")
+
+    with pytest.raises(FileNotFoundError):
+        run_pipeline(CHUNKS)
+
+
+def test_locate_files_pipelined(mock_reader, tmp_path, capsys):
+    """Test the entry point for log files."""
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text("_source.cg.detail.remote_addr\n8.8.8.8\n8.8.8.8:80\n1.1.1.1\nbogus\n")
+
+    locations = locate_files_pipelined([csv_file])
+
+    assert locations.total() == 3
+    output = capsys.readouterr().out
+    assert "Skipped 1 rows" in output
+    assert "Processed 3 requests in 1 chunks" in output
+
+
+def test_locate_files_pipelined_without_database(mock_reader, tmp_path, capsys):
+    """Test that a missing database gives an empty result and a message."""
+    mock_reader.side_effect = FileNotFoundError("no database")
+    csv_file = tmp_path / "export.csv"
+    csv_file.write_text("_source.cg.detail.remote_addr\n8.8.8.8\n")
+
+    assert len(locate_files_pipelined([csv_file])) == 0
+    assert "GeoLite2-City.mmdb not found" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
@@ -0,0 +1,178 @@
+"""Test the weighted IP sampling engine."""
+
+import json
+
+import numpy as np
+import pytest
+
+from ip_visualizer.core.sampling import (
+    AliasTable,
+    HotIPConfig,
+    IPSampler,
+    RegionConfig,
+    SamplingConfig,
+    apportion,
+    load_sampling_config,
+)
+
+
+def make_config(regions, hot_ips=None):
+    return SamplingConfig.from_dict({"regions": regions, "hot_ips": hot_ips or {}})
+
+
+def test_apportion_is_exact():
+    """Test that parts always add up to the total."""
+    assert apportion(10, [1, 2]).tolist() == [3, 7]
+    assert apportion(100, [0.3, 0.3, 0.3, 0.1]).tolist() == [30, 30, 30, 10]
+    assert apportion(7, [1, 1, 1]).tolist() == [3, 2, 2]
+    assert apportion(0, [1, 1]).tolist() == [0, 0]
+
+
+def test_apportion_rejects_bad_weights():
+    """Test that negative or all-zero weights are refused."""
+    with pytest.raises(ValueError):
+        apportion(10, [0, 0])
+    with pytest.raises(ValueError):
+        apportion(10, [1, -1])
+
+
+def test_alias_table_matches_weights():
+    """Test that draws follow the weights and zero weights are never drawn."""
+    table = AliasTable([1, 0, 3, 6])
+
+    draws = table.sample(np.random.default_rng(0), 200_000)
+    frequencies = np.bincount(draws, minlength=4) / len(draws)
+
+    assert frequencies[1] == 0
+    assert frequencies == pytest.approx([0.1, 0, 0.3, 0.6], abs=0.005)
+
+
+def test_alias_table_rejects_empty_weights():
+    """Test that an empty table is refused."""
+    with pytest.raises(ValueError):
+        AliasTable([])
+
+
+def test_from_dict_accepts_lists_and_weighted_prefixes():
+    """Test both ways of listing prefixes."""
+    config = make_config(
+        {
+            "A": {"weight": 1, "prefixes": ["10.0.0.0/8"]},
+            "B": {"weight": 2, "prefixes": {"20.0.0.0/8": 3, "30.0.0.0/8": 1}},
+        },
+        {"count": 5, "fraction": 0.5},
+    )
+
+    assert config.regions["A"] == RegionConfig(1.0, {"10.0.0.0/8": 1.0})
+    assert config.regions["B"] == RegionConfig(2.0, {"20.0.0.0/8": 3.0, "30.0.0.0/8": 1.0})
+    assert config.hot_ips == HotIPConfig(count=5, fraction=0.5)
+
+
+def test_load_sampling_config(tmp_path):
+    """Test loading the bundled config and a custom file."""
+    bundled = load_sampling_config()
+    assert set(bundled.regions) == {"Asia", "Europe", "North America", "South America"}
+
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"regions": {"A": {"weight": 1, "prefixes": ["10.0.0.0/8"]}}}))
+    assert list(load_sampling_config(path).regions) == ["A"]
+
+
+def test_sampler_region_totals_are_exact():
+    """Test that each region contributes exactly its share."""
+    sampler = IPSampler(
+        make_config(
+            {
+                "A": {"weight": 1, "prefixes": ["10.0.0.0/8"]},
+                "B": {"weight": 2, "prefixes": ["20.0.0.0/8"]},
+            }
+        )
+    )
+
+    ips = sampler.sample(10, np.random.default_rng(1))
+
+    assert sampler.region_totals(10) == {"A": 3, "B": 7}
+    assert np.count_nonzero(ips >> 24 == 10) == 3
+    assert np.count_nonzero(ips >> 24 == 20) == 7
+
+
+def test_sampler_follows_prefix_weights():
+    """Test that prefixes within a region are drawn by weight."""
+    sampler = IPSampler(make_config({"A": {"weight": 1, "prefixes": {"10.0.0.0/8": 3, "20.0.0.0/8": 1}}}))
+
+    ips = sampler.sample(40_000, np.random.default_rng(2))
+
+    assert np.mean(ips >> 24 == 10) == pytest.approx(0.75, abs=0.01)
+
+
+def test_sampler_splits_prefixes_shared_between_regions():
+    """Test that a prefix listed in two regions is not drawn twice as often."""
+    sampler = IPSampler(
+        make_config(
+            {
+                "A": {"weight": 1, "prefixes": ["10.0.0.0/8", "20.0.0.0/8"]},
+                "B": {"weight": 1, "prefixes": ["10.0.0.0/8", "30.0.0.0/8"]},
+            }
+        )
+    )
+
+    first_octets = sampler.sample(60_000, np.random.default_rng(3)) >> 24
+    shares = [np.mean(first_octets == octet) for octet in (10, 20, 30)]
+
+    assert shares == pytest.approx([1 / 3, 1 / 3, 1 / 3], abs=0.01)
+
+
+def test_sampler_hot_ips_repeat_with_zipf_skew():
+    """Test that hot addresses take the configured share, most of it going to the top ranks."""
+    sampler = IPSampler(
+        make_config({"A": {"weight": 1, "prefixes": ["10.0.0.0/8"]}}, {"count": 100, "fraction": 0.5, "exponent": 1.2})
+    )
+
+    ips = sampler.sample(20_000, np.random.default_rng(4))
+    _, counts = np.unique(ips, return_counts=True)
+    # Fresh draws from a /8 only rarely collide, and then just once
+    repeated = np.sort(counts[counts > 2])[::-1]
+
+    # 10,000 hot draws spread over at most 100 addresses
+    assert len(repeated) <= 100
+    assert repeated.sum() == pytest.approx(10_000, abs=20)
+    assert repeated[0] > 10 * repeated[len(repeated) // 2]
+
+
+def test_sampler_chunks_keep_totals_exact():
+    """Test that chunked output has the same exact region totals as a single draw."""
+    sampler = IPSampler(
+        make_config(
+            {
+                "A": {"weight": 1, "prefixes": ["10.0.0.0/8"]},
+                "B": {"weight": 3, "prefixes": ["20.0.0.0/8"]},
+            }
+        )
+    )
+
+    chunks = list(sampler.iter_chunks(1_001, 100, np.random.default_rng(5)))
+    ips = np.concatenate(chunks)
+
+    assert [len(chunk) for chunk in chunks] == [100] * 10 + [1]
+    assert np.count_nonzero(ips >> 24 == 10) == 250
+    assert np.count_nonzero(ips >> 24 == 20) == 751
+
+
+def test_sampler_skips_empty_regions(capsys):
+    """Test that a region without prefixes is skipped with a warning."""
+    sampler = IPSampler(
+        make_config({"A": {"weight": 1, "prefixes": ["10.0.0.0/8"]}, "Empty": {"weight": 1, "prefixes": []}})
+    )
+
+    assert sampler.region_totals(5) == {"A": 5}
+    assert "No IP ranges defined for Empty" in capsys.readouterr().out
+
+
+def test_sampler_rejects_ipv6_prefixes():
+    """Test that only IPv4 prefixes are accepted."""
+    with pytest.raises(ValueError, match="IPv4"):
+        IPSampler(make_config({"A": {"weight": 1, "prefixes": ["2001:db8::/32"]}}))
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
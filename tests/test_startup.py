@@ -0,0 +1,55 @@
+"""Test that each command imports only what it needs, so the CLI starts quickly."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = {"numpy", "pandas", "folium", "asyncio"}
+# Import time allowed for the lookup-ip path; generous for slow CI machines, but folium or
+# pandas alone would blow it
+LOOKUP_BUDGET_SECONDS = 0.5
+
+
+def import_in_subprocess(*modules):
+    """Import `modules` in a fresh interpreter; return the top-level packages loaded and the seconds taken."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps([elapsed, sorted({name.split('.')[0] for name in sys.modules})]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)  # noqa: S603
+    elapsed, loaded = json.loads(result.stdout)
+    return set(loaded), elapsed
+
+
+@pytest.mark.parametrize(
+    ("modules", "allowed"),
+    [
+        (["ip_visualizer.cli"], set()),
+        (["ip_visualizer.cli", "ip_visualizer.core.ip_lookup"], set()),
+        (["ip_visualizer.cli", "ip_visualizer.core.lookup_server"], set()),
+        (["ip_visualizer.cli", "ip_visualizer.core.ip_visualizer"], {"numpy"}),
+    ],
+)
+def test_commands_defer_heavy_imports(modules, allowed):
+    """Test that pandas, folium, numpy and asyncio are only loaded by the commands that use them."""
+    loaded, _ = import_in_subprocess(*modules)
+
+    assert loaded & HEAVY_MODULES <= allowed
+
+
+def test_lookup_startup_budget():
+    """Test that the lookup-ip path imports within its budget."""
+    _, elapsed = import_in_subprocess("ip_visualizer.cli", "ip_visualizer.core.ip_lookup")
+
+    assert elapsed < LOOKUP_BUDGET_SECONDS
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
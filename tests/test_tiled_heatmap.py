@@ -0,0 +1,114 @@
+import json
+
+import folium
+import pytest
+
+from ip_visualizer.core.ip_visualizer import create_tiled_heatmap
+from ip_visualizer.core.locations import LocationSet
+from ip_visualizer.core.tiled_heatmap import LOADED_CALLBACK, TiledHeatMap, build_pyramid, write_pyramid, zoom_grid
+
+LOCATIONS = LocationSet.from_arrays(
+    [37.7749, 37.3382, 34.0522, 51.5074, 48.8566],
+    [-122.4194, -121.8863, -118.2437, -0.1278, 2.3522],
+    [5, 2, 3, 7, 1],
+)
+
+
+def read_level(path):
+    """Parse the flat [lat, lon, weight, ...] array out of a level script."""
+    text = path.read_text()
+    assert text.startswith(f"{LOADED_CALLBACK}(")
+    dataset, zoom, flat = json.loads("[" + text[len(LOADED_CALLBACK) + 1 : text.rindex(")")] + "]")
+    return dataset, zoom, [flat[i : i + 3] for i in range(0, len(flat), 3)]
+
+
+def test_zoom_grid_halves_per_level():
+    """Test that each zoom level has cells half the size of the previous one."""
+    assert zoom_grid(3).lat_step == pytest.approx(zoom_grid(2).lat_step / 2)
+    assert zoom_grid(0).lon_step == pytest.approx(360 / 32)
+
+
+def test_build_pyramid_has_one_level_per_zoom():
+    """Test that every level keeps the total request count."""
+    pyramid = build_pyramid(LOCATIONS, min_zoom=1, max_zoom=6)
+
+    assert list(pyramid) == [1, 2, 3, 4, 5, 6]
+    assert all(level.total() == LOCATIONS.total() for level in pyramid.values())
+
+
+def test_build_pyramid_coarser_levels_have_fewer_points():
+    """Test that zooming out merges points."""
+    pyramid = build_pyramid(LOCATIONS, min_zoom=0, max_zoom=10)
+
+    assert len(pyramid[10]) == 5
+    assert len(pyramid[0]) < len(pyramid[10])
+    assert all(len(pyramid[z]) <= len(pyramid[z + 1]) for z in range(10))
+
+
+def test_build_pyramid_caps_each_level():
+    """Test that each level is capped without affecting the coarser levels."""
+    capped = build_pyramid(LOCATIONS, min_zoom=0, max_zoom=10, max_points=2)
+    uncapped = build_pyramid(LOCATIONS, min_zoom=0, max_zoom=10, max_points=None)
+
+    assert len(capped[10]) == 2
+    # Coarse levels are binned from the uncapped finer levels
+    assert sorted(capped[0].count.tolist()) == sorted(uncapped[0].count.tolist())[-2:]
+
+
+def test_build_pyramid_rejects_inverted_zoom_range():
+    """Test the zoom range validation."""
+    with pytest.raises(ValueError):
+        build_pyramid(LOCATIONS, min_zoom=5, max_zoom=2)
+
+
+def test_write_pyramid_writes_one_script_per_level(tmp_path):
+    """Test the per-zoom data files."""
+    pyramid = build_pyramid(LOCATIONS, min_zoom=2, max_zoom=3)
+
+    paths = write_pyramid(pyramid, tmp_path / "heat_tiles")
+
+    assert [path.name for path in paths] == ["z2.js", "z3.js"]
+    dataset, zoom, points = read_level(paths[1])
+    assert dataset == "heat_tiles"
+    assert zoom == 3
+    assert sum(weight for _, _, weight in points) == LOCATIONS.total()
+
+
+def test_tiled_heatmap_renders_lazy_loader():
+    """Test that the layer embeds no data, only the loader for the level files."""
+    m = folium.Map(location=[20, 0], zoom_start=2)
+    TiledHeatMap([3, 1, 2], base_url="ip_heatmap_tiles").add_to(m)
+
+    html = m.get_root().render()
+
+    assert "L.heatLayer([]" in html
+    assert '"ip_heatmap_tiles/"' in html
+    assert "[1, 2, 3]" in html
+    assert "leaflet_heat.min.js" in html
+
+
+def test_tiled_heatmap_requires_levels():
+    """Test that a layer without levels is rejected."""
+    with pytest.raises(ValueError):
+        TiledHeatMap([], base_url="tiles")
+
+
+def test_create_tiled_heatmap(tmp_path, monkeypatch):
+    """Test writing a tiled heatmap end to end."""
+    monkeypatch.chdir(tmp_path)
+
+    create_tiled_heatmap(LOCATIONS, min_zoom=1, max_zoom=4)
+
+    html = (tmp_path / "ip_heatmap.html").read_text()
+    assert "ip_heatmap_tiles/" in html
+    assert "37.7749" not in html
+    assert sorted(path.name for path in (tmp_path / "ip_heatmap_tiles").iterdir()) == [
+        "z1.js",
+        "z2.js",
+        "z3.js",
+        "z4.js",
+    ]
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])
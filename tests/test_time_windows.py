@@ -0,0 +1,123 @@
+"""Test bucketing requests into time windows and the heatmap with a time slider."""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from ip_visualizer.core.binning import Grid
+from ip_visualizer.core.locations import LocationSet
+from ip_visualizer.core.time_windows import (
+    MAX_WINDOWS,
+    TIMELINE_FILE,
+    WindowCounts,
+    count_windows,
+    create_timeline_heatmap,
+    parse_interval,
+    window_label,
+    window_points,
+)
+
+HOUR = 3_600_000_000_000
+MAY_1 = pd.Timestamp("2024-05-01", tz="UTC").value
+
+
+def test_parse_interval():
+    """Test pandas-style intervals and the errors for unusable ones."""
+    assert parse_interval("1h") == HOUR
+    assert parse_interval("15min") == HOUR // 4
+    with pytest.raises(ValueError, match="Invalid interval"):
+        parse_interval("hourly")
+    with pytest.raises(ValueError, match="must be positive"):
+        parse_interval("0s")
+
+
+def test_count_windows():
+    """Test that requests are counted per window and IP, setting aside bad addresses and timestamps."""
+    ips = pd.Series(["8.8.8.8", "8.8.8.8:443", "1.1.1.1", "8.8.8.8", "bogus", "1.1.1.1"])
+    timestamps = pd.Series(
+        [
+            "2024-05-01T00:10:00Z",
+            "2024-05-01T00:59:59Z",
+            "2024-05-01T01:00:00Z",
+            "2024-05-01T04:30:00+02:00",
+            "2024-05-01T00:00:00Z",
+            "yesterday",
+        ]
+    )
+
+    windows = count_windows(ips, timestamps, HOUR)
+
+    assert windows.windows == {
+        MAY_1: Counter({"8.8.8.8": 2}),
+        MAY_1 + HOUR: Counter({"1.1.1.1": 1}),
+        MAY_1 + 2 * HOUR: Counter({"8.8.8.8": 1}),
+    }
+    assert (windows.invalid, windows.untimed) == (1, 1)
+
+
+def test_count_windows_groups_unordered_rows():
+    """Test that rows interleaved across windows, or with no valid rows at all, are grouped correctly."""
+    ips = pd.Series(["1.1.1.1", "8.8.8.8", "1.1.1.1", "9.9.9.9", "8.8.8.8"])
+    timestamps = pd.Series(["2024-05-01T02:00:00Z", "2024-05-01T00:00:00Z"] * 2 + ["2024-05-01T02:10:00Z"])
+
+    windows = count_windows(ips, timestamps, HOUR)
+
+    assert windows.windows == {
+        MAY_1: Counter({"8.8.8.8": 1, "9.9.9.9": 1}),
+        MAY_1 + 2 * HOUR: Counter({"1.1.1.1": 2, "8.8.8.8": 1}),
+    }
+    assert count_windows(pd.Series(["bogus"]), pd.Series(["2024-05-01T00:00:00Z"]), HOUR).windows == {}
+
+
+def test_window_counts_update_and_starts():
+    """Test that chunks are combined and the windows between them filled in."""
+    windows = WindowCounts(HOUR, {MAY_1: Counter({"8.8.8.8": 1})}, invalid=1)
+    windows.update(WindowCounts(HOUR, {MAY_1: Counter({"8.8.8.8": 2}), MAY_1 + 3 * HOUR: Counter({"1.1.1.1": 1})}))
+
+    assert windows.windows[MAY_1] == {"8.8.8.8": 3}
+    assert windows.total() == 4
+    assert windows.invalid == 1
+    assert windows.starts() == [MAY_1 + i * HOUR for i in range(4)]
+    assert WindowCounts(HOUR).starts() == []
+
+
+def test_window_counts_refuse_too_many_windows():
+    """Test that an interval far too fine for the time span is refused."""
+    windows = WindowCounts(HOUR, {MAY_1: Counter({"8.8.8.8": 1}), MAY_1 + MAX_WINDOWS * HOUR: Counter({"8.8.8.8": 1})})
+
+    with pytest.raises(ValueError, match="--interval"):
+        windows.starts()
+
+
+def test_window_label():
+    """Test the label shown on the time slider."""
+    assert window_label(MAY_1 + 13 * HOUR + HOUR // 4) == "2024-05-01 13:15"
+
+
+def test_window_points_are_capped():
+    """Test that each window keeps only its heaviest points, per coordinate or per grid cell."""
+    locations = LocationSet.from_arrays([1.0, 1.0, 50.0, 10.0], [2.0, 2.0, 50.0, 10.0], [1, 2, 1, 5])
+
+    assert sorted(window_points(locations, max_points=2).heat_data()) == [[1.0, 2.0, 3.0], [10.0, 10.0, 5.0]]
+    assert len(window_points(locations, Grid.from_cell_size(90.0))) == 1
+
+
+def test_create_timeline_heatmap(tmp_path, monkeypatch):
+    """Test that every window, empty ones included, becomes a frame of the slider."""
+    monkeypatch.chdir(tmp_path)
+    window_locations = {
+        MAY_1: LocationSet.from_arrays([37.4], [-122.1], [3]),
+        MAY_1 + HOUR: LocationSet.empty(),
+        MAY_1 + 2 * HOUR: LocationSet.from_arrays([34.0, 51.5], [-118.2, -0.1], [1, 2]),
+    }
+
+    create_timeline_heatmap(window_locations)
+
+    html = (tmp_path / TIMELINE_FILE).read_text()
+    assert "TDHeatmap" in html
+    assert "['2024-05-01 00:00', '2024-05-01 01:00', '2024-05-01 02:00']" in html
+
+
+if __name__ == "__main__":
+    pytest.main(["-v"])